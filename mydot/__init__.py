@@ -1,5 +1,19 @@
-from mydot.repository import Repository
-from mydot.console import console
-
 __version__ = "0.7.0"
 __all__ = ["Repository", "console"]
+
+
+def __getattr__(name: str):
+    """Import the public objects lazily.
+
+    `python -m mydot --prompt` runs on every shell prompt render and must not
+    pay for importing `rich` through `mydot.console`.
+    """
+    if name == "Repository":
+        from mydot.repository import Repository
+
+        return Repository
+    elif name == "console":
+        from mydot.console import console
+
+        return console
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,24 +2,62 @@
 # Mikey Garcia, @gikeymarcia
 # https://github.com/gikeymarcia/mydot
 
-import argparse
-
-from mydot import Repository
-from mydot.actions import (
-    AddChanges,
-    Clipboard,
-    DiscardChanges,
-    ExportTar,
-    GitPassthrough,
-    Grep,
-    Restore,
-    RunExecutable,
-    EditFiles,
-)
-from mydot.console import my_theme, rich_text
+import sys
 
 
 def main():
+    # `--prompt` runs on every shell prompt render. Dispatch before importing
+    # `rich`, `pydymenu` or building the argparse help text.
+    if sys.argv[1:2] == ["--prompt"]:
+        from mydot.prompt import main as prompt_main
+
+        sys.exit(prompt_main())
+    elif sys.argv[1:2] == ["--completions-refresh"]:
+        from mydot.completion import main as completion_main
+
+        sys.exit(completion_main())
+    cli()
+
+
+def cli():
+    import argparse
+    import shlex
+
+    from mydot import Repository
+    from mydot.actions import (
+        AddChanges,
+        ApplyProfile,
+        Clipboard,
+        CompareManifests,
+        Deploy,
+        DiscardChanges,
+        Discover,
+        ExportTar,
+        GitPassthrough,
+        Grep,
+        GrepHistory,
+        LiveGrep,
+        Restore,
+        RunExecutable,
+        EditFiles,
+        Sizes,
+        Snapshot,
+        WriteManifest,
+        Tune,
+        UndoDiscard,
+        Watch,
+    )
+    from mydot.completion import (
+        SHELLS,
+        completion_script,
+        refresh_completion_data,
+        write_completion_data,
+    )
+    from mydot.console import my_theme, rich_text
+    from mydot.exceptions import MydotError, NothingToDo
+    from mydot.logging import configure
+    from mydot.maintenance import interactive_use, maybe_maintain
+
     rich_str = {
         "prog": rich_text("[code]python -m mydot[/]", theme=my_theme),
         "desc": rich_text(
@@ -65,6 +103,22 @@ def main():
         help="regex search over each non-binary file in the repo. Select from hits.",
         type=str,
     )
+    group.add_argument(
+        "--live-grep",
+        help="Search tracked files as you type, starting from QUERY. Opens the "
+        "picked files at the matching line",
+        metavar="QUERY",
+        nargs="?",
+        const="",
+        type=str,
+    )
+    group.add_argument(
+        "--grep-history",
+        help="Search every version of every file in --revs (default: HEAD) for "
+        "PATTERN. Opens the picked versions at the matching line",
+        metavar="PATTERN",
+        type=str,
+    )
     group.add_argument(
         "--restore",
         help="Use fzf to interactively choose file(s) to remove from the staging area.",
@@ -75,6 +129,16 @@ def main():
         help="Revert unstaged file(s) back to their state at the last commit.",
         action="store_true",
     )
+    group.add_argument(
+        "--undo-discard",
+        help="Bring back changes thrown away by --discard.",
+        action="store_true",
+    )
+    group.add_argument(
+        "--discover",
+        help="Find untracked config files in the work tree and choose ones to add.",
+        action="store_true",
+    )
     group.add_argument(
         "--clip",
         help="Put absolute file path(s) into the clipboard.",
@@ -85,53 +149,217 @@ def main():
         help="Make a tarball of tracked dotfiles @ work-tree/dotfiles.tar.gz",
         action="store_true",
     )
+    group.add_argument(
+        "--deploy",
+        help="Check out HEAD into TARGET (default: the work tree, unless it has "
+        "uncommitted changes), moving conflicting files into a backup directory",
+        metavar="TARGET",
+        nargs="?",
+        const="",
+        type=str,
+    )
+    group.add_argument(
+        "--snapshot",
+        help="Mirror dotfiles into a new timestamped directory in DIR, "
+        "hardlinking files unchanged since the last snapshot",
+        metavar="DIR",
+        type=str,
+    )
+    group.add_argument(
+        "--manifest",
+        help="Print a sorted manifest (mode, blob id, path) of the deployed "
+        "dotfiles, or write it to FILE",
+        metavar="FILE",
+        nargs="?",
+        const="-",
+        type=str,
+    )
+    group.add_argument(
+        "--compare",
+        help="Report files added, removed or changed between manifests A and B",
+        metavar=("A", "B"),
+        nargs=2,
+        type=str,
+    )
+    group.add_argument(
+        "--sizes",
+        help="Report the largest files, the largest blobs in history and the "
+        "space used per directory",
+        action="store_true",
+    )
+    group.add_argument(
+        "--profile",
+        help="Check out only the files of profile NAME (default: the one "
+        "matching this host, 'all' for every file) with a sparse checkout",
+        metavar="NAME",
+        nargs="?",
+        const="",
+        type=str,
+    )
+    group.add_argument(
+        "--tune",
+        help="Benchmark git on your repo and enable the settings that make it faster",
+        action="store_true",
+    )
     group.add_argument(
         "-s",
         "--status",
         help="Show status of dotfiles repo",
         action="store_true",
     )
+    group.add_argument(
+        "-w",
+        "--watch",
+        help="Live view of staged, unstaged and deleted dotfiles, updated as "
+        "files change",
+        action="store_true",
+    )
     group.add_argument(
         "-l",
         "--list",
         help="List all dotfiles in the work tree",
         action="store_true",
     )
+    group.add_argument(
+        "--prompt",
+        help="Print compact status counts for a shell prompt (cached, time boxed)",
+        action="store_true",
+    )
+    group.add_argument(
+        "--completion",
+        help="Print the shell completion script for bash or zsh",
+        choices=SHELLS,
+    )
+    group.add_argument(
+        "--completions-refresh",
+        help="Rewrite the cached data read by the completion scripts",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-q",
+        "--query",
+        help="With --edit, --clip or --run: skip the picker and use the best "
+        "fuzzy match for QUERY",
+        type=str,
+    )
+    parser.add_argument(
+        "--revs",
+        help="With --grep-history: revisions to search, as given to git log "
+        "(e.g. v1.0..main or --revs=--all)",
+        metavar="RANGE",
+        type=str,
+    )
+    parser.add_argument(
+        "--log-level",
+        help="Print log messages at LEVEL and above (default: $MYDOT_LOG_LEVEL "
+        "or WARNING)",
+        metavar="LEVEL",
+        type=str,
+    )
+    parser.add_argument(
+        "--flight-log",
+        help="Write the recent events of this run (git calls, cache hits, "
+        "picker timings) to FILE on exit",
+        metavar="FILE",
+        type=str,
+    )
     args, extra_args = parser.parse_known_args()
-    dotfiles = Repository()
-    # TODO add --history
-    # $(git log --oneline -- bootstrap.yml | awk '{print $1'} | fzf --preview="git show {}:bootstrap.yml"')
-    # flow: d. --history
-    #   1. pick file
-    #   2. get list of hashes
-    #   3. fzf picker with preview of each version
-    #   4. Upon selection open file in split view with current version
+    configure(args.log_level, args.flight_log)
+    if args.completion:
+        flags = [opt for action in parser._actions for opt in action.option_strings]
+        print(completion_script(args.completion, flags))
+        return
+    try:
+        if args.compare:
+            compare = CompareManifests(*args.compare)
+            compare.report(compare.run())
+            return
+        dotfiles = Repository()
+        # TODO add --history
+        # $(git log --oneline -- bootstrap.yml | awk '{print $1'} | fzf --preview="git show {}:bootstrap.yml"')
+        # flow: d. --history
+        #   1. pick file
+        #   2. get list of hashes
+        #   3. fzf picker with preview of each version
+        #   4. Upon selection open file in split view with current version
+
+        with interactive_use(dotfiles.bare_repo):
+            if args.edit:
+                EditFiles(dotfiles, query=args.query).run()
+            elif args.add:
+                AddChanges(dotfiles).run()
+            elif args.status:
+                dotfiles.show_status()
+            elif args.watch:
+                Watch(dotfiles).run()
+            elif args.list:
+                [print(file) for file in dotfiles.list_all]
+            elif args.grep:
+                Grep(dotfiles, args.grep).run()
+            elif args.live_grep is not None:
+                LiveGrep(dotfiles, args.live_grep).run()
+            elif args.grep_history:
+                revs = shlex.split(args.revs) if args.revs else None
+                GrepHistory(dotfiles, args.grep_history, revs).run()
+            elif args.run_executable:
+                RunExecutable(dotfiles, query=args.query).run()
+            elif args.discard:
+                DiscardChanges(dotfiles).run()
+            elif args.restore:
+                Restore(dotfiles).run()
+            elif args.undo_discard:
+                UndoDiscard(dotfiles).run()
+            elif args.export:
+                export = ExportTar(dotfiles)
+                export.report(export.run())
+            elif args.discover:
+                Discover(dotfiles).run()
+            elif args.deploy is not None:
+                deploy = Deploy(dotfiles, args.deploy or str(dotfiles.work_tree))
+                with deploy.progress_bar() as progress:
+                    result = deploy.run(progress)
+                deploy.report(result)
+            elif args.snapshot:
+                snapshot = Snapshot(dotfiles, args.snapshot)
+                snapshot.report(snapshot.run())
+            elif args.manifest:
+                manifest = WriteManifest(dotfiles, args.manifest)
+                manifest.report(manifest.run())
+            elif args.sizes:
+                sizes = Sizes(dotfiles)
+                with sizes.status():
+                    result = sizes.run()
+                sizes.report(result)
+            elif args.profile is not None:
+                apply = ApplyProfile(dotfiles, args.profile)
+                apply.report(apply.run())
+            elif args.tune:
+                tune = Tune(dotfiles)
+                with tune.status():
+                    result = tune.run()
+                tune.report(result)
+            elif args.clip:
+                Clipboard(dotfiles, query=args.query).run()
+            elif args.prompt:
+                from mydot.prompt import main as prompt_main
 
+                sys.exit(prompt_main())
+            elif len(extra_args) > 1 and extra_args[0] == "git":
+                GitPassthrough(dotfiles, extra_args[1:]).run()
+            elif args.completions_refresh:
+                write_completion_data(dotfiles)
+            else:
+                parser.parse_args(["-h"])
+    except NothingToDo as error:
+        if args.restore or args.discard:
+            dotfiles.show_status()
+            sys.exit(f"\n{error}")
+        sys.exit(str(error))
+    except MydotError as error:
+        sys.exit(str(error))
+    refresh_completion_data(dotfiles)
+    maybe_maintain(dotfiles)
 
-    if args.edit:
-        EditFiles(dotfiles).run()
-    elif args.add:
-        AddChanges(dotfiles).run()
-    elif args.status:
-        dotfiles.show_status()
-    elif args.list:
-        [print(file) for file in dotfiles.list_all]
-    elif args.grep:
-        Grep(dotfiles, args.grep).run()
-    elif args.run_executable:
-        RunExecutable(dotfiles).run()
-    elif args.discard:
-        DiscardChanges(dotfiles).run()
-    elif args.restore:
-        Restore(dotfiles).run()
-    elif args.export:
-        ExportTar(dotfiles).run()
-    elif args.clip:
-        Clipboard(dotfiles).run()
-    elif len(extra_args) > 1 and extra_args[0] == "git":
-        GitPassthrough(dotfiles, extra_args[1:]).run()
-    else:
-        parser.parse_args(["-h"])
 
 if __name__ == "__main__":
     main()
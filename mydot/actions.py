@@ -1,68 +1,301 @@
+from contextlib import contextmanager
+import io
 import os
+import shlex
+import socket
 import subprocess
 import sys
-from typing import List, Optional, Protocol
+import tarfile
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Protocol,
+    Union,
+)
 from pathlib import Path
 
 import pydymenu
 
+from mydot.capabilities import which
+from mydot.classify import BlobClassifier, preview_command
 from mydot.clip import Clipper, find_clipper
-from mydot.editor import Editor, find_editor
-from mydot.logging import logging
+from mydot.deploy import Deployer
+from mydot.deploy import Progress as DeployProgress
+from mydot.discover import discover
+from mydot.editor import Editor, Neovim, Vim, find_editor
+from mydot.exceptions import MissingProgram, NoSelection, NothingToDo, ProfileError
+from mydot.frecency import Frecency
+from mydot.history import HistorySearch, historic_copy
+from mydot.history import parse_hit as parse_history_hit
+from mydot.fuzzy import path_index
+from mydot.journal import DiscardJournal
+from mydot.livegrep import SearchIndex, SearchServer, parse_hit
+from mydot.logging import event, log
+from mydot.manifest import compare_files, write_manifest
+from mydot.numstat import Change, annotate, numstat, summary
+from mydot.privatemask import PrivateMask, redact
+from mydot.profiles import (
+    ALL,
+    active_profile,
+    pin_profile,
+    profiles_file,
+    sparse_checkout,
+)
 from mydot.repository import Repository
+from mydot.sizes import SizeReport, human_size
+from mydot.snapshot import SnapshotMirror
+from mydot.tune import RUNS, Tuner
+from mydot.watch import SECTIONS, StatusWatcher
+
+# a preview command, or a function building it only once a picker is shown
+Preview = Union[str, Callable[[], str], None]
+
+
+def resolve_preview(preview: Preview) -> Optional[str]:
+    return preview() if callable(preview) else preview
+
+
+class Selector(Protocol):
+    """Chooses from `items`. Returns None (or nothing) when cancelled.
+
+    The default asks the user through fzf. Pass your own to drive actions from
+    a program: `AddChanges(repo, selector=lambda items, **_: items).run()`.
+    """
+
+    def __call__(
+        self,
+        items: List[str],
+        prompt: str = " > ",
+        multi: bool = False,
+        preview: Optional[str] = None,
+    ) -> Optional[List[str]]:
+        raise NotImplementedError
+
+
+class Result(NamedTuple):
+    """What an action did: the files it acted on plus action specific detail."""
+
+    action: str
+    paths: List[str]
+    detail: Any = None
 
 
 class Actions(Protocol):
+    selector: Optional[Selector] = None
+
     def run(self):
         raise NotImplementedError
 
+    def choose(
+        self,
+        items: List[str],
+        prompt: str,
+        cancelled: str,
+        multi: bool = True,
+        preview: Preview = None,
+        query: Optional[str] = None,
+        default: Optional[Selector] = None,
+    ) -> List[str]:
+        """Pick from `items` with this action's selector (or `default`).
+
+        Raises NoSelection with the `cancelled` message when nothing is picked.
+        """
+        selector = default if self.selector is None else self.selector
+        picked = select(items, query, prompt, multi, preview, selector)
+        if not picked:
+            raise NoSelection(cancelled)
+        return picked
+
+
+def interactive_select(
+    items: List[str],
+    prompt: str = " > ",
+    multi: bool = False,
+    preview: Preview = None,
+) -> Optional[List[str]]:
+    """The default selector: fzf, or the built in matcher without it."""
+    if which("fzf"):
+        preview = resolve_preview(preview)
+        return pydymenu.fzf(items, prompt=prompt, multi=multi, preview=preview)
+    return _fallback_select(items, prompt)
+
+
+class AnnotatedFzf(pydymenu.FzfProtocol):
+    """fzf over `label<TAB>path` lines. Shows both, matches on the path only."""
+
+    def __init__(self, items: List[str], header: Optional[str] = None, **options):
+        self.header = header
+        super().__init__(items, **options)
+
+    def process_opts(self) -> List[str]:
+        flags = super().process_opts() + ["--delimiter=\t", "--nth=2.."]
+        if self.header:
+            flags += ["--header", self.header]
+        return flags
+
+
+class HistoryFzf(pydymenu.FzfProtocol):
+    """fzf over `HistorySearch` hits, scrolled to the line in preview."""
+
+    def process_opts(self) -> List[str]:
+        return super().process_opts() + [
+            "--delimiter=\t",
+            "--preview-window=+{3}-5",
+            "--exit-0",
+        ]
+
+
+def change_selector(changes: List[Change]) -> Selector:
+    """Selector showing lines added/removed next to each changed path."""
+    if not which("fzf"):
+        return interactive_select
+    labels = {change.path: change.label() for change in changes}
+
+    def annotated_fzf(
+        items: List[str],
+        prompt: str = " > ",
+        multi: bool = False,
+        preview: Optional[str] = None,
+    ) -> Optional[List[str]]:
+        if preview is not None:
+            preview = preview.replace("{}", "{2..}")  # the path column
+        picked = AnnotatedFzf(
+            [labels[item] for item in items],
+            header=summary(changes),
+            prompt=prompt,
+            multi=multi,
+            preview=preview,
+        ).select()
+        return None if picked is None else [line.split("\t", 1)[1] for line in picked]
+
+    return annotated_fzf
+
+
+def select(
+    items: List[str],
+    query: Optional[str] = None,
+    prompt: str = " > ",
+    multi: bool = False,
+    preview: Preview = None,
+    selector: Optional[Selector] = None,
+) -> Optional[List[str]]:
+    """Choose from `items` with `selector` (fzf by default).
+
+    A `query` skips the selector and returns the single best fuzzy match. A
+    callable `preview` is only built when a picker is actually shown.
+    """
+    start = time.perf_counter()
+    if query is not None:
+        best = path_index(items).best(query)
+        log.debug("best match for query %r: %s", query, best)
+        picked, picker = (None if best is None else [best]), "query"
+    else:
+        selector = interactive_select if selector is None else selector
+        if selector is not interactive_select:
+            preview = resolve_preview(preview)
+        picked = selector(items, prompt=prompt, multi=multi, preview=preview)
+        picker = getattr(selector, "__name__", type(selector).__name__)
+    event(
+        "picker",
+        picker=picker,
+        items=len(items),
+        picked=len(picked or []),
+        ms=round((time.perf_counter() - start) * 1000, 2),
+    )
+    return picked
+
+
+def file_preview(repo: Repository) -> str:
+    """Preview command for pickers over tracked files, skipping binaries."""
+    return preview_command(BlobClassifier(repo), repo.preview_app)
+
+
+def _fallback_select(items: List[str], prompt: str) -> Optional[List[str]]:
+    """Numbered menu of the top fuzzy matches, used when fzf is missing."""
+    print("`fzf` not found, using the built in matcher.")
+    try:
+        query = input(prompt).strip()
+        ranked = path_index(items).search(query, limit=10)
+        if not ranked:
+            return None
+        for number, item in enumerate(ranked, start=1):
+            print(f"{number:>3}  {item}")
+        choice = input("Choose number(s) [1]: ").strip() or "1"
+    except (EOFError, KeyboardInterrupt):
+        print()
+        return None  # Ctrl-D / Ctrl-C cancel like Esc in fzf
+    numbers = [int(n) for n in choice.split() if n.isdigit()]
+    picks = [ranked[n - 1] for n in numbers if 0 < n <= len(ranked)]
+    return picks or None
+
 
 class EditFiles(Actions):
-    def __init__(self, src_repo: Repository, editor: Optional[Editor] = None) -> None:
+    def __init__(
+        self,
+        src_repo: Repository,
+        editor: Optional[Editor] = None,
+        query: Optional[str] = None,
+        selector: Optional[Selector] = None,
+    ) -> None:
         self.repo: Repository = src_repo
         self.editor: Editor = find_editor() if editor is None else editor
-        logging.debug(f"Editing a file __init__ object complete.")
+        self.query = query
+        self.selector = selector
+        self.frecency = Frecency(self.repo.bare_repo)
+        log.debug("Editing a file __init__ object complete.")
 
-    def run(self) -> List[Path]:
-        edit_queue = pydymenu.fzf(
-            self.repo.list_all,
+    def run(self) -> Result:
+        edit_queue = self.choose(
+            self.frecency.order(self.repo.list_all),
             prompt="Pick file(s) to edit: ",
-            multi=True,
-            preview=f"{self.repo.preview_app}" + " {}",
+            cancelled="No selection made. Cancelling action.",
+            preview=lambda: file_preview(self.repo),
+            query=self.query,
         )
-        logging.debug(f"return of edit file selector: {edit_queue}")
-        if edit_queue is None:
-            sys.exit("No selection made. Cancelling action.")
-        else:
-            absolute_paths = [Path(sel).absolute() for sel in edit_queue]
-            logging.debug(f"absolute paths passed to {self.editor}:\n{absolute_paths}")
-            self.editor.open(absolute_paths)
-            self.repo.freshen()
-            return absolute_paths
+        log.debug("return of edit file selector: %s", edit_queue)
+        self.frecency.record(edit_queue)
+        absolute_paths = [Path(sel).absolute() for sel in edit_queue]
+        log.debug("absolute paths passed to %s:\n%s", self.editor, absolute_paths)
+        self.editor.open(absolute_paths)
+        self.repo.freshen()
+        return Result("edit", edit_queue, absolute_paths)
 
 
 class Clipboard(Actions):
     """Interactively select file paths to copy to the clipboard."""
 
-    def __init__(self, repo: Repository, clipper: Optional[Clipper] = None):
+    def __init__(
+        self,
+        repo: Repository,
+        clipper: Optional[Clipper] = None,
+        query: Optional[str] = None,
+        selector: Optional[Selector] = None,
+    ):
         self.repo = repo
         self.clipper = find_clipper() if clipper is None else clipper
+        self.query = query
+        self.selector = selector
+        self.frecency = Frecency(self.repo.bare_repo)
 
-    def run(self) -> List[str]:
-        # TODO: repo.preview_app is a weird hack, change later
-        clips = pydymenu.fzf(
-            self.repo.list_all,
+    def run(self) -> Result:
+        clips = self.choose(
+            self.frecency.order(self.repo.list_all),
             prompt="Pick files to add to the clipboard: ",
-            multi=True,
-            preview=f"{self.repo.preview_app}" + " {}",
+            cancelled="No selection made. Cancelling action.",
+            preview=lambda: file_preview(self.repo),
+            query=self.query,
         )
-        if clips is None:
-            sys.exit("No selection made. Cancelling action.")
-        else:
-            absolute_paths = [str((self.repo.work_tree / c).resolve()) for c in clips]
-            combined = " ".join(absolute_paths)
-            self.clipper.clip(combined)
-            return absolute_paths
+        self.frecency.record(clips)
+        absolute_paths = [str((self.repo.work_tree / c).resolve()) for c in clips]
+        combined = " ".join(absolute_paths)
+        self.clipper.clip(combined)
+        return Result("clip", clips, combined)
 
 
 class GitPassthrough(Actions):
@@ -74,81 +307,282 @@ class GitPassthrough(Actions):
 
     def run(self):
         os.chdir(self.repo.run_from)
-        subprocess.run(self.repo._git_base + self.cmd)
+        self.repo.git(self.cmd)
 
 
 class AddChanges(Actions):
-    def __init__(self, src_repo: Repository):
+    def __init__(self, src_repo: Repository, selector: Optional[Selector] = None):
         self.repo = src_repo
+        self.selector = selector
 
-    def run(self) -> List[str]:
+    def stage(self, files: List[str]) -> Result:
+        """`git add` the given files (relative to the work tree)."""
+        self.repo.git(["add", "-v", "--"] + files, cwd=self.repo.work_tree)
+        self.repo.freshen()
+        return Result("add", files)
+
+    def run(self) -> Result:
         modified_unstaged = self.repo.modified_unstaged
-        if modified_unstaged:
-            adding = pydymenu.fzf(
-                modified_unstaged,
-                prompt="Choose changes to add: ",
-                multi=True,
-                preview=f"{self.repo._git_str} diff --color --minimal -- " + "{}",
-            )
-            if adding is None:
-                sys.exit("No selection made. No changes will be staged.")
-            else:
-                subprocess.run(self.repo._git_base + ["add", "-v", "--"] + adding)
-                self.repo.freshen()
-                return adding
-        else:
-            sys.exit("No unstaged changes to 'add'.")
+        if not modified_unstaged:
+            raise NothingToDo("No unstaged changes to 'add'.")
+        changes = annotate(modified_unstaged, numstat(self.repo))
+        adding = self.choose(
+            [change.path for change in changes],
+            prompt="Choose changes to add: ",
+            cancelled="No selection made. No changes will be staged.",
+            preview=f"{self.repo._git_str} diff --color --minimal -- " + "{}",
+            default=change_selector(changes),
+        )
+        return self.stage(adding)
+
+
+class Discover(Actions):
+    """Find untracked config files in the work tree and stage the chosen ones."""
+
+    def __init__(self, src_repo: Repository, selector: Optional[Selector] = None):
+        self.repo = src_repo
+        self.selector = selector
+
+    def run(self) -> Result:
+        candidates = discover(self.repo)
+        if not candidates:
+            raise NothingToDo("No untracked config files found.")
+        adding = self.choose(
+            candidates,
+            prompt="Choose new files to track: ",
+            cancelled="No selection made. No files will be staged.",
+            preview=f"{self.repo.preview_app}" + " {}",
+        )
+        return AddChanges(self.repo).stage(adding)._replace(action="discover")
 
 
 class ExportTar(Actions):
-    def __init__(self, src_repo: Repository):
+    """Tarball of the tracked dotfiles (+ bare repo) with private rules applied.
+
+    Files matching a privatemask glob are left out and secrets found in the
+    others are redacted. The git history still holds the unmasked content, so
+    the bare repo is only included when nothing had to be masked.
+    """
+
+    def __init__(self, src_repo: Repository, mask: Optional[PrivateMask] = None):
         self.repo = src_repo
+        self.mask = PrivateMask(src_repo) if mask is None else mask
+        self.plan: Dict[str, Dict] = {}
 
-    def run(self):
-        # TODO: incorporate a 'privatemask' feature
+    def run(self) -> Result:
+        """Write the tarball. `Result.detail` is the tarball's path."""
         os.chdir(self.repo.work_tree)
         tarball = self.repo.work_tree / "dotfiles.tar.gz"
-        tar_cmd = (
-            ["tar", "cvzf", tarball]
-            + self.repo.list_all
-            + [self.repo.bare_repo.relative_to(self.repo.work_tree)]
-        )
-        subprocess.run(tar_cmd)
+        self.plan = self.mask.plan()
+        redacted = self.plan["redacted"]
+        masked = bool(self.plan["excluded"] or redacted)
+        exported = []
+        with tarfile.open(tarball, "w:gz") as tar:
+            for path in sorted(self.plan["clean"] + list(redacted)):
+                if not os.path.lexists(path):
+                    continue  # deleted from the work tree, not staged yet
+                info = tar.gettarinfo(path)
+                if path in redacted and info.isfile():
+                    data = redact(Path(path).read_bytes(), redacted[path])
+                    info.size = len(data)
+                    tar.addfile(info, io.BytesIO(data))
+                else:
+                    tar.add(path, recursive=False)
+                exported.append(path)
+            if not masked:
+                tar.add(str(self.repo.bare_repo.relative_to(self.repo.work_tree)))
+        return Result("export", exported, tarball)
+
+    def report(self, result: Result) -> None:
+        """Print the exported files and what the privatemask left out or redacted."""
+        print("\n".join(result.paths))
+        excluded, redacted = self.plan["excluded"], self.plan["redacted"]
+        if excluded or redacted:
+            print("-" * 20, "privatemask:", sep="\n")
+            for path, glob in sorted(excluded.items()):
+                print(f"  excluded  {path}  ({glob})")
+            for path, findings in sorted(redacted.items()):
+                hits = ", ".join(f"{name}@{line}" for name, _, _, line in findings)
+                print(f"  redacted  {path}  ({hits})")
+            print("  bare repo left out: its history holds the unmasked files")
         print(
             "-" * 20,
             "tarball ready. Place in work-tree and expand with:",
             "tar xvf dotfiles.tar.gz",
             sep="\n",
         )
-        return tarball
+
+
+class Snapshot(Actions):
+    """Mirror the tracked dotfiles into a new timestamped directory under `root`."""
+
+    def __init__(self, src_repo: Repository, root: str):
+        self.mirror = SnapshotMirror(src_repo, Path(root))
+
+    def run(self) -> Result:
+        """Take the snapshot. `Result.detail` is the snapshot directory."""
+        target = self.mirror.run()
+        return Result("snapshot", self.mirror.paths, target)
+
+    def report(self, result: Result) -> None:
+        counts = ", ".join(
+            f"{n} {how}" for how, n in sorted(self.mirror.counts.items())
+        )
+        print(
+            f"snapshot ready: {result.detail}",
+            f"{counts or 'no files'} in {self.mirror.elapsed:.2f}s",
+            f"{self.mirror.bytes_copied / 1024:.1f} KiB copied",
+            sep="\n",
+        )
+
+
+class WriteManifest(Actions):
+    """Write the manifest of the work tree to `destination` ("-" for stdout)."""
+
+    def __init__(self, src_repo: Repository, destination: str = "-"):
+        self.repo = src_repo
+        self.destination = destination
+
+    def run(self) -> Result:
+        """Write the manifest. `Result.detail` is the number of entries."""
+        if self.destination == "-":
+            count = write_manifest(self.repo, sys.stdout)
+        else:
+            with open(self.destination, "w") as out:
+                count = write_manifest(self.repo, out)
+        return Result("manifest", [self.destination], count)
+
+    def report(self, result: Result) -> None:
+        if self.destination != "-":  # stdout already holds the manifest
+            print(f"{result.detail} files written to {self.destination}")
+
+
+class CompareManifests(Actions):
+    """Report the drift between two manifests."""
+
+    labels = {
+        "added": "only in B",
+        "removed": "only in A",
+        "changed": "content differs",
+        "mode": "mode differs",
+    }
+
+    def __init__(self, first: str, second: str):
+        self.first = Path(first)
+        self.second = Path(second)
+
+    def run(self) -> Result:
+        """Compare. `Result.detail` maps each kind of drift to its paths."""
+        drift = compare_files(self.first, self.second)
+        drifted = sorted(path for paths in drift.values() for path in paths)
+        return Result("compare", drifted, drift)
+
+    def report(self, result: Result) -> None:
+        for kind, paths in result.detail.items():
+            if paths:
+                print(f"{self.labels[kind]} ({len(paths)}):")
+                print("\n".join(f"  {path}" for path in paths))
+        if not result.paths:
+            print(f"{self.first} and {self.second} match")
+
+
+class Deploy(Actions):
+    """Check out HEAD into `target`, backing up files that are in the way."""
+
+    def __init__(self, src_repo: Repository, target: str, rev: str = "HEAD"):
+        self.deployer = Deployer(src_repo, Path(target), rev)
+
+    def run(self, progress: Optional[DeployProgress] = None) -> Result:
+        """Deploy. `Result.detail` is the statistics from `Deployer.run()`."""
+        stats = self.deployer.run(progress)
+        return Result("deploy", [d.path for d in self.deployer.files], stats)
+
+    @staticmethod
+    @contextmanager
+    def progress_bar() -> Iterator[DeployProgress]:
+        """A `run(progress=)` callback drawing a transient progress bar."""
+        from rich.progress import Progress
+
+        from mydot.console import console
+
+        with Progress(console=console, transient=True) as bar:
+            task = bar.add_task("Deploying...", total=None)
+            yield lambda done, total: bar.update(task, completed=done, total=total)
+
+    def report(self, result: Result) -> None:
+        from mydot.console import console
+
+        stats = result.detail
+        if stats["backup"] is not None:
+            console.print(
+                f"{len(stats['conflicts'])} existing file(s) moved to "
+                f"[code]{stats['backup']}[/]"
+            )
+        seconds = max(stats["seconds"], 1e-6)
+        console.print(
+            f"{stats['written']} files written, {stats['unchanged']} already "
+            f"up to date in {seconds:.2f}s "
+            f"({stats['written'] / seconds:.0f} files/s, "
+            f"{stats['bytes'] / seconds / 1024 / 1024:.1f} MiB/s)"
+        )
 
 
 class RunExecutable(Actions):
-    def __init__(self, src_repo: Repository):
+    def __init__(
+        self,
+        src_repo: Repository,
+        query: Optional[str] = None,
+        selector: Optional[Selector] = None,
+        arguments: Optional[str] = None,
+    ):
+        """`arguments` skips the prompt for script arguments ("" for none)."""
         self.repo = src_repo
+        self.query = query
+        self.selector = selector
+        self.arguments = arguments
+        self.frecency = Frecency(self.repo.bare_repo)
+
+    def run(self) -> Result:
+        """Interactively choose an executable to run. Optionally add arguements.
 
-    def run(self) -> str:
-        """Interactively choose an executable to run. Optionally add arguements."""
-        exe = pydymenu.fzf(
-            self.repo.executables,
+        `Result.detail` is the finished process.
+        """
+        exe = self.choose(
+            self.frecency.order(self.repo.executables),
             prompt="Pick a file to run: ",
+            cancelled="No selection made. Cancelling action.",
             multi=False,
-            preview=f"{self.repo.preview_app}" + " {}",
+            preview=lambda: file_preview(self.repo),
+            query=self.query,
         )
-        if exe is None:
-            sys.exit("No selection made. Cancelling action.")
-        else:
-            self.selection = exe[0]
-            logging.debug(f"Executable file choosen: {self.selection}")
-            os.chdir(self.repo.work_tree)
-            command = self.script_plus_args(self.selection)
-            subprocess.run(command)
-            return str(exe[0])
+        self.selection = exe[0]
+        self.frecency.record(exe)
+        log.debug("Executable file choosen: %s", self.selection)
+        os.chdir(self.repo.work_tree)
+        command = self.script_plus_args(self.selection)
+        return Result("run", exe, subprocess.run(command))
 
     def script_plus_args(self, selection: str) -> List[str]:
-        """Optionally add arguements to a selected script."""
-        print("\nAdd script arguments, press ENTER to run\n")
+        """Optionally add arguements to a selected script.
+
+        Recently used argument lines are loaded into the readline history so
+        they can be recalled with the arrow keys.
+        """
+        if self.arguments is not None:
+            return [str(selection)] + self.arguments.split()
+        recent = self.frecency.recent_args(selection)
+        hint = " (up arrow for recent arguments)" if recent else ""
+        try:
+            import readline
+
+            readline.clear_history()
+            for line in reversed(recent):
+                readline.add_history(line)
+        except ImportError:
+            pass
+        print(f"\nAdd script arguments, press ENTER to run{hint}\n")
         script_args = input(f"{selection} ").strip()
+        self.frecency.remember_args(selection, script_args)
         if len(script_args) > 0:
             return [str(selection)] + script_args.split()
         else:
@@ -156,91 +590,506 @@ class RunExecutable(Actions):
 
 
 class Grep(Actions):
-    def __init__(self, src_repo: Repository, regexp: str):
+    def __init__(
+        self,
+        src_repo: Repository,
+        regexp: str,
+        selector: Optional[Selector] = None,
+        editor: Optional[Editor] = None,
+    ):
         self.repo = src_repo
         self.regexp = regexp
+        self.selector = selector
+        self.editor = editor
 
-    def run(self):
-        """Interactively choose dotfiles to open in text editor."""
-        # LATER make it work for multiple regex searches
+    def search(self) -> List[str]:
+        """Text files matching the regex."""
+        # binaries are known from the classification cache and never opened
+        text_files = BlobClassifier(self.repo).text_files()
+        if not text_files:
+            return []  # grep without files would read stdin
         proc = subprocess.run(
-            ["grep", "-I", "-l", self.regexp] + self.repo.list_all,
+            ["grep", "-I", "-l", self.regexp] + text_files,
             capture_output=True,
             text=True,
         )
-        hits = [h for h in proc.stdout.split("\n") if len(h) > 0]
+        return [h for h in proc.stdout.split("\n") if len(h) > 0]
+
+    def run(self) -> Result:
+        """Interactively choose dotfiles to open in text editor."""
+        # LATER make it work for multiple regex searches
+        hits = self.search()
         if len(hits) == 0:
-            sys.exit("No matches for your regex search found in tracked dotfiles.")
-        choices = pydymenu.fzf(
+            raise NothingToDo(
+                "No matches for your regex search found in tracked dotfiles."
+            )
+        choices = self.choose(
             hits,
             prompt="Choose files to open: ",
-            multi=True,
+            cancelled="No selections made. Cancelling action.",
             preview=f"grep {self.regexp} -n --context=3 --color=always" + " {}",
         )
-        if choices is not None:
-            editor = find_editor()
-            logging.debug(f"Grep.run() search term: {self.regexp}")
-            editor.open([Path(file).absolute() for file in choices], search=self.regexp)
-            self.repo.freshen()
-            return choices
-        else:
-            sys.exit("No selections made. Cancelling action.")
+        editor = find_editor() if self.editor is None else self.editor
+        log.debug("Grep.run() search term: %s", self.regexp)
+        editor.open([Path(file).absolute() for file in choices], search=self.regexp)
+        self.repo.freshen()
+        return Result("grep", choices, hits)
+
+
+def line_search(editor: Editor, line: int, pattern: str) -> str:
+    """`Editor.open(search=)` argument landing on `line` where the editor can."""
+    if isinstance(editor, (Vim, Neovim)):
+        return f"\\%{line}l"  # vim regex atom: matches in line `line`
+    return pattern
+
+
+class LiveGrep(Actions):
+    """Search as you type: fzf's query is the pattern, answered from memory."""
+
+    def __init__(
+        self, src_repo: Repository, query: str = "", editor: Optional[Editor] = None
+    ):
+        self.repo = src_repo
+        self.query = query
+        self.editor = editor
+
+    def fzf_command(self, client: str) -> List[str]:
+        preview = f"{self.repo.preview_app} {{1}}"
+        if self.repo.preview_app.startswith(("bat", "batcat")):
+            preview = f"{self.repo.preview_app} --highlight-line {{2}} {{1}}"
+        return [
+            "fzf",
+            "--disabled",
+            "--multi",
+            "--print-query",
+            f"--query={self.query}",
+            "--prompt=live grep> ",
+            "--delimiter=:",
+            f"--bind=change:reload:{client} {{q}} || true",
+            f"--preview={preview}",
+            "--preview-window=+{2}-5",
+        ]
+
+    def run(self) -> Result:
+        """Open the picked files, at the picked line. `Result.detail` is the hits."""
+        if not which("fzf"):
+            raise MissingProgram("--live-grep needs `fzf` in your $PATH.")
+        index = SearchIndex(self.repo).load()
+        with SearchServer(index) as server:
+            client = server.client_command()
+            initial = f"{client} {shlex.quote(self.query)}"
+            proc = subprocess.run(
+                self.fzf_command(client),
+                env=dict(os.environ, FZF_DEFAULT_COMMAND=initial),
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+        pattern, *hits = proc.stdout.splitlines() or [""]
+        hits = [hit for hit in hits if hit]
+        if not hits:
+            raise NoSelection("No selection made. Cancelling action.")
+        picks = [parse_hit(hit) for hit in hits]
+        files = list(dict.fromkeys(path for path, _, _ in picks))
+        editor = find_editor() if self.editor is None else self.editor
+        search = line_search(editor, picks[0][1], pattern)
+        editor.open([path.absolute() for path in files], search=search)
+        self.repo.freshen()
+        return Result("live-grep", [str(f) for f in files], hits)
+
+
+class GrepHistory(Actions):
+    """Search every version of every file in a revision range."""
+
+    def __init__(
+        self,
+        src_repo: Repository,
+        pattern: str,
+        revs: Optional[List[str]] = None,
+        selector: Optional[Selector] = None,
+        editor: Optional[Editor] = None,
+    ):
+        self.repo = src_repo
+        self.pattern = pattern
+        self.revs = revs or ["HEAD"]
+        self.selector = selector
+        self.editor = editor
+
+    def preview(self) -> str:
+        """The historic file, as of the hit's commit."""
+        show = f"{self.repo._git_str} show {{1}}:{{2}}"
+        if self.repo.preview_app.startswith(("bat", "batcat")):
+            app = self.repo.preview_app
+            return f"{show} | {app} --highlight-line {{3}} --file-name {{2}}"
+        return show
+
+    def pick(self, search: HistorySearch) -> Optional[List[str]]:
+        """Hits stream into fzf while the search runs, others get a list."""
+        prompt = f"{self.pattern} in history> "
+        hits = search.hits()
+        try:
+            if self.selector is not None or not which("fzf"):
+                items = list(hits)
+                if not items:
+                    return []
+                return select(
+                    items,
+                    prompt=prompt,
+                    multi=True,
+                    preview=self.preview(),
+                    selector=self.selector,
+                )
+            start = time.perf_counter()
+            picked = HistoryFzf(
+                hits, prompt=prompt, multi=True, preview=self.preview()
+            ).select()
+            event(
+                "picker",
+                picker="fzf-stream",
+                items=search.matches,
+                picked=len(picked or []),
+                ms=round((time.perf_counter() - start) * 1000, 2),
+            )
+            return picked
+        finally:
+            hits.close()
+
+    def run(self) -> Result:
+        """Open copies of the picked versions at the matching line."""
+        search = HistorySearch(self.repo, self.pattern, self.revs)
+        hits = self.pick(search)
+        if search.matches == 0:
+            raise NothingToDo(
+                f"No version of your dotfiles in {' '.join(self.revs)} matches "
+                f"{self.pattern!r}."
+            )
+        if not hits:
+            raise NoSelection("No selection made. Cancelling action.")
+        picks = [parse_history_hit(hit) for hit in hits]
+        versions = list(dict.fromkeys((commit, path) for commit, path, _, _ in picks))
+        copies = [historic_copy(self.repo, commit, path) for commit, path in versions]
+        editor = find_editor() if self.editor is None else self.editor
+        editor.open(copies, search=line_search(editor, picks[0][2], self.pattern))
+        return Result("grep-history", [f"{c}:{p}" for c, p in versions], hits)
 
 
 class Restore(Actions):
-    def __init__(self, src_repo: Repository) -> None:
+    def __init__(
+        self, src_repo: Repository, selector: Optional[Selector] = None
+    ) -> None:
         self.repo = src_repo
+        self.selector = selector
         self.result: Optional[List[str]] = None
 
-    def run(self) -> None:
+    def run(self) -> Result:
         # Guard clause when nothing to restore
-        if self.repo.restorables is None:
-            self.repo.show_status()
-            sys.exit("\nNo staged changes to restore.")
+        if not self.repo.restorables:
+            raise NothingToDo("No staged changes to restore.")
 
-        restores = pydymenu.fzf(
-            self.repo.restorables,
+        changes = annotate(self.repo.restorables, numstat(self.repo, "--staged"))
+        restores = self.choose(
+            [change.path for change in changes],
             prompt="Choose changes to REMOVE from the staging area: ",
-            multi=True,
+            cancelled="No selection made. No files will be unstaged.",
             preview=f"{self.repo._git_str} diff --color --minimal --staged -- " + "{}",
+            default=change_selector(changes),
         )
-        if restores:
-            subprocess.run(
-                self.repo._git_base + ["restore", "--staged", "--"] + restores
-            )
-            self.repo.freshen()
-            self.result = restores
-        else:
-            sys.exit("No selection made. No files will be unstaged.")
+        self.repo.git(["restore", "--staged", "--"] + restores, cwd=self.repo.work_tree)
+        self.repo.freshen()
+        self.result = restores
+        return Result("restore", restores)
 
 
 class DiscardChanges(Actions):
-    def __init__(self, src_repo: Repository) -> None:
+    def __init__(
+        self, src_repo: Repository, selector: Optional[Selector] = None
+    ) -> None:
         self.repo = src_repo
+        self.selector = selector
         self.result: Optional[List[str]] = None
 
-    def run(self):
+    def run(self) -> Result:
         """Discard changes from file(s) in the working directory."""
         unstaged = self.repo.modified_unstaged
 
         # Guard clause for when there are no unstaged changes.
-        if unstaged is None:
-            self.repo.show_status()
-            sys.exit("\nNo unstaged changes to discard.")
+        if not unstaged:
+            raise NothingToDo("No unstaged changes to discard.")
 
-        discards = pydymenu.fzf(
-            unstaged,
+        changes = annotate(unstaged, numstat(self.repo, "HEAD"))
+        discards = self.choose(
+            [change.path for change in changes],
             prompt="Choose changes to discard: ",
-            multi=True,
+            cancelled="No selection made. No changes will be discarded.",
             preview=f"{self.repo._git_str} diff --color --minimal HEAD -- " + "{}",
+            default=change_selector(changes),
         )
-        # Guard clause when no selection is made
-        if discards is None:
-            sys.exit("No selection made. No changes will be discarded.")
-
-        subprocess.run(self.repo._git_base + ["restore", "--"] + discards)
+        # keep a copy to bring back with --undo-discard
+        DiscardJournal(self.repo).save(discards)
+        self.repo.git(["restore", "--"] + discards, cwd=self.repo.work_tree)
         self.repo.freshen()
         self.result = discards
+        return Result("discard", discards)
+
+
+class UndoDiscard(Actions):
+    """Bring back changes thrown away by `DiscardChanges`."""
+
+    def __init__(
+        self, src_repo: Repository, selector: Optional[Selector] = None
+    ) -> None:
+        self.repo = src_repo
+        self.selector = selector
+        self.journal = DiscardJournal(src_repo)
+
+    def run(self) -> Result:
+        """`Result.detail` is the journal entry that was restored."""
+        entries = self.journal.entries()
+        if not entries:
+            raise NothingToDo("No discarded changes in the journal.")
+        expired = self.journal.expired(entries)
+        labels = [
+            f"#{number}  {self.journal.describe(entry)}"
+            + ("  (expired)" if number in expired else "")
+            for number, entry in enumerate(entries)
+        ]
+        picked = self.choose(
+            labels,
+            prompt="Choose discarded changes to bring back: ",
+            cancelled="No selection made. Nothing will be restored.",
+            multi=False,
+        )
+        entry = entries[labels.index(picked[0])]
+        restored = self.journal.restore(entry)
+        self.repo.freshen()
+        return Result("undo-discard", restored, entry)
+
+
+class ApplyProfile(Actions):
+    """Limit the work tree to a host profile with a sparse checkout."""
+
+    def __init__(self, src_repo: Repository, name: str = ""):
+        """`name` pins that profile, "" uses the host's, "all" turns it off."""
+        self.repo = src_repo
+        self.name = name
+        self.everything = 0  # tracked files, with or without the profile
+
+    def run(self) -> Result:
+        """`Result.detail` is the profile, None when every file is used."""
+        try:
+            profile = active_profile(name=self.name or None)
+        except (KeyError, ValueError) as error:
+            raise ProfileError(error.args[0]) from None
+        if profile is None and self.name != ALL:
+            raise NothingToDo(
+                f"No profile matches {socket.gethostname()}. "
+                f"Define one in {profiles_file()}"
+            )
+        args, patterns = sparse_checkout(profile)
+        proc = self.repo.git(
+            args,
+            input=patterns,
+            text=True,
+            capture_output=True,
+            cwd=self.repo.work_tree,
+        )
+        if proc.returncode != 0:
+            raise ProfileError(f"git sparse-checkout failed: {proc.stderr.strip()}")
+        pin_profile(self.repo.bare_repo, self.name or None)
+        self.everything = len(self.repo.tracked)
+        self.repo.profile = profile
+        self.repo.freshen()
+        return Result("profile", self.repo.list_all, profile)
+
+    def report(self, result: Result) -> None:
+        if result.detail is None:
+            print(f"Profiles off: all {self.everything} files are checked out.")
+        else:
+            print(
+                f"Profile {result.detail.name}: "
+                f"{len(result.paths)} of {self.everything} files."
+            )
+
+
+class Tune(Actions):
+    """Benchmark git on this repository and keep the settings that speed it up."""
+
+    def __init__(self, src_repo: Repository, runs: int = RUNS) -> None:
+        self.tuner = Tuner(src_repo, runs=runs)
+
+    def run(self) -> Result:
+        """Benchmark. `Result.paths` are the settings kept, `detail` the tuner."""
+        trials = self.tuner.run()
+        return Result(
+            "tune", [trial.setting.name for trial in trials if trial.kept], self.tuner
+        )
+
+    @staticmethod
+    @contextmanager
+    def status() -> Iterator[None]:
+        """A spinner for the CLI to show while `run()` times git."""
+        from mydot.console import console
+
+        with console.status("Benchmarking git settings..."):
+            yield
+
+    def report(self, result: Result) -> None:
+        from rich.table import Table
+
+        from mydot.console import console
+
+        tuner: Tuner = result.detail
+
+        def ms(timings) -> str:
+            return f"{sum(timings.values()) * 1000:.1f} ms"
+
+        table = Table(title="git settings")
+        for column in ["setting", "before", "after", "gain", "kept"]:
+            table.add_column(column)
+        for trial in tuner.trials:
+            table.add_row(
+                trial.setting.name,
+                ms(trial.before),
+                ms(trial.after),
+                f"{trial.gain:+.0%}",
+                "[green]yes[/]" if trial.kept else "no",
+            )
+        console.print(table)
+
+        summary = Table(title="timings")
+        for column in ["command", "before", "after"]:
+            summary.add_column(column)
+        for name, before in tuner.baseline.items():
+            after = tuner.final[name]
+            summary.add_row(name, f"{before * 1000:.1f} ms", f"{after * 1000:.1f} ms")
+        console.print(summary)
+
+
+class Sizes(Actions):
+    """Report what takes up space in the repository, now and in history."""
+
+    def __init__(self, src_repo: Repository, limit: int = 15):
+        self.sizes = SizeReport(src_repo)
+        self.limit = limit
+
+    def run(self) -> Result:
+        """Analyze. `Result.paths` are the largest files, `detail` the report."""
+        self.sizes.analyze()
+        largest = [blob.path for blob in self.sizes.largest_current(self.limit)]
+        return Result("sizes", largest, self.sizes)
+
+    @staticmethod
+    @contextmanager
+    def status() -> Iterator[None]:
+        """A spinner for the CLI to show while `run()` reads object sizes."""
+        from mydot.console import console
+
+        with console.status("Reading object sizes..."):
+            yield
+
+    def report(self, result: Result) -> None:
+        from rich.table import Table
+
+        from mydot.console import console
+
+        sizes: SizeReport = result.detail
+        totals = Table(title="object database")
+        for column in ["type", "objects", "size", "on disk"]:
+            totals.add_column(column, justify="right")
+        for kind, (count, size, disk) in sorted(sizes.totals().items()):
+            totals.add_row(kind, str(count), human_size(size), human_size(disk))
+        console.print(totals)
+
+        def blob_table(title: str, blobs) -> Table:
+            table = Table(title=title)
+            table.add_column("path")
+            for column in ["size", "on disk", "blob"]:
+                table.add_column(column, justify="right")
+            for blob in blobs:
+                table.add_row(
+                    blob.path,
+                    human_size(blob.size),
+                    human_size(blob.disk),
+                    blob.oid[:10],
+                )
+            return table
+
+        console.print(blob_table("largest files", sizes.largest_current(self.limit)))
+        console.print(
+            blob_table(
+                "largest blobs only in history",
+                sizes.largest_historic(self.limit),
+            )
+        )
+
+        directories = Table(title="by directory (all history)")
+        directories.add_column("directory")
+        for column in ["blobs", "size", "on disk", "history only"]:
+            directories.add_column(column, justify="right")
+        for usage in sizes.directories(self.limit):
+            directories.add_row(
+                usage.directory,
+                str(usage.blobs),
+                human_size(usage.size),
+                human_size(usage.disk),
+                human_size(usage.historic_disk),
+            )
+        console.print(directories)
+
+
+class Watch(Actions):
+    """Live view of staged, unstaged and deleted dotfiles: `--watch`."""
+
+    styles = {"staged": "green", "unstaged": "yellow", "deleted": "red"}
+
+    def __init__(self, src_repo: Repository, source=None, max_rows: int = 40):
+        self.watcher = StatusWatcher(src_repo, source)
+        self.max_rows = max_rows
+        self.sections: Dict[str, Any] = {}
+
+    def section(self, name: str):
+        from rich.text import Text
+
+        board = self.watcher.board
+        paths = board.section(name)
+        text = Text(f"{name} ({len(paths)})\n", style=f"bold {self.styles[name]}")
+        for path in paths[: self.max_rows]:
+            text.append(f"  {board.codes[path]} {path}\n", style="default")
+        if len(paths) > self.max_rows:
+            text.append(f"  ... and {len(paths) - self.max_rows} more\n", style="dim")
+        return text
+
+    def render(self):
+        """Rebuild only the sections the last batch touched."""
+        from rich.console import Group
+        from rich.text import Text
+
+        board = self.watcher.board
+        for name in board.dirty:
+            self.sections[name] = self.section(name)
+        board.dirty.clear()
+        footer = Text(
+            f"{len(self.watcher.tracked)} files watched ({self.watcher.method}), "
+            f"{board.queries} git queries, updated {time.strftime('%H:%M:%S')}. "
+            "Ctrl-C to quit",
+            style="dim",
+        )
+        return Group(*(self.sections[name] for name in SECTIONS), footer)
+
+    def run(self) -> Result:
+        from rich.live import Live
+
+        from mydot.console import console
+
+        updates = self.watcher.updates()
+        with Live(console=console, auto_refresh=False) as live:
+            try:
+                for _ in updates:
+                    live.update(self.render(), refresh=True)
+            except KeyboardInterrupt:
+                pass
+            finally:
+                updates.close()
+        return Result("watch", sorted(self.watcher.board.codes))
 
 
 # vim: foldlevel=1 :
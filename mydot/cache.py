@@ -0,0 +1,79 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+On-disk cache helpers shared by the fast paths of mydot.
+
+This module is imported by `--prompt` and must stay free of heavy imports
+(`rich`, `pydymenu`). Everything is stdlib only.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, List, Optional, Union
+
+# [st_mtime_ns, st_size] or None when the file is missing. A list (not a tuple)
+# so that stamps survive a json round trip and still compare equal.
+Stamp = Optional[List[int]]
+
+
+def cache_root() -> Path:
+    """Return $XDG_CACHE_HOME/mydot (defaults to ~/.cache/mydot)."""
+    base = os.getenv("XDG_CACHE_HOME") or os.path.join(Path.home(), ".cache")
+    return Path(base) / "mydot"
+
+
+def config_root() -> Path:
+    """Return $XDG_CONFIG_HOME/mydot (defaults to ~/.config/mydot)."""
+    base = os.getenv("XDG_CONFIG_HOME") or os.path.join(Path.home(), ".config")
+    return Path(base) / "mydot"
+
+
+def repo_slug(bare_repo: Union[Path, str]) -> str:
+    """Name of the per-repository cache directory.
+
+    The absolute path of the bare repo with '/' swapped for '%' so shell
+    scripts can derive the same name from $DOTFILES without starting Python.
+    """
+    return os.path.abspath(bare_repo).replace("/", "%")
+
+
+def repo_cache_dir(bare_repo: Union[Path, str]) -> Path:
+    """Cache directory for a single dotfiles repository."""
+    return cache_root() / repo_slug(bare_repo)
+
+
+def stat_stamp(path: Union[Path, str]) -> Stamp:
+    """Cheap change detector for a single file."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def stamps(*paths: Union[Path, str]) -> List[Stamp]:
+    return [stat_stamp(p) for p in paths]
+
+
+def load_json(path: Union[Path, str], default: Any = None) -> Any:
+    """Read a json cache file. Missing or corrupt files return `default`."""
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return default
+
+
+def dump_json(path: Union[Path, str], data: Any) -> None:
+    """Atomically replace a json cache file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as file:
+        json.dump(data, file, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+# vim: foldlevel=0:
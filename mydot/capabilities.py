@@ -0,0 +1,83 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+One shot discovery of the helper programs mydot knows how to drive.
+
+Every editor, clipboard app and previewer is looked up once and the result is
+stored in `$XDG_CACHE_HOME/mydot/capabilities.json`. The cache is keyed on
+$PATH, $EDITOR and the mtime of each $PATH directory (installing or removing
+a program changes its directory's mtime) so it invalidates itself.
+"""
+
+import os
+import shutil
+from typing import Dict, List, Optional
+
+from mydot.cache import cache_root, dump_json, load_json
+from mydot.logging import event
+
+EDITORS = ["nvim", "vim", "nano", "kate", "gedit"]
+CLIPPERS = ["xclip", "xsel", "pbcopy"]
+PREVIEWERS = ["bat", "batcat", "highlight"]
+PICKERS = ["fzf"]
+
+# results for this process, filled by the first call to probe()
+_found: Optional[Dict[str, Optional[str]]] = None
+
+
+def _cache_key() -> List:
+    path = os.getenv("PATH", "")
+    mtimes = []
+    for directory in path.split(os.pathsep):
+        try:
+            mtimes.append(os.stat(directory).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return [path, os.getenv("EDITOR", ""), mtimes]
+
+
+def _programs() -> List[str]:
+    programs = EDITORS + CLIPPERS + PREVIEWERS + PICKERS
+    editor = os.getenv("EDITOR")
+    if editor and editor not in programs:
+        programs.append(editor)
+    return programs
+
+
+def probe() -> Dict[str, Optional[str]]:
+    """Map each known program to its location on $PATH (None when missing)."""
+    global _found
+    if _found is not None:
+        return _found
+    cache_file = cache_root() / "capabilities.json"
+    key = _cache_key()
+    cached = load_json(cache_file, default={})
+    if cached.get("key") == key:
+        _found = cached["found"]
+        event("cache", name="capabilities", hit=True)
+    else:
+        _found = {program: shutil.which(program) for program in _programs()}
+        event("cache", name="capabilities", hit=False)
+        try:
+            dump_json(cache_file, {"key": key, "found": _found})
+        except OSError:
+            pass  # read-only home, keep working without the cache
+    return _found
+
+
+def which(program: str) -> Optional[str]:
+    """Drop-in for shutil.which() that answers known programs from the probe."""
+    found = probe()
+    if program in found:
+        return found[program]
+    return shutil.which(program)
+
+
+def forget() -> None:
+    """Drop the in-process results so the next call re-validates the cache."""
+    global _found
+    _found = None
+
+
+# vim: foldlevel=0:
@@ -0,0 +1,157 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+Text/binary classification of tracked files, cached per blob version.
+
+Each file is classified once as "text", "binary" or "symlink" together with
+its detected encoding and line count. Clean files are keyed by the blob oid
+recorded in the index, so the check runs once per version of a file no matter
+how often mydot runs. Files with unstaged changes have no blob yet and are
+keyed by path + stat stamp instead, so they are re-read only after they change
+on disk.
+
+Consumers: `Grep` only searches text files, pickers guard their previews with
+`preview_command()` and `NoBinaries` accepts a classifier for export filters.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import codecs
+import os
+from pathlib import Path
+import shlex
+from typing import Dict, Iterable, List, Optional
+
+from mydot.cache import dump_json, load_json, repo_cache_dir, stat_stamp
+from mydot.dotfile import BINARY_SNIFF, MODE_SYMLINK, Dotfile
+from mydot.logging import event
+from mydot.repository import Repository
+
+TEXT, BINARY, SYMLINK, MISSING = "text", "binary", "symlink", "missing"
+WORKERS = 8
+
+_BOMS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+
+def sniff(path: Path) -> List:
+    """[kind, encoding, line count] of the file at `path`."""
+    if os.path.islink(path):
+        return [SYMLINK, None, None]
+    try:
+        with open(path, "rb") as file:
+            data = file.read(BINARY_SNIFF)
+            bom = next((b for b in _BOMS if data.startswith(b[0])), None)
+            if bom is None and b"\x00" in data:
+                return [BINARY, None, None]  # without reading the rest
+            data += file.read()  # text: the line count needs all of it
+    except OSError:
+        return [MISSING, None, None]
+    if bom is not None:
+        return [TEXT, bom[1], data.count(b"\n")]
+    if data.isascii():
+        encoding = "ascii"
+    else:
+        try:
+            data.decode("utf-8")
+            encoding = "utf-8"
+        except UnicodeDecodeError:
+            encoding = "latin-1"
+    lines = data.count(b"\n") + (1 if data and not data.endswith(b"\n") else 0)
+    return [TEXT, encoding, lines]
+
+
+class BlobClassifier:
+    """Cached `sniff()` results for the files of a repository."""
+
+    def __init__(self, repo: Repository):
+        self.repo = repo
+        self.cache_dir = repo_cache_dir(repo.bare_repo)
+        self.cache_file = self.cache_dir / "blobs.json"
+        data = load_json(self.cache_file, default={})
+        # oid -> [kind, encoding, lines]
+        self.blobs: Dict[str, List] = data.get("blobs", {})
+        # path -> [stamp, [kind, encoding, lines]] for files with unstaged edits
+        self.dirty: Dict[str, List] = data.get("dirty", {})
+        self._dirty_paths = set(repo.modified_unstaged)
+        self._results: Optional[Dict[str, List]] = None
+
+    def info(self, dotfile: Dotfile) -> List:
+        """[kind, encoding, lines] for a single dotfile."""
+        if dotfile.mode == MODE_SYMLINK:
+            return [SYMLINK, None, None]
+        if dotfile.path in self._dirty_paths:
+            stamp = stat_stamp(dotfile.absolute)
+            cached = self.dirty.get(dotfile.path)
+            if cached is None or cached[0] != stamp:
+                cached = [stamp, sniff(dotfile.absolute)]
+                self.dirty[dotfile.path] = cached
+            return cached[1]
+        if dotfile.oid not in self.blobs:
+            self.blobs[dotfile.oid] = sniff(dotfile.absolute)
+        return self.blobs[dotfile.oid]
+
+    def is_binary(self, dotfile: Dotfile) -> bool:
+        return self.info(dotfile)[0] != TEXT
+
+    def classify_all(self) -> Dict[str, List]:
+        """Classify every file in the index, reading only cache misses.
+
+        Misses are read in a thread pool. Entries for blobs that are no longer
+        in the index are dropped so the cache never outgrows the repository.
+        """
+        if self._results is not None:
+            return self._results
+        records = list(self.repo.dotfiles())
+        misses = [
+            d
+            for d in records
+            if d.mode != MODE_SYMLINK
+            and (d.path in self._dirty_paths or d.oid not in self.blobs)
+        ]
+        event("cache", name="blobs", entries=len(records), misses=len(misses))
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            list(pool.map(self.info, misses))
+        self._results = {d.path: self.info(d) for d in records}
+        self.blobs = {d.oid: self.blobs[d.oid] for d in records if d.oid in self.blobs}
+        self.dirty = {p: v for p, v in self.dirty.items() if p in self._dirty_paths}
+        self.save()
+        return self._results
+
+    def text_files(self) -> List[str]:
+        return [path for path, info in self.classify_all().items() if info[0] == TEXT]
+
+    def non_text_files(self) -> List[str]:
+        return [path for path, info in self.classify_all().items() if info[0] != TEXT]
+
+    def save(self) -> None:
+        try:
+            dump_json(self.cache_file, {"blobs": self.blobs, "dirty": self.dirty})
+            self._write_lines(self.cache_dir / "non-text", self.non_text_files())
+        except OSError:
+            pass
+
+    @staticmethod
+    def _write_lines(path: Path, lines: Iterable[str]) -> None:
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text("".join(f"{line}\n" for line in lines))
+        os.replace(tmp, path)
+
+
+def preview_command(classifier: BlobClassifier, app: str) -> str:
+    """fzf --preview command running `app` on text files only.
+
+    Binaries and symlinks are looked up in the `non-text` list written by
+    `BlobClassifier.save()`, so the guard costs a grep instead of Python.
+    """
+    classifier.classify_all()
+    listing = shlex.quote(str(classifier.cache_dir / "non-text"))
+    return f"grep -qxF -- {{}} {listing} && echo '(binary file)' || {app} {{}}"
+
+
+# vim: foldlevel=0:
@@ -1,10 +1,11 @@
 # Mikey Garcia, @gikeymarcia
 # https://github.com/gikeymarcia/mydot
 
-import shutil
 import subprocess as sp
 from typing import Protocol
 
+from mydot.capabilities import which
+
 
 class Clipper(Protocol):
     name: str
@@ -20,7 +21,7 @@ class Clipper(Protocol):
 
     def has_app(self) -> bool:
         """Return true if this application is on the system, othewise false."""
-        return False if shutil.which(self.name) is None else True
+        return False if which(self.name) is None else True
 
 
 class Xclip(Clipper):
@@ -0,0 +1,99 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+Completion data for the bash/zsh completion scripts in `mydot/completions/`.
+
+The scripts never start Python on a tab press. They read plain text files,
+one path per line, from `$XDG_CACHE_HOME/mydot/<repo slug>/completion/`:
+
+    worktree        absolute path of the work tree
+    tracked         Repository.list_all, for `--query` and `git <command>`
+    executables     Repository.executables, for `--query` after `--run`
+    modified        files with staged or unstaged changes, for `git add` & co.
+    stamp           touched last; older than $DOTFILES/index or HEAD == stale
+
+When the stamp is stale the scripts run `mydot --completions-refresh` in the
+background and keep using the old data for the current tab press.
+"""
+
+import os
+from pathlib import Path
+from typing import Iterable, List
+
+from mydot.cache import repo_cache_dir
+from mydot.repository import Repository
+
+SHELLS = ["bash", "zsh"]
+SCRIPTS = {
+    "bash": Path(__file__).parent / "completions" / "mydot.bash",
+    "zsh": Path(__file__).parent / "completions" / "_mydot",
+}
+
+
+def completion_dir(repo: Repository) -> Path:
+    return repo_cache_dir(repo.bare_repo) / "completion"
+
+
+def is_stale(repo: Repository) -> bool:
+    """True when the index or HEAD changed after the data was written."""
+    try:
+        written = os.stat(completion_dir(repo) / "stamp").st_mtime_ns
+    except OSError:
+        return True
+    for watched in [repo.bare_repo / "index", repo.bare_repo / "HEAD"]:
+        try:
+            if os.stat(watched).st_mtime_ns > written:
+                return True
+        except OSError:
+            pass
+    return False
+
+
+def _write_lines(path: Path, lines: Iterable[str]) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w") as file:
+        for line in lines:
+            file.write(f"{line}\n")
+    os.replace(tmp, path)
+
+
+def write_completion_data(repo: Repository) -> Path:
+    """Write every completion section for `repo` and return the directory."""
+    target = completion_dir(repo)
+    target.mkdir(parents=True, exist_ok=True)
+    modified = sorted(set(repo.modified_unstaged + repo.restorables))
+    _write_lines(target / "worktree", [str(repo.work_tree)])
+    _write_lines(target / "tracked", repo.list_all)
+    _write_lines(target / "executables", repo.executables)
+    _write_lines(target / "modified", modified)
+    (target / "stamp").touch()
+    return target
+
+
+def refresh_completion_data(repo: Repository) -> bool:
+    """Rewrite the completion data only when it is stale. True if written.
+
+    Does nothing until the shell scripts asked for data at least once, so
+    users without completion installed never pay for it.
+    """
+    if not completion_dir(repo).is_dir() or not is_stale(repo):
+        return False
+    repo.freshen()
+    write_completion_data(repo)
+    return True
+
+
+def completion_script(shell: str, flags: List[str]) -> str:
+    """Completion script for `shell` with the CLI's current flags filled in."""
+    template = SCRIPTS[shell].read_text()
+    return template.replace("@FLAGS@", " ".join(sorted(flags)))
+
+
+def main() -> int:
+    """Entry point for `--completions-refresh`, called by the shell scripts."""
+    write_completion_data(Repository())
+    return 0
+
+
+# vim: foldlevel=0:
@@ -0,0 +1,87 @@
+# bash completion for mydot
+#
+#   source <(mydot --completion bash)
+#
+# Paths are read from the data files written by mydot (see mydot/completion.py)
+# so no Python process is started while completing.
+
+_mydot_flags="@FLAGS@"
+_mydot_git_cmds="add blame branch checkout commit config diff fetch grep log
+ls-files merge mv pull push rebase remote reset restore rm show stash status
+switch tag"
+
+# directory holding the completion data for $DOTFILES (see mydot/cache.py)
+_mydot_data_dir() {
+    local repo="${DOTFILES%/}"
+    printf -v "$1" '%s/mydot/%s/completion' \
+        "${XDG_CACHE_HOME:-$HOME/.cache}" "${repo//\//%}"
+}
+
+# fill COMPREPLY with the lines of a data section matching the current word,
+# pass a third argument to keep the paths relative to the work tree
+_mydot_section() {
+    local section="$1" cur="$2" relative="$3" dir worktree prefix=""
+    [[ -n "$DOTFILES" ]] || return
+    _mydot_data_dir dir
+    if [[ ! -e "$dir/stamp" ]]; then
+        command mydot --completions-refresh >/dev/null 2>&1
+    elif [[ "$DOTFILES/index" -nt "$dir/stamp" || "$DOTFILES/HEAD" -nt "$dir/stamp" ]]; then
+        (command mydot --completions-refresh >/dev/null 2>&1 &)
+    fi
+    [[ -r "$dir/$section" ]] || return
+    read -r worktree < "$dir/worktree"
+    # data is relative to the work tree, git runs from the current directory
+    [[ -z "$relative" && "$PWD" != "$worktree" ]] && prefix="$worktree/"
+    cur="${cur#"$prefix"}"
+    local IFS=$'\n'
+    COMPREPLY=($(awk -v p="$cur" -v pre="$prefix" \
+        'index($0, p) == 1 { print pre $0 }' "$dir/$section"))
+    compopt -o filenames 2>/dev/null
+}
+
+_mydot() {
+    local cur="${COMP_WORDS[COMP_CWORD]}" i
+    for ((i = 1; i < COMP_CWORD; i++)); do
+        if [[ "${COMP_WORDS[i]}" == git ]]; then
+            if ((COMP_CWORD == i + 1)); then
+                COMPREPLY=($(compgen -W "$_mydot_git_cmds" -- "$cur"))
+            elif [[ "$cur" == -* ]]; then
+                COMPREPLY=()
+            else
+                case "${COMP_WORDS[i + 1]}" in
+                    add | restore | diff | stash) _mydot_section modified "$cur" ;;
+                    *) _mydot_section tracked "$cur" ;;
+                esac
+            fi
+            return
+        fi
+    done
+    case "${COMP_WORDS[COMP_CWORD - 1]}" in
+        -q | --query)
+            if [[ " ${COMP_WORDS[*]} " == *" -r "* || " ${COMP_WORDS[*]} " == *" --run "* ]]; then
+                _mydot_section executables "$cur" relative
+            else
+                _mydot_section tracked "$cur" relative
+            fi
+            return
+            ;;
+        -g | --grep) return ;;
+        --log-level)
+            COMPREPLY=($(compgen -W "DEBUG INFO WARNING ERROR" -- "$cur"))
+            return
+            ;;
+        --compare | --manifest | --flight-log)
+            COMPREPLY=($(compgen -f -- "$cur"))
+            compopt -o filenames 2>/dev/null
+            return
+            ;;
+        --snapshot | --deploy)
+            COMPREPLY=($(compgen -d -- "$cur"))
+            compopt -o filenames 2>/dev/null
+            return
+            ;;
+    esac
+    COMPREPLY=($(compgen -W "$_mydot_flags git" -- "$cur"))
+}
+
+complete -F _mydot mydot d.
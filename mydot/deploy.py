@@ -0,0 +1,268 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+Check out a commit of the dotfiles repository into a work tree: `--deploy`
+
+Replaces the manual "clone, checkout, move the conflicting files away, check
+out again" dance on a new machine:
+
+1. `ls-tree` lists the files of the commit (mode, blob id, size).
+2. One `lstat()` pass over the target finds files that would be overwritten.
+   Files whose content already matches are left alone; anything else in the
+   way (a different file, a directory, a file where a directory has to go) is
+   a conflict.
+3. Conflicts are moved into `.mydot-backup-<time>/` inside the target. That
+   is a rename, unless a symlinked directory puts the conflict on another
+   file system, where `shutil.move` copies it over and removes the original.
+4. A single `git cat-file --batch` streams every blob and a thread pool
+   writes them out.
+
+When the target is the repository's own work tree its index is reset to the
+deployed commit, so `git status` is clean afterwards. A work tree that is
+already checked out with uncommitted changes is refused: those edits would be
+moved to the backup and the staged state lost. With a host profile
+(`mydot.profiles`) only its files are written and the others are left out of
+the work tree with a sparse checkout.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+from pathlib import Path
+import shutil
+import stat
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from mydot.dotfile import MODE_EXECUTABLE, MODE_SYMLINK, Dotfile
+from mydot.exceptions import DeployError, MissingObject
+from mydot.hashing import blob_oid
+from mydot.logging import git_event
+from mydot.profiles import sparse_checkout
+from mydot.repository import Repository
+
+WORKERS = 8
+BACKUP_PREFIX = ".mydot-backup-"
+
+Progress = Callable[[int, int], None]
+
+
+def cat_file_batch(git_base: List[str], oids: List[str]) -> Iterator[bytes]:
+    """Contents of `oids`, in order, from one `git cat-file --batch` process."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        git_base + ["cat-file", "--batch"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+    )
+    assert proc.stdin is not None and proc.stdout is not None
+
+    requests = "".join(f"{oid}\n" for oid in oids).encode()
+
+    def feed() -> None:
+        try:
+            proc.stdin.write(requests)  # type: ignore
+        finally:
+            proc.stdin.close()  # type: ignore
+
+    # writing all requests before reading would deadlock once the pipes fill up
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+    try:
+        for oid in oids:
+            header = proc.stdout.readline().split()
+            if len(header) != 3:
+                raise MissingObject(f"git cat-file: object {oid} is missing")
+            data = proc.stdout.read(int(header[2]))
+            proc.stdout.read(1)  # trailing newline
+            yield data
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        proc.wait()
+        feeder.join()
+        git_event(["cat-file", "--batch"], start, proc.returncode)
+
+
+class Deployer:
+    """Write the files of `rev` into `target`, moving conflicts out of the way."""
+
+    def __init__(self, repo: Repository, target: Path, rev: str = "HEAD"):
+        self.repo = repo
+        self.target = Path(target).expanduser().absolute()
+        self.rev = rev
+        self.files: List[Dotfile] = []
+        self.conflicts: List[str] = []
+        self.unchanged: List[str] = []
+        self.backup_dir: Optional[Path] = None
+        self.bytes_written = 0
+        self.elapsed = 0.0
+
+    def plan(self) -> Tuple[List[Dotfile], List[str]]:
+        """Files to write and conflicting paths, from a single stat pass."""
+        records = list(self.repo.dotfiles(self.rev))
+        parents = sorted({os.path.dirname(d.path) for d in records} - {""})
+        conflicts = set()
+        for parent in parents:
+            try:
+                st = os.stat(self.target / parent)  # a symlinked directory is fine
+            except FileNotFoundError:
+                if os.path.islink(self.target / parent):
+                    conflicts.add(parent)  # a dangling symlink is in the way
+                continue
+            except NotADirectoryError:
+                continue  # a file further up, found on its own
+            if not stat.S_ISDIR(st.st_mode):
+                conflicts.add(parent)
+        to_write = []
+        for dotfile in records:
+            if any(p in conflicts for p in self._ancestors(dotfile.path)):
+                to_write.append(dotfile)
+                continue
+            try:
+                st = os.lstat(self.target / dotfile.path)
+            except (FileNotFoundError, NotADirectoryError):
+                to_write.append(dotfile)
+                continue
+            if self._same(dotfile, st):
+                self.unchanged.append(dotfile.path)
+            else:
+                conflicts.add(dotfile.path)
+                to_write.append(dotfile)
+        self.files = to_write
+        self.conflicts = sorted(conflicts)
+        return self.files, self.conflicts
+
+    @staticmethod
+    def _ancestors(path: str) -> Iterator[str]:
+        while "/" in path:
+            path = path.rsplit("/", 1)[0]
+            yield path
+
+    def _same(self, dotfile: Dotfile, st: os.stat_result) -> bool:
+        """Does the existing file already hold this blob with the right type?"""
+        if dotfile.is_symlink != stat.S_ISLNK(st.st_mode):
+            return False
+        if not dotfile.is_symlink:
+            if not stat.S_ISREG(st.st_mode) or st.st_size != dotfile.size:
+                return False
+            if dotfile.is_executable != bool(st.st_mode & stat.S_IXUSR):
+                return False
+        return blob_oid(self.target / dotfile.path) == dotfile.oid
+
+    @property
+    def into_work_tree(self) -> bool:
+        return self.target == self.repo.work_tree.absolute()
+
+    def local_changes(self) -> List[str]:
+        """Uncommitted changes a deploy into the repository's work tree would lose.
+
+        Without an index the repository was never checked out here (a fresh
+        clone), so whatever is in the way only needs a backup.
+        """
+        if not self.into_work_tree or not (self.repo.bare_repo / "index").exists():
+            return []
+        return self.repo.short_status
+
+    def _git(self, args: List[str], stdin: Optional[str] = None) -> None:
+        proc = self.repo.git(args, input=stdin, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise DeployError(f"git {args[0]} failed: {proc.stderr.strip()}")
+
+    def backup(self) -> Optional[Path]:
+        """Move every conflict into one backup directory.
+
+        A failed move raises DeployError naming the conflicts already moved, so
+        they can be put back by hand.
+        """
+        if not self.conflicts:
+            return None
+        self.backup_dir = (
+            self.target / f"{BACKUP_PREFIX}{time.strftime('%Y%m%d-%H%M%S')}"
+        )
+        moved: List[str] = []
+        for path in self.conflicts:
+            destination = self.backup_dir / path
+            try:
+                destination.parent.mkdir(parents=True, exist_ok=True)
+                # a rename, or a copy when the path crosses onto another device
+                shutil.move(os.fspath(self.target / path), os.fspath(destination))
+            except OSError as error:
+                raise DeployError(
+                    f"could not back up {path}: {error}. "
+                    + (
+                        f"Already moved to {self.backup_dir}: {', '.join(moved)}"
+                        if moved
+                        else "Nothing was moved."
+                    )
+                ) from error
+            moved.append(path)
+        return self.backup_dir
+
+    def _write(self, dotfile: Dotfile, data: bytes) -> int:
+        path = self.target / dotfile.path
+        if dotfile.mode == MODE_SYMLINK:
+            os.symlink(os.fsdecode(data), path)
+            return len(data)
+        mode = 0o777 if dotfile.mode == MODE_EXECUTABLE else 0o666
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        return len(data)
+
+    def write(self, progress: Optional[Progress] = None) -> int:
+        """Write the planned files. `progress(done, total)` follows along."""
+        for parent in sorted({os.path.dirname(d.path) for d in self.files} - {""}):
+            (self.target / parent).mkdir(parents=True, exist_ok=True)
+        total, done = len(self.files), 0
+        contents = cat_file_batch(self.repo._git_base, [d.oid for d in self.files])
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            try:
+                jobs = [
+                    pool.submit(self._write, dotfile, data)
+                    for dotfile, data in zip(self.files, contents)
+                ]
+            finally:
+                contents.close()
+            for job in jobs:
+                self.bytes_written += job.result()
+                done += 1
+                if progress is not None:
+                    progress(done, total)
+        return done
+
+    def run(self, progress: Optional[Progress] = None) -> Dict:
+        start = time.perf_counter()
+        changes = self.local_changes()
+        if changes:
+            raise DeployError(
+                f"{len(changes)} uncommitted change(s) in {self.target}. Commit, "
+                "stash or --discard them first, or deploy into another directory."
+            )
+        self.target.mkdir(parents=True, exist_ok=True)
+        self.plan()
+        self.backup()
+        written = self.write(progress)
+        if self.into_work_tree:
+            self._git(["read-tree", self.rev])
+            if self.repo.profile is not None:
+                # files outside the profile were not written: skip them
+                args, patterns = sparse_checkout(self.repo.profile)
+                self._git(args, stdin=patterns)
+            self._git(["update-index", "-q", "--refresh"])
+            self.repo.freshen()
+        self.elapsed = time.perf_counter() - start
+        return {
+            "written": written,
+            "unchanged": len(self.unchanged),
+            "conflicts": self.conflicts,
+            "backup": self.backup_dir,
+            "bytes": self.bytes_written,
+            "seconds": self.elapsed,
+        }
+
+
+# vim: foldlevel=0:
@@ -0,0 +1,199 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+Find untracked config files in the work tree worth adding to the repository.
+
+`git status` runs with `--untracked-files=no` because walking all of $HOME is
+slow. This scanner walks it in parallel with `os.scandir`, but only where
+dotfiles live:
+
+- Prune rules (glob patterns) skip caches, `node_modules`, `.local/share`,
+  and so on. A pattern with a '/' is matched against the path relative to the
+  work tree, a leading '/' anchors it to the top. Other patterns match names.
+  Directories containing `.git` (other repositories) are always skipped.
+- Extra rules are read from `$XDG_CONFIG_HOME/mydot/discover-ignore`, one per
+  line. `!pattern` drops one of the default rules.
+- Each directory's mtime is cached with its scan result. A directory whose
+  mtime hasn't moved has had no entries added or removed, so it is answered
+  from the cache without a `scandir()`.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatchcase
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from mydot.cache import config_root, dump_json, load_json, repo_cache_dir
+from mydot.logging import event
+from mydot.repository import Repository
+
+MAX_DEPTH = 4
+MAX_SIZE = 1024 * 1024
+WORKERS = 16
+
+DEFAULT_RULES = [
+    # only hidden entries at the top of the work tree, not ~/Documents etc.
+    "/[!.]*",
+    ".git",
+    ".cache",
+    ".local/share",
+    ".local/state",
+    ".var",
+    ".npm",
+    ".cargo",
+    ".rustup",
+    ".mozilla",
+    ".Trash",
+    ".gnupg",
+    ".ssh/id_*",
+    "node_modules",
+    "__pycache__",
+    ".venv",
+    "venv",
+    "*_history",
+    ".viminfo",
+    ".lesshst",
+    "*.log",
+    "*.sqlite",
+    "*.db",
+]
+
+
+def config_rules_file() -> Path:
+    return config_root() / "discover-ignore"
+
+
+def load_rules(rules_file: Optional[Path] = None) -> List[str]:
+    """Default prune rules combined with the user's rules file."""
+    rules = list(DEFAULT_RULES)
+    try:
+        lines = (rules_file or config_rules_file()).read_text().splitlines()
+    except OSError:
+        lines = []
+    for line in (line.strip() for line in lines):
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("!"):
+            rules = [rule for rule in rules if rule != line[1:]]
+        else:
+            rules.append(line)
+    return rules
+
+
+class DiscoveryScanner:
+    """Parallel, pruned and mtime cached walk of a work tree."""
+
+    def __init__(
+        self,
+        work_tree: Path,
+        rules: Iterable[str],
+        skip: Iterable[Path] = (),
+        max_depth: int = MAX_DEPTH,
+        max_size: int = MAX_SIZE,
+        cache_file: Optional[Path] = None,
+    ):
+        self.root = work_tree
+        self.rules = list(rules)
+        self.anchored = [r for r in self.rules if "/" in r]
+        self.names = [r for r in self.rules if "/" not in r]
+        self.skip: Set[str] = {os.path.abspath(path) for path in skip}
+        self.max_depth = max_depth
+        self.max_size = max_size
+        self.cache_file = cache_file
+        # the cache only holds for the same rules and limits
+        key = "\n".join(self.rules + [str(max_size)] + sorted(self.skip))
+        self.key = hashlib.sha1(key.encode()).hexdigest()
+        cached = load_json(cache_file, default={}) if cache_file else {}
+        # relative dir -> [mtime_ns, [files], [subdirs]]
+        self.dirs: Dict[str, List] = (
+            cached.get("dirs", {}) if cached.get("key") == self.key else {}
+        )
+        self.visited: Dict[str, List] = {}
+        self.rescanned = 0
+
+    def pruned(self, rel: str, name: str) -> bool:
+        for rule in self.names:
+            if fnmatchcase(name, rule):
+                return True
+        for rule in self.anchored:
+            target = f"/{rel}" if rule.startswith("/") else rel
+            if fnmatchcase(target, rule):
+                return True
+        return False
+
+    def _scan_dir(self, rel: str) -> Tuple[List[str], List[str]]:
+        full = os.path.join(self.root, rel)
+        try:
+            mtime = os.stat(full).st_mtime_ns
+        except OSError:
+            return [], []
+        cached = self.dirs.get(rel)
+        if cached is not None and cached[0] == mtime:
+            self.visited[rel] = cached
+            return cached[1], cached[2]
+
+        self.rescanned += 1
+        files, subdirs = [], []
+        try:
+            with os.scandir(full) as entries:
+                for entry in entries:
+                    child = f"{rel}/{entry.name}" if rel else entry.name
+                    if entry.is_symlink() or self.pruned(child, entry.name):
+                        continue
+                    if entry.is_dir():
+                        if entry.path in self.skip:
+                            continue
+                        if os.path.exists(os.path.join(entry.path, ".git")):
+                            continue  # somebody else's repository
+                        subdirs.append(child)
+                    elif entry.is_file() and entry.stat().st_size <= self.max_size:
+                        files.append(child)
+        except OSError:
+            pass
+        self.visited[rel] = [mtime, files, subdirs]
+        return files, subdirs
+
+    def scan(self) -> List[str]:
+        """Every file under the work tree that survives pruning (relative)."""
+        found: List[str] = []
+        level = [""]
+        depth = 0
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            while level:
+                next_level: List[str] = []
+                for files, subdirs in pool.map(self._scan_dir, level):
+                    found.extend(files)
+                    next_level.extend(subdirs)
+                depth += 1
+                level = next_level if depth <= self.max_depth else []
+        event(
+            "cache",
+            name="discover",
+            directories=len(self.visited),
+            rescanned=self.rescanned,
+        )
+        if self.cache_file is not None:
+            try:
+                dump_json(self.cache_file, {"key": self.key, "dirs": self.visited})
+            except OSError:
+                pass
+        return sorted(found)
+
+
+def discover(repo: Repository, max_depth: int = MAX_DEPTH) -> List[str]:
+    """Untracked files in `repo.work_tree` that look like config files."""
+    scanner = DiscoveryScanner(
+        repo.work_tree,
+        load_rules(),
+        skip=[repo.bare_repo],
+        max_depth=max_depth,
+        cache_file=repo_cache_dir(repo.bare_repo) / "discover.json",
+    )
+    tracked = set(repo.list_all)
+    return [path for path in scanner.scan() if path not in tracked]
+
+
+# vim: foldlevel=0:
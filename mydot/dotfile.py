@@ -0,0 +1,204 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+`Dotfile` records and a lazy filter pipeline over them.
+
+Records are streamed straight out of `git ls-files -s -z` (the index) or
+`git ls-tree -r -l -z` (a tree) and filters are plain predicates applied with
+the builtin `filter()`, so a chain like
+
+    pipeline(repo.dotfiles(), Executable(), NoBinaries(), RelativeTo(".config"))
+
+never builds an intermediate list. Stop iterating early (`next()`,
+`itertools.islice`) and the git process is stopped too.
+"""
+
+from __future__ import annotations
+import os
+from pathlib import Path
+import subprocess
+import time
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Protocol
+
+from mydot.logging import git_event
+
+if TYPE_CHECKING:
+    from mydot.classify import BlobClassifier
+
+MODE_FILE = 0o100644
+MODE_EXECUTABLE = 0o100755
+MODE_SYMLINK = 0o120000
+MODE_GITLINK = 0o160000
+
+# git's own binary heuristic: a NUL byte in the first 8000 bytes
+BINARY_SNIFF = 8000
+
+
+class Dotfile:
+    """A single file known to git: path relative to the work tree + index data."""
+
+    __slots__ = ("path", "mode", "oid", "_size", "work_tree")
+
+    def __init__(
+        self,
+        path: str,
+        mode: int,
+        oid: str,
+        size: Optional[int],
+        work_tree: Path,
+    ):
+        self.path = path
+        self.mode = mode
+        self.oid = oid
+        self._size = size
+        self.work_tree = work_tree
+
+    def __repr__(self) -> str:
+        return f"Dotfile({self.path!r}, mode={self.mode:o}, oid={self.oid[:10]})"
+
+    def __str__(self) -> str:
+        return self.path
+
+    @property
+    def absolute(self) -> Path:
+        return self.work_tree / self.path
+
+    @property
+    def size(self) -> Optional[int]:
+        """Blob size from the tree, or the work tree size for index records."""
+        if self._size is None:
+            try:
+                self._size = os.lstat(self.absolute).st_size
+            except OSError:
+                return None
+        return self._size
+
+    @property
+    def is_executable(self) -> bool:
+        return self.mode == MODE_EXECUTABLE
+
+    @property
+    def is_symlink(self) -> bool:
+        return self.mode == MODE_SYMLINK
+
+
+def _stream_records(git_base: List[str], args: List[str]) -> Iterator[str]:
+    """Yield NUL terminated records from a git command as they arrive."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        git_base + args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    assert proc.stdout is not None
+    try:
+        pending = b""
+        for chunk in iter(lambda: proc.stdout.read1(65536), b""):  # type: ignore
+            pending += chunk
+            *records, pending = pending.split(b"\x00")
+            for record in records:
+                yield os.fsdecode(record)
+        if pending:
+            yield os.fsdecode(pending)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        proc.wait()
+        git_event(args, start, proc.returncode)
+
+
+def index_records(git_base: List[str], work_tree: Path) -> Iterator[Dotfile]:
+    """Dotfiles in the index: committed files plus staged changes.
+
+    Matches `Repository.list_all`. Sizes are read lazily from the work tree.
+    """
+    for record in _stream_records(git_base, ["ls-files", "--stage", "-z"]):
+        # <mode> SP <oid> SP <stage> TAB <path>
+        meta, path = record.split("\t", 1)
+        mode, oid, stage = meta.split(" ")
+        if stage == "0":
+            yield Dotfile(path, int(mode, 8), oid, None, work_tree)
+
+
+def tree_records(git_base: List[str], work_tree: Path, rev: str) -> Iterator[Dotfile]:
+    """Dotfiles committed in `rev` with blob sizes from the object database."""
+    cmd = ["ls-tree", "-r", "-l", "-z", "--full-tree", rev]
+    for record in _stream_records(git_base, cmd):
+        # <mode> SP <type> SP <oid> SP+ <size> TAB <path>
+        meta, path = record.split("\t", 1)
+        mode, kind, oid, size = meta.split()
+        if kind == "blob":
+            yield Dotfile(path, int(mode, 8), oid, int(size), work_tree)
+
+
+# Filters
+class Filter(Protocol):
+    """Predicate over dotfiles. Calling a filter lazily filters an iterable.
+
+    `cost` orders filters in a pipeline: 0 only reads the record, 1 touches
+    the file system.
+    """
+
+    cost: int = 0
+
+    def keep(self, dotfile: Dotfile) -> bool:
+        raise NotImplementedError
+
+    def __call__(self, dotfiles: Iterable[Dotfile]) -> Iterator[Dotfile]:
+        return filter(self.keep, dotfiles)
+
+
+class Executable(Filter):
+    """Files committed with the executable bit (mode 100755)."""
+
+    def keep(self, dotfile: Dotfile) -> bool:
+        return dotfile.mode == MODE_EXECUTABLE
+
+
+class RelativeTo(Filter):
+    """Files inside `directory` (relative to the work tree or absolute)."""
+
+    def __init__(self, directory: str, work_tree: Optional[Path] = None):
+        prefix = Path(directory)
+        if prefix.is_absolute() and work_tree is not None:
+            prefix = prefix.relative_to(work_tree)
+        self.prefix = f"{prefix.as_posix().strip('/')}/"
+
+    def keep(self, dotfile: Dotfile) -> bool:
+        return self.prefix == "./" or dotfile.path.startswith(self.prefix)
+
+
+class NoBinaries(Filter):
+    """Regular files whose first 8000 bytes hold no NUL byte (like git).
+
+    Pass a `BlobClassifier` to answer from its per blob cache instead of
+    opening every file.
+    """
+
+    cost = 1
+
+    def __init__(self, classifier: Optional[BlobClassifier] = None):
+        self.classifier = classifier
+
+    def keep(self, dotfile: Dotfile) -> bool:
+        if self.classifier is not None:
+            return not self.classifier.is_binary(dotfile)
+        if dotfile.mode not in (MODE_FILE, MODE_EXECUTABLE):
+            return False
+        try:
+            with open(dotfile.absolute, "rb") as file:
+                return b"\x00" not in file.read(BINARY_SNIFF)
+        except OSError:
+            return False
+
+
+def pipeline(source: Iterable[Dotfile], *filters: Filter) -> Iterator[Dotfile]:
+    """Chain `filters` over `source`, cheapest first. Nothing is evaluated
+    until the result is iterated."""
+    stream: Iterable[Dotfile] = source
+    for step in sorted(filters, key=lambda f: f.cost):
+        stream = step(stream)
+    return iter(stream)
+
+
+# vim: foldlevel=0:
@@ -2,12 +2,14 @@
 # https://github.com/gikeymarcia/mydot
 
 from __future__ import annotations
+import glob
 import os
-import shutil
+import socket
 import subprocess
 from pathlib import Path
 from typing import List, Protocol, Optional
-from mydot.logging import logging
+from mydot.capabilities import EDITORS, which
+from mydot.logging import log
 
 
 class Editor(Protocol):
@@ -21,6 +23,73 @@ class Editor(Protocol):
         """
         raise NotImplementedError
 
+    def open_remote(self, files: List[Path], search: Optional[str] = None) -> bool:
+        """
+        Optional capability: hand files to an already running instance instead
+        of paying for a cold start. Returns False when no instance is available
+        and the caller should fall back to starting the editor.
+        """
+        return False
+
+
+def _socket_alive(address: str) -> bool:
+    """True when something accepts connections on a unix socket or host:port."""
+    try:
+        if os.path.sep in address or ":" not in address:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(0.2)
+                sock.connect(address)
+        else:
+            host, port = address.rsplit(":", 1)
+            socket.create_connection((host, int(port)), timeout=0.2).close()
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def find_nvim_server() -> Optional[str]:
+    """
+    Address of a running Neovim RPC server, checked in order:
+        $NVIM                   set inside Neovim's :terminal
+        $NVIM_LISTEN_ADDRESS    same, for Neovim < 0.7
+        $MYDOT_NVIM_SERVER      address (or glob) given to `nvim --listen`
+    """
+    candidates = [os.getenv("NVIM"), os.getenv("NVIM_LISTEN_ADDRESS")]
+    if pattern := os.getenv("MYDOT_NVIM_SERVER"):
+        # newest socket first when a glob matches several instances
+        matches = glob.glob(pattern) or [pattern]
+        candidates += sorted(matches, key=_mtime, reverse=True)
+    for address in candidates:
+        if address and _socket_alive(address):
+            log.debug("Found running nvim server: %s", address)
+            return address
+    return None
+
+
+def vim_server_running(name: str) -> bool:
+    """True when `vim --serverlist` knows `name` (server names ignore case)."""
+    try:
+        proc = subprocess.run(
+            ["vim", "--serverlist"], capture_output=True, text=True, timeout=2
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    servers = proc.stdout.upper().split() if proc.returncode == 0 else []
+    log.debug("vim servers: %s", servers)
+    return name.upper() in servers
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0.0
+
+
+def _remote_search_keys(search: str) -> str:
+    """Keystrokes which leave any mode and search for `search`."""
+    return "<C-\\><C-N>/" + search.replace("<", "<lt>") + "<CR>"
+
 
 class UserDefinedEditor(Editor):
     """
@@ -33,10 +102,10 @@ class UserDefinedEditor(Editor):
         self.program = binary_name
 
     def open(self, files: List[Path], search: Optional[str] = None):
-        logging.debug(f"UserDefinedEditor:")
+        log.debug("UserDefinedEditor: %s", self.program)
         if search:
             pass
-        if shutil.which(self.program):
+        if which(self.program):
             print(f"Reading EDITOR={self.program} from environment")
             subprocess.run([self.program] + files)
         else:
@@ -50,11 +119,11 @@ class MissingEditor(Editor):
     program = "missing"
 
     def open(self, files: List[Path], search: Optional[str] = None):
-        logging.debug("entered MissingEditor.open()")
+        log.debug("entered MissingEditor.open()")
         if search is None:
             pass
         else:
-            logging.debug(f"Missing editor search term: {search}")
+            log.debug("Missing editor search term: %s", search)
             for file in files:
                 subprocess.run(
                     [
@@ -89,6 +158,8 @@ class Neovim(Editor):
     program = "nvim"
 
     def open(self, files: List[Path], search: Optional[str] = None):
+        if self.open_remote(files, search):
+            return
         count = len(files)
         base_cmd = ["nvim"]
         if search:
@@ -98,11 +169,25 @@ class Neovim(Editor):
         elif count > 1:
             subprocess.run(base_cmd + ["-O"] + files)
 
+    def open_remote(self, files: List[Path], search: Optional[str] = None) -> bool:
+        server = find_nvim_server()
+        if server is None or not files:
+            return False
+        remote = ["nvim", "--server", server]
+        if subprocess.run(remote + ["--remote"] + files).returncode != 0:
+            log.debug("nvim server %s refused the files", server)
+            return False
+        if search:
+            subprocess.run(remote + ["--remote-send", _remote_search_keys(search)])
+        return True
+
 
 class Vim(Editor):
     program = "vim"
 
     def open(self, files: List[Path], search: Optional[str] = None):
+        if self.open_remote(files, search):
+            return
         count = len(files)
         base_cmd = ["vim"]
         if search:
@@ -112,35 +197,57 @@ class Vim(Editor):
         elif count > 1:
             subprocess.run(base_cmd + ["-O"] + files)
 
+    def open_remote(self, files: List[Path], search: Optional[str] = None) -> bool:
+        """
+        Use a running Neovim server when there is one, otherwise a Vim compiled
+        with +clientserver named by $VIM_SERVERNAME (set in Vim's :terminal) or
+        $MYDOT_VIM_SERVER. The server has to show up in `vim --serverlist`, so a
+        stale name or a Vim without +clientserver falls back to a cold start.
+        """
+        if not files:
+            return False
+        if Neovim().open_remote(files, search):
+            return True
+        server = os.getenv("VIM_SERVERNAME") or os.getenv("MYDOT_VIM_SERVER")
+        if not server or not vim_server_running(server):
+            return False
+        remote = ["vim", "--servername", server]
+        if subprocess.run(remote + ["--remote-silent"] + files).returncode != 0:
+            log.debug("vim server %s refused the files", server)
+            return False
+        if search:
+            subprocess.run(remote + ["--remote-send", _remote_search_keys(search)])
+        return True
+
 
 def find_editor() -> Editor:
     """
     Find a suitable text editor and return as an Editor object.
     """
-    logging.debug("find_editor() begins")
+    log.debug("find_editor() begins")
     opts = {
         "nvim": Neovim(),
         "vim": Vim(),
         "nano": Nano(),
     }
     env = os.getenv("EDITOR", None)
-    logging.debug(f"env EDITOR={env}")
+    log.debug("env EDITOR=%s", env)
     if env:
         if env in opts:
             return opts[env]
         else:
             return UserDefinedEditor(env)
-    editors_to_try = ["nvim", "vim", "nano", "kate", "gedit"]
-    logging.debug(f"Searching for viable editors: {editors_to_try}")
+    editors_to_try = EDITORS
+    log.debug("Searching for viable editors: %s", editors_to_try)
     for ed in editors_to_try:
-        if shutil.which(ed):
-            logging.debug(f"Found editor in $PATH: {ed}")
+        if which(ed):
+            log.debug("Found editor in $PATH: %s", ed)
             if ed in opts:
                 return opts[ed]
             else:
                 return UserDefinedEditor(ed)
     else:
-        logging.debug(f"Failed to find any of: {editors_to_try}")
+        log.debug("Failed to find any of: %s", editors_to_try)
         return MissingEditor()
 
 
@@ -1,10 +1,50 @@
-class MissingRepositoryLocation(Exception):
+class MydotError(Exception):
+    """Base class of the errors mydot raises on purpose.
+
+    The message is written for the person at the terminal; the CLI prints it
+    and exits non-zero.
+    """
+
+
+class MissingRepositoryLocation(MydotError):
     pass
 
 
-class WorktreeMissing(Exception):
+class WorktreeMissing(MydotError):
     pass
 
 
-class MissingProgram(Exception):
+class MissingProgram(MydotError):
     pass
+
+
+class NothingToDo(MydotError):
+    """There is nothing for the action to work on (no changes, no matches)."""
+
+
+class NoSelection(MydotError):
+    """The selector returned nothing: the user cancelled."""
+
+
+class MissingObject(MydotError):
+    """A blob git was asked for is not in the repository (pruned or corrupt)."""
+
+
+class DeployError(MydotError):
+    """A deploy was refused, or git failed to record it."""
+
+
+class JournalError(MydotError):
+    """Discarded changes could not be saved to, or restored from, the journal."""
+
+
+class ManifestError(MydotError):
+    """A manifest file is missing, unreadable or malformed."""
+
+
+class MaskError(MydotError):
+    """A rule in the privatemask file can't be used."""
+
+
+class ProfileError(MydotError):
+    """The requested host profile doesn't exist."""
@@ -0,0 +1,124 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+Frecency (frequency + recency) of picker selections.
+
+Each selection adds 1 to a path's score, and scores halve every HALF_LIFE
+seconds. Because every entry decays at the same rate, the relative order of
+two entries never changes while time passes; it only changes when something is
+recorded. The ranked order is therefore computed once at record time, stored
+next to the scores and reused by every picker without sorting.
+
+The store lives in `$XDG_CACHE_HOME/mydot/<repo>/frecency.json`. It is bounded
+to MAX_ENTRIES paths and is compacted (scores decayed to "now", faded entries
+dropped) every COMPACT_EVERY records or once a day.
+"""
+
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from mydot.cache import dump_json, load_json, repo_cache_dir
+
+HALF_LIFE = 14 * 24 * 60 * 60  # two weeks
+MAX_ENTRIES = 500
+MAX_ARGS = 10
+COMPACT_EVERY = 50
+COMPACT_AGE = 24 * 60 * 60
+FADED = 0.05
+
+
+def _decayed(score: float, since: float, now: float) -> float:
+    return score * 0.5 ** ((now - since) / HALF_LIFE)
+
+
+class Frecency:
+    """Ranked history of selections for a single repository."""
+
+    def __init__(self, bare_repo: Path):
+        self.store_file = repo_cache_dir(bare_repo) / "frecency.json"
+        data = load_json(self.store_file, default={})
+        # path -> [score, time of last selection]
+        self.entries: Dict[str, List[float]] = data.get("entries", {})
+        self.ranked: List[str] = data.get("ranked", [])
+        # script -> recent argument lines, newest first
+        self.args: Dict[str, List[str]] = data.get("args", {})
+        self.records: int = data.get("records", 0)
+        self.compacted: float = data.get("compacted", time.time())
+
+    def order(self, candidates: List[str]) -> List[str]:
+        """`candidates` with remembered paths first, in ranked order.
+
+        Linear in the number of candidates; nothing is sorted per call.
+        """
+        available = set(candidates)
+        ranked = [path for path in self.ranked if path in available]
+        seen = set(ranked)
+        return ranked + [path for path in candidates if path not in seen]
+
+    def record(self, paths: List[str]) -> None:
+        """Count a selection of `paths` and persist the store."""
+        now = time.time()
+        for path in paths:
+            score, since = self.entries.get(path, (0.0, now))
+            self.entries[path] = [_decayed(score, since, now) + 1, now]
+        self.records += 1
+        if (
+            self.records >= COMPACT_EVERY
+            or len(self.entries) > MAX_ENTRIES
+            or now - self.compacted > COMPACT_AGE
+        ):
+            self.compact(now)
+        self._rank()
+        self.save()
+
+    def remember_args(self, script: str, line: str) -> None:
+        """Keep `line` as the newest argument line used with `script`."""
+        if not line:
+            return
+        history = [old for old in self.args.get(script, []) if old != line]
+        self.args[script] = [line] + history[: MAX_ARGS - 1]
+        self.save()
+
+    def recent_args(self, script: str) -> List[str]:
+        """Argument lines used with `script`, newest first."""
+        return self.args.get(script, [])
+
+    def compact(self, now: float) -> None:
+        """Decay every score to `now`, drop faded entries and cap the size."""
+        decayed = {
+            path: _decayed(score, since, now)
+            for path, (score, since) in self.entries.items()
+        }
+        keep = sorted(decayed, key=decayed.__getitem__, reverse=True)[:MAX_ENTRIES]
+        self.entries = {
+            path: [decayed[path], now] for path in keep if decayed[path] > FADED
+        }
+        self.records = 0
+        self.compacted = now
+
+    def _rank(self) -> None:
+        # comparing score * 2**(since / HALF_LIFE) is equivalent to comparing
+        # decayed scores at any single moment, and needs no "now"
+        def weight(path: str) -> float:
+            score, since = self.entries[path]
+            return score * 2 ** ((since - self.compacted) / HALF_LIFE)
+
+        self.ranked = sorted(self.entries, key=weight, reverse=True)
+
+    def save(self) -> None:
+        data = {
+            "entries": self.entries,
+            "ranked": self.ranked,
+            "args": self.args,
+            "records": self.records,
+            "compacted": self.compacted,
+        }
+        try:
+            dump_json(self.store_file, data)
+        except OSError:
+            pass  # history is a nicety, never fail an action over it
+
+
+# vim: foldlevel=0:
@@ -0,0 +1,238 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+In-process fuzzy matcher with fzf-like scoring.
+
+Used for `--query` (jump straight to the best match without a picker) and as
+the fallback selector when `fzf` is not installed.
+
+    index = path_index(repo.list_all)
+    index.best("nvim init")     # -> ".config/nvim/init.lua"
+
+Paths are interned once and stored next to a lowercased copy and a bitmask of
+the characters they contain. A query term is rejected with a single AND
+against that mask before any scoring happens, so most of a large repository
+never reaches the (pure Python) scoring loop. `path_index()` keeps the last
+few indexes, so asking again about the same paths skips the build.
+
+Scoring follows fzf's v1 algorithm: the shortest match window is found with
+a forward then a backward scan and scored with bonuses for matches at word
+boundaries, after path separators, on camelCase humps and for consecutive
+characters, minus penalties for gaps.
+"""
+
+from functools import lru_cache, reduce
+import heapq
+from operator import or_
+import sys
+from typing import Iterable, List, Optional, Tuple
+
+# scores from fzf's algo.go
+SCORE_MATCH = 16
+SCORE_GAP_START = -3
+SCORE_GAP_EXTENSION = -1
+BONUS_BOUNDARY = SCORE_MATCH // 2
+BONUS_NON_WORD = SCORE_MATCH // 2
+BONUS_CAMEL_123 = BONUS_BOUNDARY + SCORE_GAP_EXTENSION
+BONUS_CONSECUTIVE = -(SCORE_GAP_START + SCORE_GAP_EXTENSION)
+BONUS_FIRST_CHAR_MULTIPLIER = 2
+BONUS_BOUNDARY_WHITE = BONUS_BOUNDARY + 2
+BONUS_BOUNDARY_DELIMITER = BONUS_BOUNDARY + 1
+
+# character classes
+WHITE, NON_WORD, DELIMITER, LOWER, UPPER, LETTER, NUMBER = range(7)
+
+
+def _char_class(char: str) -> int:
+    if char.islower():
+        return LOWER
+    elif char.isupper():
+        return UPPER
+    elif char.isdigit():
+        return NUMBER
+    elif char.isalpha():
+        return LETTER
+    elif char.isspace():
+        return WHITE
+    elif char in "/,:;|":
+        return DELIMITER
+    return NON_WORD
+
+
+class _ClassTable(dict):
+    """char -> character class, filled on first sight of each character."""
+
+    def __missing__(self, char: str) -> int:
+        self[char] = _char_class(char)
+        return self[char]
+
+
+_CLASS = _ClassTable()
+
+
+def _bonus_for(prev: int, cur: int) -> int:
+    if cur > NON_WORD and cur != DELIMITER:
+        if prev == WHITE:
+            return BONUS_BOUNDARY_WHITE
+        elif prev == DELIMITER:
+            return BONUS_BOUNDARY_DELIMITER
+        elif prev == NON_WORD:
+            return BONUS_BOUNDARY
+    if (prev == LOWER and cur == UPPER) or (prev != NUMBER and cur == NUMBER):
+        return BONUS_CAMEL_123
+    if cur in (NON_WORD, DELIMITER):
+        return BONUS_NON_WORD
+    if cur == WHITE:
+        return BONUS_BOUNDARY_WHITE
+    return 0
+
+
+# bonus for every (previous class, current class) pair
+_BONUS = [[_bonus_for(prev, cur) for cur in range(7)] for prev in range(7)]
+
+
+class _BitTable(dict):
+    """char -> bit. One bit per letter and digit, a few for common path
+    punctuation and the rest of the characters folded into the remaining bits.
+    """
+
+    def __missing__(self, char: str) -> int:
+        self[char] = 1 << (_SPILL + ord(char) % (63 - _SPILL))
+        return self[char]
+
+
+_BITS = _BitTable()
+for _pos, _char in enumerate("abcdefghijklmnopqrstuvwxyz0123456789./-_ "):
+    _BITS[_char] = 1 << _pos
+_SPILL = len(_BITS)
+
+
+def char_mask(text: str) -> int:
+    """Bitmask of the characters in `text` (expects lowercase input)."""
+    return reduce(or_, map(_BITS.__getitem__, set(text)), 0)
+
+
+def _match_window(text: str, pattern: str) -> Optional[Tuple[int, int]]:
+    """Shortest [start, end) window of `text` containing `pattern` in order."""
+    pos = 0
+    for char in pattern:
+        pos = text.find(char, pos)
+        if pos < 0:
+            return None
+        pos += 1
+    end = pos
+    # walk back from the end to find the latest possible start
+    for char in reversed(pattern):
+        pos = text.rfind(char, 0, pos)
+    return pos, end
+
+
+def score(text: str, candidate: str, pattern: str, start: int, end: int) -> int:
+    """fzf v1 score of `pattern` found in `candidate[start:end]`.
+
+    `text` is the original string (for character classes) and `candidate`
+    the string that was searched (lowercased unless the query is case
+    sensitive).
+    """
+    classes = _CLASS
+    total = 0
+    pidx = 0
+    consecutive = 0
+    first_bonus = 0
+    in_gap = False
+    prev_class = classes[text[start - 1]] if start > 0 else DELIMITER
+    for idx in range(start, end):
+        cur_class = classes[text[idx]]
+        if candidate[idx] == pattern[pidx]:
+            total += SCORE_MATCH
+            bonus = _BONUS[prev_class][cur_class]
+            if consecutive == 0:
+                first_bonus = bonus
+            else:
+                if bonus >= BONUS_BOUNDARY and bonus > first_bonus:
+                    first_bonus = bonus
+                bonus = max(bonus, first_bonus, BONUS_CONSECUTIVE)
+            if pidx == 0:
+                total += bonus * BONUS_FIRST_CHAR_MULTIPLIER
+            else:
+                total += bonus
+            in_gap = False
+            consecutive += 1
+            pidx += 1
+        else:
+            total += SCORE_GAP_EXTENSION if in_gap else SCORE_GAP_START
+            in_gap = True
+            consecutive = 0
+            first_bonus = 0
+        prev_class = cur_class
+    return total
+
+
+class PathIndex:
+    """Precomputed lookup structure for fuzzy matching a list of paths."""
+
+    __slots__ = ("paths", "lowered", "masks")
+
+    def __init__(self, paths: Iterable[str]):
+        self.paths: List[str] = [sys.intern(p) for p in paths]
+        self.lowered: List[str] = [p.lower() for p in self.paths]
+        self.masks: List[int] = [char_mask(p) for p in self.lowered]
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """Paths matching every space separated term of `query`, best first.
+
+        Smart case like fzf: an uppercase letter makes the query case sensitive.
+        Ties are broken by shorter path, then by original order.
+        """
+        terms = query.split()
+        if not terms:
+            return list(self.paths if limit is None else self.paths[:limit])
+        case_sensitive = any(char.isupper() for char in query)
+        needed = reduce(or_, (char_mask(term.lower()) for term in terms))
+        haystack = self.paths if case_sensitive else self.lowered
+
+        survivors = [i for i, mask in enumerate(self.masks) if mask & needed == needed]
+        ranked = []
+        for idx in survivors:
+            candidate = haystack[idx]
+            windows = []
+            for term in terms:
+                window = _match_window(candidate, term)
+                if window is None:
+                    break
+                windows.append(window)
+            else:
+                path = self.paths[idx]
+                total = sum(
+                    score(path, candidate, term, *window)
+                    for term, window in zip(terms, windows)
+                )
+                ranked.append((total, -len(path), -idx))
+
+        if limit is None:
+            ranked.sort(reverse=True)
+        else:
+            ranked = heapq.nlargest(limit, ranked)
+        return [self.paths[-neg_idx] for _, _, neg_idx in ranked]
+
+    def best(self, query: str) -> Optional[str]:
+        """The single highest ranked path for `query` or None."""
+        hits = self.search(query, limit=1)
+        return hits[0] if hits else None
+
+
+def path_index(paths: Iterable[str]) -> PathIndex:
+    """A `PathIndex` of `paths`, reused while the same paths are asked about."""
+    return _cached_index(tuple(paths))
+
+
+@lru_cache(maxsize=4)
+def _cached_index(paths: Tuple[str, ...]) -> PathIndex:
+    return PathIndex(paths)
+
+
+# vim: foldlevel=0:
@@ -0,0 +1,102 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+git blob ids of work tree files without a `git hash-object` per file.
+
+Files git reports as clean already have their blob id in the index. Only files
+with unstaged edits (or outside any index) are hashed, in a thread pool
+(hashlib releases the GIL on large buffers), and each result is cached with
+the file's stat stamp so it is computed again only after the file changes.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from mydot.cache import dump_json, load_json, repo_cache_dir, stat_stamp
+from mydot.repository import Repository
+
+WORKERS = 8
+
+
+def blob_oid(path: Path, algorithm: str = "sha1") -> Optional[str]:
+    """What `git hash-object` prints for `path` (symlinks hash their target)."""
+    try:
+        if os.path.islink(path):
+            data = os.fsencode(os.readlink(path))
+        else:
+            data = Path(path).read_bytes()
+    except OSError:
+        return None
+    digest = hashlib.new(algorithm, f"blob {len(data)}\0".encode())
+    digest.update(data)
+    return digest.hexdigest()
+
+
+class OidCache:
+    """Blob ids keyed by absolute path and valid for one stat stamp."""
+
+    def __init__(self, cache_file: Path, algorithm: str = "sha1"):
+        self.cache_file = cache_file
+        self.algorithm = algorithm
+        data = load_json(cache_file, default={})
+        # path -> [stamp, oid]
+        self.entries: Dict[str, List] = (
+            data.get("entries", {}) if data.get("algorithm") == algorithm else {}
+        )
+        self.hashed = 0
+
+    def oid(self, path: Path) -> Optional[str]:
+        key = str(path)
+        stamp = stat_stamp(path)
+        cached = self.entries.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        oid = blob_oid(path, self.algorithm)
+        self.hashed += 1
+        self.entries[key] = [stamp, oid]
+        return oid
+
+    def oids(self, paths: Iterable[Path]) -> List[Optional[str]]:
+        """`oid()` of every path, cache misses hashed in parallel."""
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            return list(pool.map(self.oid, paths))
+
+    def save(self) -> None:
+        try:
+            data = {"algorithm": self.algorithm, "entries": self.entries}
+            dump_json(self.cache_file, data)
+        except OSError:
+            pass
+
+
+def work_tree_oids(repo: Repository, cache: Optional[OidCache] = None) -> Dict:
+    """{path: blob id of the work tree content} for every file in `list_all`.
+
+    Missing files are left out.
+    """
+    index = {d.path: d.oid for d in repo.dotfiles()}
+    algorithm = "sha256" if any(len(o) == 64 for o in index.values()) else "sha1"
+    if cache is None:
+        cache_file = repo_cache_dir(repo.bare_repo) / "oids.json"
+        cache = OidCache(cache_file, algorithm)
+    dirty = set(repo.modified_unstaged)
+    result: Dict[str, str] = {}
+    to_hash = []
+    for path in repo.list_all:
+        if path in dirty or path not in index:
+            to_hash.append(path)
+        elif os.path.lexists(repo.work_tree / path):
+            result[path] = index[path]
+    hashed = cache.oids(repo.work_tree / path for path in to_hash)
+    result.update((p, oid) for p, oid in zip(to_hash, hashed) if oid is not None)
+    live = {str(repo.work_tree / path) for path in to_hash}
+    cache.entries = {k: v for k, v in cache.entries.items() if k in live}
+    cache.save()
+    return dict(sorted(result.items()))
+
+
+# vim: foldlevel=0:
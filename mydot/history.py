@@ -0,0 +1,183 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+Search every version of the dotfiles: `--grep-history PATTERN`
+
+One `git log --raw -z` over the revision range lists the blob each commit wrote
+for each path. A file version that comes back unchanged (a revert, the same
+`.zshrc` on two branches) is the same blob, so every blob is searched once and
+credited to the newest commit that wrote it. The blobs are dealt out to a pool
+of workers, each reading its share from its own `git cat-file --batch`, and
+hits are yielded as soon as a worker finds them so the picker fills up while
+the search runs.
+
+Hits are `commit<TAB>path<TAB>line<TAB>text`, abbreviated commit first: paths
+may hold colons, so unlike `--live-grep` the fields are split on tabs, and
+paths with a tab or a line break are left out. Patterns follow
+`--live-grep`: Python regexes, smart case, searched literally when they don't
+compile.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+from pathlib import Path
+import queue
+import re
+import threading
+from typing import Dict, Iterator, List, NamedTuple, Sequence, Tuple
+
+from mydot.cache import repo_cache_dir
+from mydot.deploy import cat_file_batch
+from mydot.livegrep import compile_pattern, matching_lines
+from mydot.logging import event
+from mydot.repository import Repository
+
+WORKERS = 4
+ABBREV = 10
+BINARY_SNIFF = 8000  # bytes checked for NUL, like git's own heuristic
+NULL_OID = "0" * 40
+REGULAR_MODES = ("100644", "100755")
+SEPARATOR = "\t"
+# str.splitlines() boundaries other than "\n", which never reaches a hit
+LINE_BREAKS = re.compile("[\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
+
+
+class Version(NamedTuple):
+    """A blob as first seen walking back from the tip: who wrote it, where."""
+
+    oid: str
+    commit: str
+    path: str
+
+
+def versions(repo: Repository, revs: Sequence[str] = ("HEAD",)) -> List[Version]:
+    """Distinct file versions written in `revs`, newest first.
+
+    Merges are diffed against each parent (`-m`) so conflict resolutions count
+    and root commits against the empty tree (`--root`) so their files do too.
+    """
+    output = repo.git(
+        ["log", "--raw", "-z", "-m", "--root", "--no-abbrev", "--no-renames"]
+        + ["--format=commit %H"]
+        + list(revs)
+        + ["--"],
+        capture_output=True,
+    ).stdout
+    seen: Dict[str, Version] = {}
+    commit = ""
+    # with -z: "commit <id>" NUL, then ":<meta>" NUL <path> NUL per file
+    fields = iter(os.fsdecode(output).split("\0"))
+    for field in fields:
+        field = field.lstrip("\n")
+        if field.startswith("commit "):
+            commit = field[7:]
+        elif field.startswith(":"):
+            path = next(fields, "")
+            _, mode, _, oid, _ = field.split()
+            if any(char in path for char in (SEPARATOR, "\n", "\r")):
+                continue  # can't be a field on one line of the picker
+            if oid != NULL_OID and mode in REGULAR_MODES and oid not in seen:
+                seen[oid] = Version(oid, commit, path)
+    return list(seen.values())
+
+
+def one_line(text: str) -> str:
+    """`text` without the CR of CRLF files or any other line break in it."""
+    return LINE_BREAKS.sub(" ", text.rstrip("\r"))
+
+
+def parse_hit(hit: str) -> Tuple[str, str, int, str]:
+    """(commit, path, line, text) from a `HistorySearch` hit."""
+    commit, path, line, text = hit.split(SEPARATOR, 3)
+    return commit, path, int(line), text
+
+
+def historic_copy(repo: Repository, commit: str, path: str) -> Path:
+    """`path` as of `commit`, written to the cache so an editor can open it."""
+    copy = repo_cache_dir(repo.bare_repo) / "history" / commit / path
+    copy.parent.mkdir(parents=True, exist_ok=True)
+    copy.write_bytes(repo.blob(commit, path))
+    return copy
+
+
+class HistorySearch:
+    """`PATTERN` over every distinct blob in a revision range."""
+
+    def __init__(
+        self,
+        repo: Repository,
+        pattern: str,
+        revs: Sequence[str] = ("HEAD",),
+        workers: int = WORKERS,
+    ):
+        self.repo = repo
+        self.pattern = compile_pattern(pattern)
+        self.revs = list(revs)
+        self.workers = workers
+        self.searched = 0  # blobs read by the last `hits()`
+        self.matches = 0  # lines yielded by the last `hits()`
+
+    def _scan(self, version: Version, data: bytes) -> List[str]:
+        if b"\0" in data[:BINARY_SNIFF]:
+            return []
+        text = data.decode(errors="replace")
+        return [
+            SEPARATOR.join(
+                (version.commit[:ABBREV], version.path, str(line), one_line(content))
+            )
+            for line, content in matching_lines(self.pattern, text)
+        ]
+
+    def _work(
+        self, chunk: List[Version], out: queue.Queue, stop: threading.Event
+    ) -> int:
+        """Search `chunk`, putting lists of hits on `out`. Returns blobs read."""
+        read = 0
+        contents = cat_file_batch(self.repo._git_base, [v.oid for v in chunk])
+        try:
+            for version, data in zip(chunk, contents):
+                if stop.is_set():
+                    break
+                read += 1
+                hits = self._scan(version, data)
+                if hits:
+                    out.put(hits)
+        finally:
+            contents.close()
+            out.put(None)  # this worker is done
+        return read
+
+    def hits(self) -> Iterator[str]:
+        """Matching lines, streamed in the order the workers find them."""
+        found = versions(self.repo, self.revs)
+        # dealt round robin so every worker starts on recent versions
+        chunks = [found[i :: self.workers] for i in range(self.workers)]
+        chunks = [chunk for chunk in chunks if chunk]
+        out: queue.Queue = queue.Queue()
+        stop = threading.Event()
+        pool = ThreadPoolExecutor(max_workers=max(len(chunks), 1))
+        jobs = [pool.submit(self._work, chunk, out, stop) for chunk in chunks]
+        self.matches = 0
+        try:
+            running = len(jobs)
+            while running:
+                hits = out.get()
+                if hits is None:
+                    running -= 1
+                    continue
+                self.matches += len(hits)
+                yield from hits
+        finally:
+            stop.set()  # the picker may close before the search finishes
+            pool.shutdown(wait=True)
+            self.searched = sum(job.result() for job in jobs)  # raises their errors
+            event(
+                "grep-history",
+                blobs=len(found),
+                searched=self.searched,
+                hits=self.matches,
+            )
+
+
+# vim: foldlevel=0:
@@ -0,0 +1,160 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+Undo journal for `--discard`: `--undo-discard`
+
+Before `git restore` throws work tree changes away, the files are written to
+the object database with a single `git hash-object -w --stdin-paths` call,
+however many were picked. The journal (in the cache directory) records when
+that happened and which blob each path held; files that were deleted or were
+symlinks are recorded as such. Bringing an entry back streams the blobs from
+one `git cat-file --batch`, after journaling what is about to be overwritten
+so an undo can be undone too.
+
+Caveat: the saved blobs are not reachable from any commit. `git gc` prunes
+unreachable objects once they are older than `gc.pruneExpire` (two weeks by
+default), after which their journal entries are shown as expired.
+"""
+
+import os
+from pathlib import Path
+import stat
+import time
+from typing import Dict, List, Optional, Set
+
+from mydot.cache import dump_json, load_json, repo_cache_dir
+from mydot.deploy import cat_file_batch
+from mydot.exceptions import JournalError, MissingObject
+from mydot.repository import Repository
+
+MAX_ENTRIES = 100
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# {"time": float, "reason": str, "files": {path: record}} where a record is
+# {"oid": blob, "mode": int}, {"link": target} or {"deleted": True}
+Entry = Dict
+
+
+class DiscardJournal:
+    """Saved copies of discarded files, newest entry first."""
+
+    def __init__(self, repo: Repository):
+        self.repo = repo
+        self.file = repo_cache_dir(repo.bare_repo) / "discard-journal.json"
+
+    def entries(self) -> List[Entry]:
+        return load_json(self.file, default=[])
+
+    def _record(self, path: str) -> Optional[Dict]:
+        """What is at `path` now. None for regular files, hashed in bulk later."""
+        full = self.repo.work_tree / path
+        try:
+            st = os.lstat(full)
+        except FileNotFoundError:
+            return {"deleted": True}
+        if stat.S_ISLNK(st.st_mode):
+            return {"link": os.readlink(full)}
+        if not stat.S_ISREG(st.st_mode):
+            raise JournalError(f"Can't save {path}: not a regular file.")
+        return None
+
+    def save(self, paths: List[str], reason: str = "discard") -> Entry:
+        """Write the current content of `paths` to git and journal it."""
+        files = {path: self._record(path) for path in paths}
+        regular = [path for path, record in files.items() if record is None]
+        if any("\n" in path for path in regular):
+            raise JournalError("Can't save file names containing a newline.")
+        if regular:
+            proc = self.repo.git(
+                ["hash-object", "-w", "--no-filters", "--stdin-paths"],
+                input="".join(f"{path}\n" for path in regular),
+                capture_output=True,
+                text=True,
+                cwd=self.repo.work_tree,
+            )
+            oids = proc.stdout.split()
+            if proc.returncode != 0 or len(oids) != len(regular):
+                raise JournalError(
+                    f"Could not save the files before discarding: {proc.stderr.strip()}"
+                )
+            for path, oid in zip(regular, oids):
+                mode = os.stat(self.repo.work_tree / path).st_mode & 0o7777
+                files[path] = {"oid": oid, "mode": mode}
+        entry = {"time": time.time(), "reason": reason, "files": files}
+        dump_json(self.file, ([entry] + self.entries())[:MAX_ENTRIES])
+        return entry
+
+    def expired(self, entries: List[Entry]) -> Set[int]:
+        """Positions of the entries whose blobs `git gc` already pruned."""
+        oids = {
+            record["oid"]
+            for entry in entries
+            for record in entry["files"].values()
+            if "oid" in record
+        }
+        if not oids:
+            return set()
+        proc = self.repo.git(
+            ["cat-file", "--batch-check"],
+            input="".join(f"{oid}\n" for oid in oids),
+            capture_output=True,
+            text=True,
+        )
+        missing = {
+            line.split()[0]
+            for line in proc.stdout.splitlines()
+            if line.endswith(" missing")
+        }
+        return {
+            number
+            for number, entry in enumerate(entries)
+            if any(r.get("oid") in missing for r in entry["files"].values())
+        }
+
+    @staticmethod
+    def describe(entry: Entry, width: int = 3) -> str:
+        when = time.strftime(TIME_FORMAT, time.localtime(entry["time"]))
+        paths = sorted(entry["files"])
+        shown = ", ".join(paths[:width]) + (", ..." if len(paths) > width else "")
+        return f"{when}  {entry['reason']}  {len(paths)} file(s): {shown}"
+
+    def _write(self, path: Path, data: bytes, mode: int) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.is_symlink():
+            path.unlink()
+        tmp = path.with_name(f".{path.name}.mydot-undo")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+
+    def restore(self, entry: Entry) -> List[str]:
+        """Put the journaled content back. Returns the paths touched."""
+        files: Dict[str, Dict] = entry["files"]
+        if self.expired([entry]):
+            raise JournalError("These changes were pruned by `git gc`.")
+        self.save(sorted(files), reason="undo")
+        blobs = [(path, record) for path, record in files.items() if "oid" in record]
+        contents = cat_file_batch(self.repo._git_base, [r["oid"] for _, r in blobs])
+        try:
+            for (path, record), data in zip(blobs, contents):
+                self._write(self.repo.work_tree / path, data, record["mode"])
+        except MissingObject as error:
+            raise JournalError(str(error)) from error
+        finally:
+            contents.close()
+        for path, record in files.items():
+            full = self.repo.work_tree / path
+            if "link" in record:
+                if full.exists() or full.is_symlink():
+                    full.unlink()
+                full.parent.mkdir(parents=True, exist_ok=True)
+                os.symlink(record["link"], full)
+            elif record.get("deleted") and (full.exists() or full.is_symlink()):
+                full.unlink()
+        return sorted(files)
+
+
+# vim: foldlevel=0:
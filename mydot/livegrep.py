@@ -0,0 +1,189 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+Search as you type over the dotfiles: `--live-grep`
+
+The text files are read once into a `SearchIndex` held by the running mydot
+process. A `SearchServer` thread answers queries on a unix socket and fzf's
+`reload` binding asks it again on every keystroke through `CLIENT`, a few
+lines of `python -S` that start in a fraction of the time of mydot itself.
+
+Results are `path:line:text`. Patterns are Python regexes, matched without
+case unless they contain an uppercase letter. A pattern that doesn't compile
+yet (`foo(` while typing) is searched for literally.
+"""
+
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+import os
+from pathlib import Path
+import re
+import shlex
+import shutil
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+from typing import Dict, Iterator, List, Optional, Pattern, Tuple
+
+from mydot.classify import BlobClassifier
+from mydot.logging import event
+from mydot.repository import Repository
+
+MAX_RESULTS = 2000
+MAX_LINE = 300  # characters of a matching line sent to fzf
+WORKERS = 8
+REGEX_SPECIAL = set(".^$*+?{}[]\\|()")
+
+CLIENT = (
+    "import socket,sys,shutil;"
+    "s=socket.socket(socket.AF_UNIX);s.connect(sys.argv[1]);"
+    "s.sendall(sys.argv[2].encode()+b'\\n');"
+    "shutil.copyfileobj(s.makefile('rb'),sys.stdout.buffer)"
+)
+
+
+def compile_pattern(query: str) -> Pattern:
+    """Smart case regex, falling back to a literal search when it's invalid."""
+    flags = re.MULTILINE if any(c.isupper() for c in query) else re.M | re.I
+    try:
+        return re.compile(query, flags)
+    except re.error:
+        return re.compile(re.escape(query), flags)
+
+
+def is_literal(query: str) -> bool:
+    return not any(c in REGEX_SPECIAL for c in query)
+
+
+def line_starts(text: str) -> List[int]:
+    """Offset of the first character of every line."""
+    return [0] + [m.end() for m in re.finditer("\n", text)]
+
+
+def matching_lines(
+    pattern: Pattern, text: str, starts: Optional[List[int]] = None
+) -> Iterator[Tuple[int, str]]:
+    """(line number, line) for each line of `text` where `pattern` matches."""
+    starts = line_starts(text) if starts is None else starts
+    last_line = 0
+    for match in pattern.finditer(text):
+        line = bisect_right(starts, match.start())
+        if line == last_line:
+            continue
+        last_line = line
+        end = starts[line] - 1 if line < len(starts) else len(text)
+        yield line, text[starts[line - 1] : end][:MAX_LINE]
+
+
+class SearchIndex:
+    """Contents of the tracked text files, kept in memory for repeated searches."""
+
+    def __init__(self, repo: Repository):
+        self.repo = repo
+        self.files: Dict[str, Tuple[str, List[int]]] = {}
+        self.last: Tuple[str, List[str]] = ("", [])
+
+    def _read(self, path: str) -> Optional[Tuple[str, List[int]]]:
+        try:
+            text = (self.repo.work_tree / path).read_text(errors="replace")
+        except (OSError, UnicodeError):
+            return None
+        return text, line_starts(text)
+
+    def load(self) -> "SearchIndex":
+        paths = BlobClassifier(self.repo).text_files()
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            for path, content in zip(paths, pool.map(self._read, paths)):
+                if content is not None:
+                    self.files[path] = content
+        return self
+
+    def _candidates(self, query: str) -> List[str]:
+        """Files worth searching. Typing more of a literal only narrows down."""
+        previous, matched = self.last
+        if previous and query.startswith(previous) and is_literal(query):
+            if is_literal(previous):
+                return matched
+        return list(self.files)
+
+    def search(self, query: str, limit: int = MAX_RESULTS) -> List[str]:
+        """`path:line:text` for each line matching `query`, in path order."""
+        if not query:
+            return []
+        pattern = compile_pattern(query)
+        results: List[str] = []
+        matched = []
+        for path in self._candidates(query):
+            if len(results) >= limit:
+                break
+            text, starts = self.files[path]
+            found = False
+            for line, content in matching_lines(pattern, text, starts):
+                if len(results) >= limit:
+                    break
+                results.append(f"{path}:{line}:{content}")
+                found = True
+            if found:
+                matched.append(path)
+        if len(results) < limit:
+            self.last = (query, matched)  # complete, safe to narrow down from
+        return results
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        query = self.rfile.readline().decode(errors="replace").rstrip("\n")
+        index: SearchIndex = self.server.index  # type: ignore
+        with self.server.lock:  # type: ignore
+            results = index.search(query)
+        event("live-grep", query_length=len(query), results=len(results))
+        self.wfile.write("".join(f"{r}\n" for r in results).encode())
+
+
+class SearchServer:
+    """Answers `SearchIndex` queries on a unix socket from a background thread."""
+
+    def __init__(self, index: SearchIndex):
+        self.index = index
+        self.directory = tempfile.mkdtemp(prefix="mydot-grep-")
+        self.address = os.path.join(self.directory, "socket")
+        self.server: Optional[socketserver.UnixStreamServer] = None
+
+    def client_command(self) -> str:
+        """Shell command fzf runs, followed by the query, to fetch results."""
+        python = shlex.quote(sys.executable)
+        return f"{python} -S -c {shlex.quote(CLIENT)} {shlex.quote(self.address)}"
+
+    def __enter__(self) -> "SearchServer":
+        self.server = socketserver.ThreadingUnixStreamServer(self.address, _Handler)
+        self.server.daemon_threads = True
+        self.server.index = self.index  # type: ignore
+        self.server.lock = threading.Lock()  # type: ignore
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def query(address: str, text: str) -> List[str]:
+    """Ask a running `SearchServer`, the way `CLIENT` does."""
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.connect(address)
+        sock.sendall(text.encode() + b"\n")
+        data = sock.makefile("rb").read()
+    return data.decode().splitlines()
+
+
+def parse_hit(hit: str) -> Tuple[Path, int, str]:
+    path, line, text = hit.split(":", 2)
+    return Path(path), int(line), text
+
+
+# vim: foldlevel=0:
@@ -1,34 +1,141 @@
-# https://realpython.com/python-logging/
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+Logging for mydot: a quiet `mydot` logger plus a crash flight recorder.
+
+- `log` is the package logger. Nothing is printed until `configure()` runs,
+  which the CLI does with `--log-level` or `$MYDOT_LOG_LEVEL` (default
+  WARNING). Call sites pass arguments (`log.debug("found %s", x)`) so the
+  message is only formatted when a handler actually emits it.
+- `event(kind, **fields)` appends a structured event (git calls, cache
+  hits/misses, picker timings) to an in-memory ring buffer. Log records at or
+  above the configured level land in the same buffer. Appending is all it
+  costs, nothing is formatted or written.
+- The buffer is written to a file only when something goes wrong (uncaught
+  exception), when asked for with `--flight-log FILE`, or on SIGUSR1.
+"""
+
+from collections import deque
+import json
 import logging
+import os
+from pathlib import Path
+import sys
+import time
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+from mydot.cache import cache_root
+
+RING_SIZE = 500
+LOG_FORMAT = "%(asctime)s -%(levelname)s- %(message)s"
+DEFAULT_LEVEL = "WARNING"
+
+log = logging.getLogger("mydot")
+log.addHandler(logging.NullHandler())
+
+# (time, kind, fields)
+_ring: Deque[Tuple[float, str, Dict[str, Any]]] = deque(maxlen=RING_SIZE)
+
+
+def event(kind: str, **fields: Any) -> None:
+    """Remember a structured event in the flight recorder."""
+    _ring.append((time.time(), kind, fields))
+
+
+def git_event(args: List[str], start: float, rc: Optional[int]) -> None:
+    """Record a git command that started at `start` (`time.perf_counter()`)."""
+    ms = round((time.perf_counter() - start) * 1000, 2)
+    event("git", args=args[:4], ms=ms, rc=rc)
+
+
+def events() -> list:
+    return list(_ring)
+
+
+class RingHandler(logging.Handler):
+    """Keeps log records (unformatted) in the flight recorder."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        _ring.append(
+            (
+                record.created,
+                "log",
+                {"level": record.levelname, "msg": record.msg, "args": record.args},
+            )
+        )
+
+
+def dump(path: Union[Path, str, None] = None, reason: str = "requested") -> Path:
+    """Write the flight recorder as JSON lines. Returns the file written."""
+    if path is None:
+        path = cache_root() / f"flight-{time.strftime('%Y%m%d-%H%M%S')}.log"
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as file:
+        file.write(json.dumps({"reason": reason, "pid": os.getpid()}) + "\n")
+        for when, kind, fields in _ring:
+            if kind == "log":
+                fields = _render(fields)
+            line = {"time": round(when, 6), "kind": kind, **fields}
+            file.write(json.dumps(line, default=str) + "\n")
+    return path
+
+
+def _render(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Format a recorded log message, only ever done while dumping."""
+    try:
+        message = (
+            str(fields["msg"]) % fields["args"] if fields["args"] else fields["msg"]
+        )
+    except (TypeError, ValueError):
+        message = f"{fields['msg']} {fields['args']}"
+    return {"level": fields["level"], "msg": str(message)}
+
+
+def _crash_hook(previous):
+    def hook(kind, value, traceback):
+        if not issubclass(kind, KeyboardInterrupt):
+            event("crash", error=f"{kind.__name__}: {value}")
+            try:
+                written = dump(reason="crash")
+                print(f"mydot: flight recorder written to {written}", file=sys.stderr)
+            except OSError:
+                pass
+        previous(kind, value, traceback)
+
+    hook.mydot = True  # type: ignore
+    return hook
+
+
+def configure(level: Optional[str] = None, flight_log: Optional[str] = None) -> None:
+    """Set up console logging and the flight recorder for a CLI run.
+
+    `level` falls back to `$MYDOT_LOG_LEVEL`. With `flight_log` the recorder
+    is also written to that file when the process exits.
+    """
+    name = (level or os.getenv("MYDOT_LOG_LEVEL") or DEFAULT_LEVEL).upper()
+    numeric = logging.getLevelName(name)
+    if not isinstance(numeric, int):
+        numeric = logging.WARNING
+    log.setLevel(numeric)
+    if not any(isinstance(h, logging.StreamHandler) for h in log.handlers):
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter(LOG_FORMAT))
+        log.addHandler(console)
+        log.addHandler(RingHandler())
+    if not getattr(sys.excepthook, "mydot", False):
+        sys.excepthook = _crash_hook(sys.excepthook)
+    try:
+        import signal
+
+        signal.signal(signal.SIGUSR1, lambda *_: dump(reason="SIGUSR1"))
+    except (AttributeError, ValueError):
+        pass  # no SIGUSR1 on Windows, or not in the main thread
+    if flight_log:
+        import atexit
+
+        atexit.register(dump, flight_log, "--flight-log")
 
 
-# IMPORTANT Only the first .basicConfig() configuration is accepted
-# Alternatives logging policies are provided so you can easily change
-# the way logs are being used
-
-log_format = "%(asctime)s -%(levelname)s- %(message)s"
-log_level = logging.DEBUG
-log_level = logging.INFO
-log_filename = "app.log"
-
-# debug log to console
-logging.basicConfig(
-    level=log_level,
-    format=log_format,
-)
-
-# debug log to file (overwrite each run)
-logging.basicConfig(
-    level=log_level,
-    filename=log_filename,
-    filemode="w",
-    format=log_format,
-)
-
-# debug log to file (append to log)
-logging.basicConfig(
-    level=log_level,
-    filename=log_filename,
-    filemode="a",
-    format=log_format,
-)
+# vim: foldlevel=0:
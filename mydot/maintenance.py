@@ -0,0 +1,250 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+Opportunistic background maintenance of the bare repository.
+
+Years of small dotfile commits leave thousands of loose objects behind and
+every `ls-tree`, `log` and preview pays for them. After a command finishes,
+`maybe_maintain()` looks at the repository's health at most once every
+CHECK_EVERY seconds:
+
+- loose objects and pack count from `git count-objects -v`
+- whether the commit-graph is missing or older than the branch tip
+
+When a threshold is crossed a detached, `nice`d shell runs the repack and
+rewrites the commit-graph and multi-pack-index. A lock file in the cache
+directory keeps two jobs from ever running at once. Unreachable objects are
+kept (`repack -k`) so nothing a user might still want is dropped.
+
+Interactive commands leave a marker (their pid) in the cache directory while
+they run. No job starts while another mydot is running, and a job waits
+before each of its steps until every marked process has exited, so it never
+competes with interactive use.
+
+Set `MYDOT_MAINTENANCE=0` to turn it off.
+"""
+
+from contextlib import contextmanager
+import os
+from pathlib import Path
+import shlex
+import subprocess
+import time
+from typing import Dict, Iterator, List, Optional
+
+from mydot.cache import dump_json, load_json, repo_cache_dir
+from mydot.repository import Repository
+
+CHECK_EVERY = 24 * 60 * 60
+MAX_LOOSE = 500
+MAX_PACKS = 10
+# a lock older than this belongs to a job that died without cleaning up
+LOCK_TIMEOUT = 60 * 60
+# the job's shell: wait (keeping the lock fresh) while interactive pids live
+WAIT_IDLE = (
+    'idle() { for p in "$1"/*; do [ -e "$p" ] && kill -0 "${p##*/}" 2>/dev/null '
+    "&& return 1; done; return 0; }; "
+    'wait_idle() { until idle "$1"; do touch "$0"; sleep 1; done; }'
+)
+
+
+def interactive_dir(bare_repo: Path) -> Path:
+    return repo_cache_dir(bare_repo) / "interactive"
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # someone else's process
+    return True
+
+
+@contextmanager
+def interactive_use(bare_repo: Path) -> Iterator[Path]:
+    """Mark this process as working on `bare_repo` until the block exits."""
+    marker = interactive_dir(bare_repo) / str(os.getpid())
+    try:
+        marker.parent.mkdir(parents=True, exist_ok=True)
+        marker.touch()
+    except OSError:
+        pass
+    try:
+        yield marker
+    finally:
+        marker.unlink(missing_ok=True)
+
+
+def interactive_pids(bare_repo: Path) -> List[int]:
+    """Other mydot processes currently using `bare_repo`. Drops stale markers."""
+    pids = []
+    try:
+        markers = list(interactive_dir(bare_repo).iterdir())
+    except OSError:
+        return []
+    for marker in markers:
+        if not marker.name.isdigit() or int(marker.name) == os.getpid():
+            continue
+        if _alive(int(marker.name)):
+            pids.append(int(marker.name))
+        else:
+            marker.unlink(missing_ok=True)  # its process died without cleaning up
+    return pids
+
+
+def count_objects(repo: Repository) -> Dict[str, int]:
+    """`git count-objects -v` as a dict of ints (count, packs, size-pack...)."""
+    output = repo.git(["count-objects", "-v"], capture_output=True, text=True).stdout
+    counts = {}
+    for line in output.splitlines():
+        key, _, value = line.partition(":")
+        if value.strip().isdigit():
+            counts[key.strip()] = int(value)
+    return counts
+
+
+def _mtime(path: Path) -> Optional[float]:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return None
+
+
+def commit_graph_age(bare_repo: Path) -> Optional[float]:
+    """Seconds since the commit-graph was written, None when there is none."""
+    info = bare_repo / "objects" / "info"
+    written = _mtime(info / "commit-graphs" / "commit-graph-chain") or _mtime(
+        info / "commit-graph"
+    )
+    return None if written is None else time.time() - written
+
+
+def tip_age(bare_repo: Path) -> Optional[float]:
+    """Seconds since the current branch (or packed-refs) last moved."""
+    try:
+        head = (bare_repo / "HEAD").read_text().strip()
+    except OSError:
+        return None
+    watched = [bare_repo / "packed-refs"]
+    if head.startswith("ref: "):
+        watched.append(bare_repo / head[5:])
+    moved = [m for m in map(_mtime, watched) if m is not None]
+    return time.time() - max(moved) if moved else None
+
+
+class Health:
+    """Object store statistics for one repository and what they call for."""
+
+    def __init__(self, repo: Repository):
+        counts = count_objects(repo)
+        self.loose: int = counts.get("count", 0)
+        self.packs: int = counts.get("packs", 0)
+        self.graph_age = commit_graph_age(repo.bare_repo)
+        self.tip_age = tip_age(repo.bare_repo)
+
+    def as_dict(self) -> Dict:
+        return {
+            "loose": self.loose,
+            "packs": self.packs,
+            "graph_age": self.graph_age,
+            "tip_age": self.tip_age,
+        }
+
+    @property
+    def graph_stale(self) -> bool:
+        if self.tip_age is None:
+            return False  # no commits yet
+        return self.graph_age is None or self.graph_age > self.tip_age
+
+    def tasks(self) -> List[List[str]]:
+        """git commands (without the `git --git-dir` prefix) worth running."""
+        tasks = []
+        if self.packs > MAX_PACKS:
+            tasks.append(["repack", "-a", "-d", "-k", "-l", "-q"])
+        elif self.loose > MAX_LOOSE:
+            tasks.append(["repack", "-d", "-l", "-q"])
+        if tasks or self.graph_stale:
+            tasks.append(["commit-graph", "write", "--reachable", "--split"])
+        if tasks:
+            tasks.append(["multi-pack-index", "write"])
+        return tasks
+
+
+class Maintenance:
+    """Decides when to check health and runs the detached maintenance job."""
+
+    def __init__(self, repo: Repository):
+        self.repo = repo
+        cache = repo_cache_dir(repo.bare_repo)
+        self.state_file = cache / "maintenance.json"
+        self.lock_file = cache / "maintenance.lock"
+
+    def due(self) -> bool:
+        state = load_json(self.state_file, default={})
+        return time.time() - state.get("checked", 0) >= CHECK_EVERY
+
+    def locked(self) -> bool:
+        age = _mtime(self.lock_file)
+        return age is not None and time.time() - age < LOCK_TIMEOUT
+
+    def check(self) -> Health:
+        health = Health(self.repo)
+        state = load_json(self.state_file, default={})
+        state.update({"checked": time.time(), "health": health.as_dict()})
+        dump_json(self.state_file, state)
+        return health
+
+    def _take_lock(self) -> bool:
+        self.lock_file.parent.mkdir(parents=True, exist_ok=True)
+        if self.lock_file.exists() and not self.locked():
+            self.lock_file.unlink(missing_ok=True)  # left by a job that died
+        try:
+            fd = os.open(self.lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        os.close(fd)
+        return True
+
+    def start(self, tasks: List[List[str]]) -> Optional[subprocess.Popen]:
+        """Run `tasks` in a detached, niced shell that removes the lock at exit.
+
+        Each step waits until no interactive mydot is using the repository.
+        """
+        if not tasks or not self._take_lock():
+            return None
+        git = " ".join(shlex.quote(arg) for arg in self.repo._git_base)
+        steps = "; ".join(f'wait_idle "$1"; {git} {shlex.join(task)}' for task in tasks)
+        script = f"trap 'rm -f \"$0\"' EXIT; {WAIT_IDLE}; {steps}"
+        waiting_on = str(interactive_dir(self.repo.bare_repo))
+        cmd = ["sh", "-c", script, str(self.lock_file), waiting_on]
+        state = load_json(self.state_file, default={})
+        state.update({"started": time.time(), "tasks": tasks})
+        dump_json(self.state_file, state)
+        return subprocess.Popen(
+            ["nice", "-n", "19"] + cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+
+
+def maybe_maintain(repo: Repository):
+    """Called once a command has finished. Cheap unless a check is due."""
+    if os.getenv("MYDOT_MAINTENANCE", "1") == "0":
+        return None
+    maintenance = Maintenance(repo)
+    if not maintenance.due() or maintenance.locked():
+        return None
+    if interactive_pids(repo.bare_repo):
+        return None  # checked again after the next command
+    try:
+        return maintenance.start(maintenance.check().tasks())
+    except OSError:
+        return None
+
+
+# vim: foldlevel=0:
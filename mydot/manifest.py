@@ -0,0 +1,128 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+Manifests of deployed dotfiles and drift between two of them.
+
+A manifest is one line per file in `list_all`, sorted by path, in the format
+of `git ls-tree`:
+
+    <mode> SP <blob id of the work tree content> TAB <path>
+
+Lines starting with '#' are comments. Blob ids come from `mydot.hashing`, so a
+manifest of an unchanged work tree costs stat calls only. Two manifests, say
+from two machines without a network between them, are compared with a single
+merge join pass: both are read as streams and never held in memory.
+"""
+
+import os
+from pathlib import Path
+import socket
+import stat
+import time
+from typing import Dict, Iterable, Iterator, List, NamedTuple, TextIO
+
+from mydot.exceptions import ManifestError
+from mydot.hashing import work_tree_oids
+from mydot.repository import Repository
+
+MODE_FILE = "100644"
+MODE_EXECUTABLE = "100755"
+MODE_SYMLINK = "120000"
+
+
+class Entry(NamedTuple):
+    path: str
+    mode: str
+    oid: str
+
+
+def manifest_entries(repo: Repository) -> Iterator[Entry]:
+    """Entries for the current work tree, sorted by path."""
+    executables = set(repo.executables)
+    for path, oid in work_tree_oids(repo).items():
+        if stat.S_ISLNK(os.lstat(repo.work_tree / path).st_mode):
+            mode = MODE_SYMLINK
+        elif path in executables:
+            mode = MODE_EXECUTABLE
+        else:
+            mode = MODE_FILE
+        yield Entry(path, mode, oid)
+
+
+def write_manifest(repo: Repository, out: TextIO) -> int:
+    """Write the manifest of `repo` to `out`. Returns the number of entries."""
+    out.write(f"# mydot manifest {socket.gethostname()} {time.strftime('%F %T')}\n")
+    count = 0
+    for entry in manifest_entries(repo):
+        out.write(f"{entry.mode} {entry.oid}\t{entry.path}\n")
+        count += 1
+    return count
+
+
+def read_manifest(lines: Iterable[str], name: str = "manifest") -> Iterator[Entry]:
+    """Parse manifest lines, checking they are sorted as the merge join needs.
+
+    Raises ManifestError naming `name` and the line number of the problem.
+    """
+    last = None
+    for number, line in enumerate(lines, start=1):
+        line = line.rstrip("\n")
+        if not line or line.startswith("#"):
+            continue
+        meta, tab, path = line.partition("\t")
+        fields = meta.split(" ")
+        if not tab or len(fields) != 2:
+            raise ManifestError(f"{name}:{number}: not a manifest line: {line!r}")
+        mode, oid = fields
+        if last is not None and path <= last:
+            raise ManifestError(f"{name}:{number}: not sorted at {path!r}")
+        last = path
+        yield Entry(path, mode, oid)
+
+
+def compare(a: Iterable[Entry], b: Iterable[Entry]) -> Dict[str, List[str]]:
+    """Merge join two sorted manifests.
+
+    "added" are only in `b`, "removed" only in `a`, "changed" have a different
+    blob and "mode" only a different mode.
+    """
+    drift: Dict[str, List[str]] = {
+        "added": [],
+        "removed": [],
+        "changed": [],
+        "mode": [],
+    }
+    left, right = iter(a), iter(b)
+    x, y = next(left, None), next(right, None)
+    while x is not None and y is not None:
+        if x.path < y.path:
+            drift["removed"].append(x.path)
+            x = next(left, None)
+        elif x.path > y.path:
+            drift["added"].append(y.path)
+            y = next(right, None)
+        else:
+            if x.oid != y.oid:
+                drift["changed"].append(x.path)
+            elif x.mode != y.mode:
+                drift["mode"].append(x.path)
+            x, y = next(left, None), next(right, None)
+    while x is not None:
+        drift["removed"].append(x.path)
+        x = next(left, None)
+    while y is not None:
+        drift["added"].append(y.path)
+        y = next(right, None)
+    return drift
+
+
+def compare_files(a: Path, b: Path) -> Dict[str, List[str]]:
+    try:
+        with open(a) as first, open(b) as second:
+            return compare(read_manifest(first, str(a)), read_manifest(second, str(b)))
+    except (OSError, UnicodeDecodeError) as error:
+        raise ManifestError(f"Can't read manifest: {error}") from error
+
+
+# vim: foldlevel=0:
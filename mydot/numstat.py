@@ -0,0 +1,75 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+Size of each change for the `--add`, `--restore` and `--discard` pickers.
+
+One `git diff --numstat -z` per picker (`--staged` for staged changes, `HEAD`
+for everything since the last commit) gives lines added and removed for every
+changed file. `annotate()` joins those counts to the candidate paths in a
+single pass and orders the biggest changes first.
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from mydot.repository import Repository
+
+Counts = Tuple[Optional[int], Optional[int]]  # (None, None) for binary files
+
+
+class Change(NamedTuple):
+    path: str
+    added: Optional[int]
+    removed: Optional[int]
+
+    @property
+    def binary(self) -> bool:
+        return self.added is None
+
+    @property
+    def size(self) -> float:
+        """Lines touched. Binary changes count as bigger than any text change."""
+        if self.binary:
+            return float("inf")
+        return self.added + self.removed  # type: ignore
+
+    def label(self) -> str:
+        """`+added -removed<TAB>path`, the columns lined up."""
+        if self.binary:
+            return f"{'binary':>13}\t{self.path}"
+        return f"{'+' + str(self.added):>6} {'-' + str(self.removed):>6}\t{self.path}"
+
+
+def numstat(repo: Repository, against: Optional[str] = None) -> Dict[str, Counts]:
+    """Lines added/removed per path. `against` is `--staged`, `HEAD` or None."""
+    args = ["diff", "--numstat", "-z", "--no-renames", "--no-ext-diff"]
+    if against is not None:
+        args.append(against)
+    output = repo.git(args, capture_output=True, text=True).stdout
+    counts: Dict[str, Counts] = {}
+    for record in output.split("\x00"):
+        if not record:
+            continue
+        added, removed, path = record.split("\t", 2)
+        if added == "-":
+            counts[path] = (None, None)
+        else:
+            counts[path] = (int(added), int(removed))
+    return counts
+
+
+def annotate(paths: List[str], counts: Dict[str, Counts]) -> List[Change]:
+    """Changes for `paths`, biggest first (ties keep the order of `paths`)."""
+    changes = [Change(path, *counts.get(path, (0, 0))) for path in paths]
+    return sorted(changes, key=lambda change: change.size, reverse=True)
+
+
+def summary(changes: List[Change]) -> str:
+    added = sum(c.added for c in changes if not c.binary)  # type: ignore
+    removed = sum(c.removed for c in changes if not c.binary)  # type: ignore
+    binary = sum(c.binary for c in changes)
+    text = f"{len(changes)} files, +{added} -{removed}"
+    return text + (f", {binary} binary" if binary else "")
+
+
+# vim: foldlevel=0:
@@ -0,0 +1,455 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+Read only, pure Python access to the objects of the bare repository.
+
+Opt in with `MYDOT_OBJECTS=python`. `Repository` then reads committed trees
+and blobs in process instead of forking git for each one. Anything this reader
+doesn't handle (sha256 repositories, revision expressions like `HEAD~2`, ...)
+raises `Unsupported` and the caller falls back to git.
+
+- Loose objects are zlib streams under `objects/xx/`.
+- Packs are memory mapped. An object is found in a `.idx` (version 2) by
+  using the fan-out table to narrow the range to ids sharing the first byte
+  and binary searching the sorted id table inside it.
+- OFS_DELTA and REF_DELTA entries are resolved iteratively (no recursion
+  limit on long chains). Resolved delta bases are kept in a small LRU cache
+  bounded by total bytes, since neighbouring objects usually share bases.
+"""
+
+from collections import OrderedDict
+import mmap
+import os
+from pathlib import Path
+import re
+import struct
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+import zlib
+
+OBJ_COMMIT, OBJ_TREE, OBJ_BLOB, OBJ_TAG = 1, 2, 3, 4
+OBJ_OFS_DELTA, OBJ_REF_DELTA = 6, 7
+TYPE_NAMES = {OBJ_COMMIT: "commit", OBJ_TREE: "tree", OBJ_BLOB: "blob", OBJ_TAG: "tag"}
+
+IDX_MAGIC = b"\xfftOc"
+CACHE_BYTES = 32 * 1024 * 1024
+MAX_REF_DEPTH = 10
+
+
+class Unsupported(Exception):
+    """The object or revision can't be read in process; ask git instead."""
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """Rebuild an object from its delta base and a git delta."""
+
+    def varint(pos: int) -> Tuple[int, int]:
+        value = shift = 0
+        while True:
+            byte = delta[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                return value, pos
+
+    source_size, pos = varint(0)
+    target_size, pos = varint(pos)
+    if source_size != len(base):
+        raise ValueError("delta base has the wrong size")
+    out = bytearray()
+    end = len(delta)
+    while pos < end:
+        op = delta[pos]
+        pos += 1
+        if op & 0x80:  # copy from base
+            offset = size = 0
+            for i in range(4):
+                if op & (1 << i):
+                    offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if op & (0x10 << i):
+                    size |= delta[pos] << (8 * i)
+                    pos += 1
+            out += base[offset : offset + (size or 0x10000)]
+        elif op:  # insert literal
+            out += delta[pos : pos + op]
+            pos += op
+        else:
+            raise ValueError("delta opcode 0 is reserved")
+    if len(out) != target_size:
+        raise ValueError("delta produced the wrong size")
+    return bytes(out)
+
+
+class LRUCache:
+    """Maps keys to (type, data), evicting the least recently used past a
+    total size of `max_bytes`."""
+
+    def __init__(self, max_bytes: int = CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: "OrderedDict[object, Tuple[int, bytes]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key) -> Optional[Tuple[int, bytes]]:
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value: Tuple[int, bytes]) -> None:
+        if len(value[1]) > self.max_bytes // 4:
+            return  # one huge object would flush everything else
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = value
+            self.size += len(value[1])
+            while self.size > self.max_bytes:
+                _, (_, data) = self.entries.popitem(last=False)
+                self.size -= len(data)
+
+
+def _map(path: Path) -> mmap.mmap:
+    with open(path, "rb") as file:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class Pack:
+    """A memory mapped `.pack` with its version 2 `.idx`."""
+
+    def __init__(self, idx_path: Path):
+        self.idx = _map(idx_path)
+        if self.idx[:4] != IDX_MAGIC or struct.unpack(">I", self.idx[4:8])[0] != 2:
+            raise Unsupported(f"{idx_path}: only version 2 pack indexes are read")
+        self.pack = _map(idx_path.with_suffix(".pack"))
+        self.fanout = struct.unpack(">256I", self.idx[8 : 8 + 1024])
+        self.count = self.fanout[255]
+        self.ids_at = 8 + 1024
+        self.offsets_at = self.ids_at + self.count * (20 + 4)
+        self.large_at = self.offsets_at + self.count * 4
+
+    def find(self, binsha: bytes) -> Optional[int]:
+        """Pack offset of an object, or None when it isn't in this pack."""
+        first = binsha[0]
+        low = self.fanout[first - 1] if first else 0
+        high = self.fanout[first]
+        idx, at = self.idx, self.ids_at
+        while low < high:
+            mid = (low + high) // 2
+            candidate = idx[at + mid * 20 : at + mid * 20 + 20]
+            if candidate < binsha:
+                low = mid + 1
+            elif candidate > binsha:
+                high = mid
+            else:
+                return self._offset(mid)
+        return None
+
+    def _offset(self, position: int) -> int:
+        at = self.offsets_at + position * 4
+        offset = struct.unpack(">I", self.idx[at : at + 4])[0]
+        if offset & 0x80000000:
+            at = self.large_at + (offset & 0x7FFFFFFF) * 8
+            offset = struct.unpack(">Q", self.idx[at : at + 8])[0]
+        return offset
+
+    def header(self, offset: int) -> Tuple[int, int, int]:
+        """(type, inflated size, offset of the data) of the entry at `offset`."""
+        pack = self.pack
+        byte = pack[offset]
+        kind = (byte >> 4) & 7
+        size = byte & 0x0F
+        shift = 4
+        offset += 1
+        while byte & 0x80:
+            byte = pack[offset]
+            offset += 1
+            size |= (byte & 0x7F) << shift
+            shift += 7
+        return kind, size, offset
+
+    def ofs_base(self, offset: int, at: int) -> Tuple[int, int]:
+        """Absolute offset of an OFS_DELTA base and where the delta data starts."""
+        pack = self.pack
+        byte = pack[at]
+        at += 1
+        distance = byte & 0x7F
+        while byte & 0x80:
+            byte = pack[at]
+            at += 1
+            distance = ((distance + 1) << 7) | (byte & 0x7F)
+        return offset - distance, at
+
+    def inflate(self, at: int, size: int) -> bytes:
+        """Decompress the zlib stream starting at `at` (`size` bytes of output).
+
+        Deflate rarely grows data by more than a few bytes, so the first slice
+        almost always holds the whole stream.
+        """
+        decompressor = zlib.decompressobj()
+        out = bytearray()
+        chunk = max(size + 64, 512)
+        while not decompressor.eof:
+            piece = self.pack[at : at + chunk]
+            if not piece:
+                break
+            try:
+                out += decompressor.decompress(piece)
+            except zlib.error as error:
+                raise ValueError(f"corrupt pack entry: {error}") from error
+            at += len(piece)
+        if len(out) != size:
+            raise ValueError("truncated pack entry")
+        return bytes(out)
+
+
+class ObjectStore:
+    """Objects of one git directory: loose, packed and from alternates."""
+
+    def __init__(self, git_dir: Path, cache_bytes: int = CACHE_BYTES):
+        self.git_dir = Path(git_dir)
+        self._check_format()
+        self.object_dirs = self._object_dirs(self.git_dir / "objects")
+        self.packs: List[Pack] = []
+        self._pack_names: set = set()
+        self.cache = LRUCache(cache_bytes)
+        self.scan_packs()
+
+    def _check_format(self) -> None:
+        try:
+            config = (self.git_dir / "config").read_text()
+        except OSError:
+            return
+        if re.search(r"objectformat\s*=\s*sha256", config, re.IGNORECASE):
+            raise Unsupported("only sha1 repositories are read in process")
+
+    @staticmethod
+    def _object_dirs(objects: Path, depth: int = 0) -> List[Path]:
+        dirs = [objects]
+        try:
+            lines = (objects / "info" / "alternates").read_text().splitlines()
+        except OSError:
+            return dirs
+        for line in lines:
+            if line and not line.startswith("#") and depth < 5:
+                alternate = Path(line) if os.path.isabs(line) else objects / line
+                dirs += ObjectStore._object_dirs(alternate, depth + 1)
+        return dirs
+
+    def scan_packs(self) -> None:
+        """Pick up packs that appeared since the last scan (after a repack)."""
+        for objects in self.object_dirs:
+            try:
+                names = os.listdir(objects / "pack")
+            except OSError:
+                continue
+            for name in sorted(names):
+                idx = objects / "pack" / name
+                if name.endswith(".idx") and idx not in self._pack_names:
+                    if not idx.with_suffix(".pack").exists():
+                        continue
+                    self.packs.append(Pack(idx))
+                    self._pack_names.add(idx)
+
+    # Objects
+    def read(self, oid: str) -> Tuple[str, bytes]:
+        """(type name, content) of the object with id `oid`."""
+        kind, data = self._read(bytes.fromhex(oid))
+        return TYPE_NAMES[kind], data
+
+    def _read(self, binsha: bytes) -> Tuple[int, bytes]:
+        found = self._find_packed(binsha)
+        if found is not None:
+            return self._unpack(*found)
+        loose = self._read_loose(binsha)
+        if loose is not None:
+            return loose
+        self.scan_packs()
+        found = self._find_packed(binsha)
+        if found is not None:
+            return self._unpack(*found)
+        raise KeyError(binsha.hex())
+
+    def _find_packed(self, binsha: bytes) -> Optional[Tuple[Pack, int]]:
+        for pack in self.packs:
+            offset = pack.find(binsha)
+            if offset is not None:
+                return pack, offset
+        return None
+
+    def _read_loose(self, binsha: bytes) -> Optional[Tuple[int, bytes]]:
+        hexsha = binsha.hex()
+        for objects in self.object_dirs:
+            try:
+                raw = zlib.decompress((objects / hexsha[:2] / hexsha[2:]).read_bytes())
+            except FileNotFoundError:
+                continue
+            except zlib.error as error:
+                raise ValueError(
+                    f"loose object {hexsha} is corrupt: {error}"
+                ) from error
+            header, _, data = raw.partition(b"\x00")
+            name, size = header.split(b" ")
+            kinds = {v.encode(): k for k, v in TYPE_NAMES.items()}
+            if int(size) != len(data):
+                raise ValueError(f"loose object {hexsha} is corrupt")
+            return kinds[name], data
+        return None
+
+    def _unpack(self, pack: Pack, offset: int) -> Tuple[int, bytes]:
+        """Read a packed entry, walking its delta chain down to a full object."""
+        chain: List[Tuple[Pack, int, int, int]] = []  # deltas to apply, top first
+        while True:
+            cached = self.cache.get((id(pack), offset))
+            if cached is not None:
+                kind, data = cached
+                break
+            kind, size, at = pack.header(offset)
+            if kind == OBJ_OFS_DELTA:
+                base, at = pack.ofs_base(offset, at)
+                chain.append((pack, offset, at, size))
+                offset = base
+            elif kind == OBJ_REF_DELTA:
+                base_sha = bytes(pack.pack[at : at + 20])
+                chain.append((pack, offset, at + 20, size))
+                found = self._find_packed(base_sha)
+                if found is None:
+                    # thin packs aside, a base outside the packs is loose
+                    loose = self._read_loose(base_sha)
+                    if loose is None:
+                        raise KeyError(base_sha.hex())
+                    kind, data = loose
+                    break
+                pack, offset = found
+            else:
+                data = pack.inflate(at, size)
+                if chain:
+                    self.cache.put((id(pack), offset), (kind, data))
+                break
+        for delta_pack, delta_offset, at, size in reversed(chain):
+            data = apply_delta(data, delta_pack.inflate(at, size))
+            if delta_pack is not chain[0][0] or delta_offset != chain[0][1]:
+                self.cache.put((id(delta_pack), delta_offset), (kind, data))
+        return kind, data
+
+    # Revisions and trees
+    def resolve(self, rev: str) -> str:
+        """Object id for a full id, "HEAD", a ref name or a branch name."""
+        if len(rev) == 40 and all(c in "0123456789abcdef" for c in rev):
+            return rev
+        if rev != "HEAD" and not rev.startswith("refs/"):
+            if any(c in rev for c in "~^:@{ "):
+                raise Unsupported(f"revision expression {rev!r}")
+            for prefix in ["refs/heads/", "refs/tags/", "refs/remotes/"]:
+                try:
+                    return self.resolve(prefix + rev)
+                except Unsupported:
+                    continue
+            raise Unsupported(f"unknown revision {rev!r}")
+        for _ in range(MAX_REF_DEPTH):
+            try:
+                value = (self.git_dir / rev).read_text().strip()
+            except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+                value = self._packed_refs().get(rev, "")
+            if value.startswith("ref: "):
+                rev = value[5:]
+            elif len(value) == 40:
+                return value
+            else:
+                break
+        raise Unsupported(f"can't resolve {rev!r}")
+
+    def _packed_refs(self) -> Dict[str, str]:
+        refs = {}
+        try:
+            lines = (self.git_dir / "packed-refs").read_text().splitlines()
+        except OSError:
+            return refs
+        for line in lines:
+            if line and line[0] not in "#^":
+                oid, _, name = line.partition(" ")
+                refs[name] = oid
+        return refs
+
+    def peel_to_tree(self, oid: str) -> str:
+        """Follow tags and commits down to a tree id."""
+        while True:
+            kind, data = self.read(oid)
+            if kind == "tree":
+                return oid
+            if kind == "commit":
+                return data[5:45].decode()  # "tree <id>\n" always comes first
+            if kind == "tag":
+                oid = data[7:47].decode()  # "object <id>\n"
+                continue
+            raise Unsupported(f"{oid} is a {kind}")
+
+    def tree_entries(self, tree: str) -> Iterator[Tuple[int, str, str]]:
+        """(mode, name, id) for each entry of a single tree."""
+        _, data = self.read(tree)
+        pos, end = 0, len(data)
+        while pos < end:
+            space = data.index(b" ", pos)
+            nul = data.index(b"\x00", space)
+            mode = int(data[pos:space], 8)
+            name = os.fsdecode(data[space + 1 : nul])
+            yield mode, name, data[nul + 1 : nul + 21].hex()
+            pos = nul + 21
+
+    def ls_tree(self, rev: str = "HEAD") -> Iterator[Tuple[int, str, str]]:
+        """(mode, id, path) of every file in `rev`, like `git ls-tree -r`.
+
+        Sub trees are walked where they sort, so the order matches git's.
+        """
+        root = self.peel_to_tree(self.resolve(rev))
+        stack = [(self.tree_entries(root), "")]
+        while stack:
+            entries, prefix = stack[-1]
+            for mode, name, oid in entries:
+                if mode == 0o40000:
+                    stack.append((self.tree_entries(oid), f"{prefix}{name}/"))
+                    break
+                yield mode, oid, f"{prefix}{name}"
+            else:
+                stack.pop()
+
+    def blob(self, rev: str, path: str) -> bytes:
+        """Content of `path` as committed in `rev`."""
+        tree = self.peel_to_tree(self.resolve(rev))
+        *directories, name = path.strip("/").split("/")
+        for part in directories:
+            tree = self._lookup(tree, part, want_tree=True)
+        kind, data = self.read(self._lookup(tree, name, want_tree=False))
+        if kind != "blob":
+            raise KeyError(path)
+        return data
+
+    def _lookup(self, tree: str, name: str, want_tree: bool) -> str:
+        for mode, entry, oid in self.tree_entries(tree):
+            if entry == name and (mode == 0o40000) == want_tree:
+                return oid
+        raise KeyError(name)
+
+
+_stores: Dict[Path, ObjectStore] = {}
+
+
+def store_for(git_dir: Path) -> Optional[ObjectStore]:
+    """The shared in-process store when `MYDOT_OBJECTS=python`, else None."""
+    if os.getenv("MYDOT_OBJECTS") != "python":
+        return None
+    key = Path(git_dir).absolute()
+    if key not in _stores:
+        try:
+            _stores[key] = ObjectStore(key)
+        except Unsupported:
+            return None
+    return _stores[key]
+
+
+# vim: foldlevel=0:
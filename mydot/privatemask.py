@@ -0,0 +1,231 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+Private rules for exports: files to leave out and secrets to redact.
+
+Two kinds of rules:
+
+- Path globs exclude whole files (`.ssh/id_*`, `*.pem`, ...). Like the
+  discover rules, a glob containing '/' matches the path relative to the work
+  tree and any other glob matches the file name.
+- Secret patterns are regular expressions for tokens, keys and passwords.
+  All of them are joined into a single alternation of named groups so each
+  file is scanned in one pass and `match.lastgroup` names the rule that hit.
+  Matches are replaced with `<redacted:name>` in the exported copy.
+
+Extra rules are read from `$XDG_CONFIG_HOME/mydot/privatemask`, one per line:
+
+    .config/work/*                      exclude matching files
+    secret jira_token JIRA-[0-9a-f]{32}  redact matches of a new pattern
+    !*.key                              drop a default glob or secret name
+
+Scan results are cached per blob oid (path + stat stamp for files with
+unstaged edits), so a re-export only scans the files that changed. Binaries
+are never scanned, they can only be excluded by a glob.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatchcase
+import hashlib
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Pattern, Tuple
+
+from mydot.cache import config_root, dump_json, load_json, repo_cache_dir, stat_stamp
+from mydot.classify import BlobClassifier
+from mydot.dotfile import Dotfile
+from mydot.exceptions import MaskError
+from mydot.repository import Repository
+
+WORKERS = 8
+
+DEFAULT_GLOBS = [
+    ".ssh/id_*",
+    "*.pem",
+    "*.key",
+    "*.p12",
+    "*.pfx",
+    "*.kdbx",
+    ".netrc",
+    ".pgpass",
+    ".aws/credentials",
+    ".gnupg/*",
+]
+
+DEFAULT_SECRETS = {
+    "private_key": r"-----BEGIN [A-Z ]*PRIVATE KEY( BLOCK)?-----"
+    r"[\s\S]*?-----END [A-Z ]*PRIVATE KEY( BLOCK)?-----",
+    "aws_access_key": r"\b(?:AKIA|ASIA)[0-9A-Z]{16}\b",
+    "github_token": r"\bgh[pousr]_[A-Za-z0-9]{36,}",
+    "slack_token": r"\bxox[abposr]-[A-Za-z0-9-]{10,}",
+    "google_api_key": r"\bAIza[0-9A-Za-z_-]{35}",
+    "api_key": r"\bsk-[A-Za-z0-9_-]{20,}",
+    "password": r"(?i:pass(?:word|wd)?|secret|token|api_?key)"
+    r"\s*[:=]\s*[\"']?[^\s\"']{8,}",
+}
+
+
+def config_mask_file() -> Path:
+    return config_root() / "privatemask"
+
+
+def _secret_rule(line: str, where: str) -> Tuple[str, str]:
+    """(name, regex) of a `secret NAME REGEX` line, checked on its own."""
+    parts = line.split(None, 2)
+    if len(parts) != 3:
+        raise MaskError(f"{where}: expected `secret NAME REGEX`, got {line!r}")
+    _, name, regex = parts
+    if not name.isidentifier():
+        raise MaskError(f"{where}: secret name {name!r} is not an identifier")
+    try:
+        re.compile(f"(?P<{name}>{regex})".encode())
+    except re.error as error:
+        raise MaskError(f"{where}: bad regex for secret {name!r}: {error}")
+    return name, regex
+
+
+class MaskRules:
+    """Path globs plus secret patterns compiled into one bytes regex."""
+
+    def __init__(self, globs: List[str], secrets: Dict[str, str]):
+        self.globs = list(globs)
+        self.secrets = dict(secrets)
+        self.anchored = [g for g in self.globs if "/" in g]
+        self.names = [g for g in self.globs if "/" not in g]
+        combined = "|".join(f"(?P<{name}>{rx})" for name, rx in secrets.items())
+        self.pattern: Optional[Pattern[bytes]] = (
+            re.compile(combined.encode()) if combined else None
+        )
+        # identifies these rules in the scan cache
+        rules = "\n".join(self.globs + [f"{n} {r}" for n, r in secrets.items()])
+        self.key = hashlib.sha1(rules.encode()).hexdigest()
+
+    @classmethod
+    def load(cls, rules_file: Optional[Path] = None) -> "MaskRules":
+        """Default rules combined with the user's privatemask file."""
+        globs, secrets = list(DEFAULT_GLOBS), dict(DEFAULT_SECRETS)
+        rules_file = rules_file or config_mask_file()
+        try:
+            lines = rules_file.read_text().splitlines()
+        except OSError:
+            lines = []
+        for number, line in enumerate((line.strip() for line in lines), 1):
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("!"):
+                globs = [glob for glob in globs if glob != line[1:]]
+                secrets.pop(line[1:], None)
+            elif line.startswith("secret "):
+                name, regex = _secret_rule(line, f"{rules_file}:{number}")
+                secrets[name] = regex
+            else:
+                globs.append(line)
+        try:
+            return cls(globs, secrets)
+        except re.error as error:  # e.g. a group name shared by two rules
+            raise MaskError(f"{rules_file}: secret rules don't combine: {error}")
+
+    def excluded_by(self, path: str) -> Optional[str]:
+        """The glob that excludes `path`, if any."""
+        name = path.rsplit("/", 1)[-1]
+        for glob in self.names:
+            if fnmatchcase(name, glob):
+                return glob
+        for glob in self.anchored:
+            if fnmatchcase(path, glob):
+                return glob
+        return None
+
+    def scan(self, data: bytes) -> List[List]:
+        """[[secret name, start, end, line], ...] for every match in `data`."""
+        if self.pattern is None:
+            return []
+        return [
+            [m.lastgroup, m.start(), m.end(), data.count(b"\n", 0, m.start()) + 1]
+            for m in self.pattern.finditer(data)
+        ]
+
+
+def redact(data: bytes, findings: List[List]) -> bytes:
+    """`data` with every finding replaced by `<redacted:name>`."""
+    pieces, pos = [], 0
+    for name, start, end, _ in sorted(findings, key=lambda f: f[1]):
+        if start < pos:
+            continue  # overlapping match, already redacted
+        pieces += [data[pos:start], f"<redacted:{name}>".encode()]
+        pos = end
+    pieces.append(data[pos:])
+    return b"".join(pieces)
+
+
+class PrivateMask:
+    """Which tracked files to exclude or redact, with scans cached per blob."""
+
+    def __init__(self, repo: Repository, rules: Optional[MaskRules] = None):
+        self.repo = repo
+        self.rules = MaskRules.load() if rules is None else rules
+        self.classifier = BlobClassifier(repo)
+        self.cache_file = repo_cache_dir(repo.bare_repo) / "privatemask.json"
+        data = load_json(self.cache_file, default={})
+        if data.get("key") != self.rules.key:
+            data = {}
+        # oid -> findings
+        self.blobs: Dict[str, List] = data.get("blobs", {})
+        # path -> [stamp, findings] for files with unstaged edits
+        self.dirty: Dict[str, List] = data.get("dirty", {})
+        self._dirty_paths = set(repo.modified_unstaged)
+        self.scanned = 0
+
+    def findings(self, dotfile: Dotfile) -> List[List]:
+        """Secrets in the work tree copy of `dotfile` (cached)."""
+        if dotfile.path in self._dirty_paths:
+            stamp = stat_stamp(dotfile.absolute)
+            cached = self.dirty.get(dotfile.path)
+            if cached is None or cached[0] != stamp:
+                cached = [stamp, self._scan(dotfile)]
+                self.dirty[dotfile.path] = cached
+            return cached[1]
+        if dotfile.oid not in self.blobs:
+            self.blobs[dotfile.oid] = self._scan(dotfile)
+        return self.blobs[dotfile.oid]
+
+    def _scan(self, dotfile: Dotfile) -> List[List]:
+        if self.classifier.is_binary(dotfile):
+            return []
+        try:
+            data = dotfile.absolute.read_bytes()
+        except OSError:
+            return []
+        self.scanned += 1
+        return self.rules.scan(data)
+
+    def plan(self) -> Dict[str, Dict]:
+        """Decide every tracked file: {"excluded": {path: glob},
+        "redacted": {path: findings}, "clean": [paths]}."""
+        self.classifier.classify_all()
+        excluded, to_scan = {}, []
+        for dotfile in self.repo.dotfiles():
+            glob = self.rules.excluded_by(dotfile.path)
+            if glob is None:
+                to_scan.append(dotfile)
+            else:
+                excluded[dotfile.path] = glob
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            results = list(pool.map(self.findings, to_scan))
+        redacted = {d.path: found for d, found in zip(to_scan, results) if found}
+        clean = [d.path for d, found in zip(to_scan, results) if not found]
+        self.blobs = {d.oid: self.blobs[d.oid] for d in to_scan if d.oid in self.blobs}
+        self.dirty = {p: v for p, v in self.dirty.items() if p in self._dirty_paths}
+        self.save()
+        return {"excluded": excluded, "redacted": redacted, "clean": clean}
+
+    def save(self) -> None:
+        data = {"key": self.rules.key, "blobs": self.blobs, "dirty": self.dirty}
+        try:
+            dump_json(self.cache_file, data)
+        except OSError:
+            pass
+
+
+# vim: foldlevel=0:
@@ -0,0 +1,266 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+Per host profiles: the part of the dotfiles a machine actually uses.
+
+Profiles live in `$XDG_CONFIG_HOME/mydot/profiles` (INI format):
+
+    [base]
+    paths = .bashrc
+            .config/git/
+
+    [laptop]
+    hosts = thinkpad-* macbook
+    include = base
+    paths = .config/nvim/
+            !.config/nvim/spell/
+
+    [server]
+    roles = server
+    include = base
+
+`paths` are gitignore style globs (`*` stays within a directory, `**`
+crosses them, `[...]` classes as in git, a leading `!` excludes, the last
+matching line wins). The active profile is `$MYDOT_PROFILE` when set (`all`
+turns profiles off), else the first whose `hosts` match the hostname, else the
+first whose `roles` contain `$MYDOT_ROLE`. `mydot --profile NAME` pins a
+profile for the repository (`info/mydot-profile` in the bare repo), which
+counts like `$MYDOT_PROFILE`.
+
+The active profile limits `Repository.list_all`, `Repository.dotfiles()` and
+everything built on them (pickers, `--export`, `--deploy`, ...). `--profile`
+also makes git skip the other files with a non-cone sparse checkout, so
+`git status` and the index only cover what the host uses.
+"""
+
+import configparser
+from fnmatch import fnmatch
+import os
+from pathlib import Path
+import re
+import socket
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+from mydot.cache import config_root
+
+PROFILE_ENV = "MYDOT_PROFILE"
+ROLE_ENV = "MYDOT_ROLE"
+ALL = "all"
+
+
+def profiles_file() -> Path:
+    return config_root() / "profiles"
+
+
+def pin_file(bare_repo: Path) -> Path:
+    return Path(bare_repo) / "info" / "mydot-profile"
+
+
+def pinned_profile(bare_repo: Path) -> Optional[str]:
+    try:
+        return pin_file(bare_repo).read_text().strip() or None
+    except OSError:
+        return None
+
+
+def pin_profile(bare_repo: Path, name: Optional[str]) -> None:
+    """Remember `name` for this repository, None to go back to host matching."""
+    pin = pin_file(bare_repo)
+    if name is None:
+        pin.unlink(missing_ok=True)
+    else:
+        pin.parent.mkdir(parents=True, exist_ok=True)
+        pin.write_text(f"{name}\n")
+
+
+POSIX_CLASSES = {
+    "alnum": "a-zA-Z0-9",
+    "alpha": "a-zA-Z",
+    "blank": " \\t",
+    "digit": "0-9",
+    "lower": "a-z",
+    "space": " \\t\\n\\r\\f\\v",
+    "upper": "A-Z",
+    "xdigit": "0-9a-fA-F",
+}
+
+
+def _bracket(glob: str, start: int) -> Tuple[Optional[str], int]:
+    """Regex for the `[...]` class opening at `start` and the index after it.
+
+    Follows git's wildmatch: `!` or `^` negates, a leading `]` is literal and
+    a class never matches `/`. (None, start) when the bracket isn't closed.
+    """
+    pos = start + 1
+    negate = pos < len(glob) and glob[pos] in "!^"
+    pos += negate
+    body = ""
+    first = True
+    while pos < len(glob):
+        char = glob[pos]
+        if char == "]" and not first:
+            return f"(?!/)[{'^' if negate else ''}{body}]", pos + 1
+        if glob.startswith("[:", pos):
+            end = glob.find(":]", pos + 2)
+            name = glob[pos + 2 : end] if end != -1 else ""
+            if name not in POSIX_CLASSES:
+                raise ValueError(f"unsupported character class in {glob!r}")
+            body += POSIX_CLASSES[name]
+            pos = end + 2
+        elif char == "\\" and pos + 1 < len(glob):
+            body += re.escape(glob[pos + 1])
+            pos += 2
+        elif char == "-" and body and pos + 1 < len(glob) and glob[pos + 1] != "]":
+            body += "-"
+            pos += 1
+        else:
+            body += re.escape(char) if char != "-" else "\\-"
+            pos += 1
+        first = False
+    return None, start
+
+
+def glob_regex(glob: str) -> str:
+    """Regex for a gitignore style glob, matching a path or anything below it.
+
+    Wildcards, `[...]` classes and backslash escapes mean what they mean to
+    git, so the profile filter and git's non-cone sparse checkout agree.
+    """
+    anchored = "/" in glob.rstrip("/")
+    glob = glob.strip("/")
+    body = ""
+    pos = 0
+    while pos < len(glob):
+        if glob.startswith("**/", pos):
+            body += "(?:.*/)?"
+            pos += 3
+        elif glob.startswith("**", pos):
+            body += ".*"
+            pos += 2
+        elif glob[pos] == "*":
+            body += "[^/]*"
+            pos += 1
+        elif glob[pos] == "?":
+            body += "[^/]"
+            pos += 1
+        elif glob[pos] == "\\" and pos + 1 < len(glob):
+            body += re.escape(glob[pos + 1])
+            pos += 2
+        elif glob[pos] == "[":
+            regex, end = _bracket(glob, pos)
+            body += re.escape("[") if regex is None else regex
+            pos = pos + 1 if regex is None else end
+        else:
+            body += re.escape(glob[pos])
+            pos += 1
+    prefix = "" if anchored else "(?:.*/)?"
+    return f"{prefix}{body}(?:/.*)?"
+
+
+class Profile:
+    """A named set of path globs, plus the hosts and roles it is meant for."""
+
+    def __init__(
+        self,
+        name: str,
+        patterns: List[str],
+        hosts: Iterable[str] = (),
+        roles: Iterable[str] = (),
+    ):
+        self.name = name
+        self.patterns = patterns
+        self.hosts = list(hosts)
+        self.roles = list(roles)
+        self.rules: List[Tuple[bool, Pattern]] = [
+            (not p.startswith("!"), re.compile(glob_regex(p.lstrip("!"))))
+            for p in patterns
+        ]
+        if all(include for include, _ in self.rules):
+            # no exclusions: one combined regex does it
+            combined = "|".join(glob_regex(p) for p in patterns) or "(?!)"
+            self.rules = [(True, re.compile(combined))]
+
+    def __repr__(self) -> str:
+        return f"Profile({self.name!r}, {self.patterns!r})"
+
+    def matches(self, path: str) -> bool:
+        for include, rule in reversed(self.rules):
+            if rule.fullmatch(path):
+                return include
+        return False
+
+    def filter(self, paths: Iterable[str]) -> List[str]:
+        return [path for path in paths if self.matches(path)]
+
+    def for_host(self, hostname: str) -> bool:
+        short = hostname.split(".")[0]
+        return any(fnmatch(hostname, h) or fnmatch(short, h) for h in self.hosts)
+
+
+def sparse_checkout(profile: Optional[Profile]) -> Tuple[List[str], Optional[str]]:
+    """git arguments and stdin that limit the work tree to `profile`."""
+    if profile is None:
+        return ["sparse-checkout", "disable"], None
+    patterns = "".join(f"{pattern}\n" for pattern in profile.patterns)
+    return ["sparse-checkout", "set", "--no-cone", "--stdin"], patterns
+
+
+def _lines(value: str) -> List[str]:
+    """One path glob per line (globs may contain spaces)."""
+    return [line.strip() for line in value.splitlines() if line.strip()]
+
+
+def load_profiles(file: Optional[Path] = None) -> Dict[str, Profile]:
+    """Profiles from `file` (default: `profiles_file()`), in file order."""
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.optionxform = str  # type: ignore
+    parser.read(profiles_file() if file is None else file)
+
+    def patterns(name: str, seen: Tuple[str, ...] = ()) -> List[str]:
+        if name in seen or not parser.has_section(name):
+            return []
+        section = parser[name]
+        found = []
+        for included in section.get("include", "").split():
+            found += patterns(included, seen + (name,))
+        return found + _lines(section.get("paths", ""))
+
+    return {
+        name: Profile(
+            name,
+            patterns(name),
+            hosts=parser[name].get("hosts", "").split(),
+            roles=parser[name].get("roles", "").split(),
+        )
+        for name in parser.sections()
+    }
+
+
+def active_profile(
+    profiles: Optional[Dict[str, Profile]] = None,
+    hostname: Optional[str] = None,
+    role: Optional[str] = None,
+    name: Optional[str] = None,
+) -> Optional[Profile]:
+    """The profile for this machine, or None to use every file."""
+    name = os.getenv(PROFILE_ENV) if name is None else name
+    if name == ALL:
+        return None
+    profiles = load_profiles() if profiles is None else profiles
+    if name:
+        if name not in profiles:
+            raise KeyError(f"No profile named {name!r} in {profiles_file()}")
+        return profiles[name]
+    hostname = socket.gethostname() if hostname is None else hostname
+    for profile in profiles.values():
+        if profile.for_host(hostname):
+            return profile
+    role = os.getenv(ROLE_ENV) if role is None else role
+    for profile in profiles.values():
+        if role and role in profile.roles:
+            return profile
+    return None
+
+
+# vim: foldlevel=0:
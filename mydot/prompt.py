@@ -0,0 +1,248 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+Shell prompt status segment: `python -m mydot --prompt`
+
+Runs on every prompt render so it is built around a cached snapshot of
+`git status` which is validated with stat stamps of the bare repo's index,
+HEAD and refs. When the snapshot is out of date a refresh is started in the
+background and waited on for at most the time budget. If the budget runs out
+the last known value is printed with a trailing STALE_MARK and the refresh
+keeps running so the next prompt picks up its result.
+
+Only stdlib modules are imported here; `mydot.repository` is imported lazily
+when a new `git status` output has to be turned into counts.
+"""
+
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from mydot.cache import dump_json, load_json, repo_cache_dir, stamps
+
+DEFAULT_BUDGET_MS = 150
+DEFAULT_TTL = 5.0
+STALE_MARK = "*"
+UNKNOWN = "?"
+# a refresh that hasn't finished after this many seconds is presumed dead
+ABANDON_AFTER = 60.0
+
+_ahead = re.compile(r"ahead (\d+)")
+_behind = re.compile(r"behind (\d+)")
+
+
+def format_segment(counts: Dict[str, int]) -> str:
+    """Compact `+staged ~unstaged -deleted ↑ahead ↓behind`, zeros omitted."""
+    symbols = [
+        ("staged", "+"),
+        ("unstaged", "~"),
+        ("deleted", "-"),
+        ("ahead", "↑"),
+        ("behind", "↓"),
+    ]
+    return " ".join(f"{sym}{counts[key]}" for key, sym in symbols if counts.get(key))
+
+
+def parse_branch_header(header: str) -> Dict[str, Optional[str]]:
+    """Read upstream and ahead/behind from a `## branch...upstream [ahead 1]` line."""
+    info: Dict[str, Optional[str]] = {"upstream": None, "ahead": "0", "behind": "0"}
+    branches = header[3:].split(" [")[0]
+    if "..." in branches:
+        info["upstream"] = branches.split("...", 1)[1]
+    if ahead := _ahead.search(header):
+        info["ahead"] = ahead.group(1)
+    if behind := _behind.search(header):
+        info["behind"] = behind.group(1)
+    return info
+
+
+def count_status(output: str, bare_repo: Path, work_tree: Path) -> Dict:
+    """Turn `git status --porcelain -z --branch` output into prompt counts.
+
+    The file lists are bucketed by `Repository` exactly as the pickers see them.
+    """
+    from mydot.repository import Repository
+
+    header, body = "", output
+    if output.startswith("## "):
+        header, _, body = output.partition("\x00")
+    branch = parse_branch_header(header) if header else {}
+
+    repo = Repository(bare_repo, work_tree)
+    repo.short_status = Repository._parse_status(body)
+    counts = {
+        "staged": len(repo.modified_staged) + len(repo.adds_staged) + len(repo.renames),
+        "unstaged": len(repo.modified_unstaged) - len(repo.deleted_unstaged),
+        "deleted": len(repo.deleted_staged) + len(repo.deleted_unstaged),
+        "ahead": int(branch.get("ahead") or 0),
+        "behind": int(branch.get("behind") or 0),
+    }
+    return {"counts": counts, "upstream": branch.get("upstream")}
+
+
+class PromptStatus:
+    """Cached, time boxed status segment for a single dotfiles repository."""
+
+    def __init__(
+        self,
+        bare_repo: Path,
+        work_tree: Path,
+        budget_ms: int = DEFAULT_BUDGET_MS,
+        ttl: float = DEFAULT_TTL,
+    ):
+        self.bare_repo = bare_repo
+        self.work_tree = work_tree
+        self.budget = budget_ms / 1000
+        self.ttl = ttl
+        cache = repo_cache_dir(bare_repo)
+        self.snapshot_file = cache / "prompt.json"
+        self.pending_file = cache / "prompt.pending.json"
+        self.output_file = cache / "prompt.out"
+
+    def stamp(self, upstream: Optional[str]) -> List:
+        """Stat stamps of everything a change in status counts should touch."""
+        git_dir = self.bare_repo
+        head = git_dir / "HEAD"
+        watched = [git_dir / "index", head, git_dir / "packed-refs"]
+        try:
+            ref = head.read_text().strip()
+        except OSError:
+            ref = ""
+        if ref.startswith("ref: "):
+            watched.append(git_dir / ref[5:])
+        if upstream:
+            watched.append(git_dir / "refs" / "remotes" / upstream)
+        return stamps(*watched)
+
+    def render(self) -> str:
+        deadline = time.monotonic() + self.budget
+        snapshot = load_json(self.snapshot_file, default={})
+        current = self.stamp(snapshot.get("upstream"))
+        if self._is_fresh(snapshot, current):
+            return snapshot["segment"]
+
+        harvested = self._harvest()
+        if harvested is not None:
+            snapshot = harvested
+            if self._is_fresh(snapshot, self.stamp(snapshot.get("upstream"))):
+                return snapshot["segment"]
+
+        process = None
+        if not self._refresh_running():
+            process = self._start_refresh(current)
+        if self._wait(process, deadline):
+            harvested = self._harvest()
+            if harvested is not None:
+                return harvested["segment"]
+
+        if "segment" in snapshot:
+            return snapshot["segment"] + STALE_MARK
+        return UNKNOWN
+
+    def _is_fresh(self, snapshot: Dict, current: List) -> bool:
+        return (
+            snapshot.get("stamp") == current
+            and time.time() - snapshot.get("time", 0) < self.ttl
+        )
+
+    def _refresh_running(self) -> bool:
+        pending = load_json(self.pending_file)
+        if pending is None:
+            return False
+        return time.time() - pending.get("started", 0) < ABANDON_AFTER
+
+    def _start_refresh(self, current: List):
+        """Launch `git status` writing to `prompt.out`, detached from this process.
+
+        The output is renamed into place only once git exits successfully so a
+        half written file is never read.
+        """
+        import subprocess
+
+        dump_json(self.pending_file, {"stamp": current, "started": time.time()})
+        git = [
+            "git",
+            "--no-optional-locks",
+            f"--git-dir={self.bare_repo}",
+            f"--work-tree={self.work_tree}",
+            "status",
+            "--porcelain",
+            "-z",
+            "--branch",
+            "--untracked-files=no",
+        ]
+        script = '"$@" > "$0.tmp" && mv "$0.tmp" "$0"'
+        return subprocess.Popen(
+            ["sh", "-c", script, str(self.output_file)] + git,
+            stdin=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+
+    def _wait(self, process, deadline: float) -> bool:
+        """Wait for a refresh to finish until the deadline. True when it finished."""
+        if process is not None:
+            import subprocess
+
+            try:
+                process.wait(timeout=max(deadline - time.monotonic(), 0))
+            except subprocess.TimeoutExpired:
+                return False
+            return self.output_file.exists()
+        while time.monotonic() < deadline:
+            if self.output_file.exists():
+                return True
+            time.sleep(0.005)
+        return self.output_file.exists()
+
+    def _harvest(self) -> Optional[Dict]:
+        """Turn a finished refresh into the new snapshot."""
+        try:
+            output = self.output_file.read_text()
+        except OSError:
+            return None
+        pending = load_json(self.pending_file, default={})
+        result = count_status(output, self.bare_repo, self.work_tree)
+        snapshot = {
+            "stamp": pending.get("stamp"),
+            "time": pending.get("started", 0),
+            "upstream": result["upstream"],
+            "segment": format_segment(result["counts"]),
+            "counts": result["counts"],
+        }
+        dump_json(self.snapshot_file, snapshot)
+        for leftover in [self.output_file, self.pending_file]:
+            try:
+                leftover.unlink()
+            except OSError:
+                pass
+        return snapshot
+
+
+def _env_number(name: str, default: float, kind: type = float) -> float:
+    """Number from the environment, `default` when unset or malformed."""
+    try:
+        return kind(float(os.getenv(name, default)))
+    except (ValueError, OverflowError):
+        return default
+
+
+def main() -> int:
+    """Entry point for `--prompt`. Never fails loudly, prompts must keep working."""
+    dotfiles = os.getenv("DOTFILES")
+    if not dotfiles:
+        return 0
+    budget = int(_env_number("MYDOT_PROMPT_BUDGET", DEFAULT_BUDGET_MS, int))
+    ttl = _env_number("MYDOT_PROMPT_TTL", DEFAULT_TTL)
+    try:
+        status = PromptStatus(Path(dotfiles), Path.home(), budget_ms=budget, ttl=ttl)
+        print(status.render())
+    except Exception:  # a broken prompt is worse than an unknown count
+        print(UNKNOWN)
+    return 0
+
+
+# vim: foldlevel=0:
@@ -7,14 +7,16 @@
 from functools import cached_property
 import os
 from pathlib import Path
-import shutil
 import subprocess
-from typing import List, Union
-
-
-from mydot.console import console
-from mydot.exceptions import MissingRepositoryLocation, WorktreeMissing
+import time
+from typing import Iterator, List, Optional, Union
 
+from mydot.capabilities import which
+from mydot.dotfile import Dotfile, index_records, tree_records
+from mydot.exceptions import MissingRepositoryLocation, ProfileError, WorktreeMissing
+from mydot.logging import git_event, log
+from mydot.objects import ObjectStore, Unsupported, store_for
+from mydot.profiles import PROFILE_ENV, Profile, active_profile, pinned_profile
 
 # Custom Type
 OptionalPath = Union[Path, str, None]
@@ -30,7 +32,7 @@ class Repository:
 
     Useful PROPERTIES
     .tracked -- list of files already committed in repo
-    .list_all -- list of committed and staged files
+    .list_all -- list of committed and staged files (in the active profile)
     .restorables --
     """
 
@@ -55,12 +57,25 @@ class Repository:
         self.run_from: Path = Path.cwd()
         os.chdir(self.work_tree)
 
+    def git(self, args: List[str], **run_args) -> subprocess.CompletedProcess:
+        """`subprocess.run` a git command against this repository.
+
+        Each call is timed and kept in the flight recorder (`mydot.logging`).
+        """
+        start = time.perf_counter()
+        result = subprocess.run(self._git_base + args, **run_args)
+        git_event(args, start, result.returncode)
+        return result
+
     def show_status(self) -> None:
         """Short pretty formatted info about the repo state."""
+        # imported here so the `--prompt` fast path never loads `rich`
+        from mydot.console import console
+
         console.print("Branches:", style="header")
-        subprocess.run(self._git_base + ["branch", "-a"])
+        self.git(["branch", "-a"])
         console.print("\nModified Files:", style="header")
-        subprocess.run(self._git_base + ["status", "-s"])
+        self.git(["status", "-s"])
 
     @staticmethod
     def _resolve_repo_location(path_loc: OptionalPath) -> Path:
@@ -99,13 +114,16 @@ class Repository:
     @cached_property
     def short_status(self) -> List[str]:
         """List of lines in git status porecelain=v1 format (except renames)."""
-        output = subprocess.run(
-            self._git_base
-            + ["status", "--short", "--untracked-files=no", "--porcelain", "-z"],
+        output = self.git(
+            ["status", "--short", "--untracked-files=no", "--porcelain", "-z"],
             text=True,
             capture_output=True,
         ).stdout
+        return self._parse_status(output)
 
+    @staticmethod
+    def _parse_status(output: str) -> List[str]:
+        """Turn `git status --porcelain -z` output into `short_status` lines."""
         pieces = [p for p in output.split("\x00") if p]
         length = len(pieces)
         pos = 0
@@ -123,11 +141,20 @@ class Repository:
                 pos += 1
         return result
 
+    @cached_property
+    def object_store(self) -> Optional[ObjectStore]:
+        """In-process object reader, only when `MYDOT_OBJECTS=python`."""
+        return store_for(self.bare_repo)
+
     @property
     def tracked(self) -> List[str]:
-        output_lines = subprocess.run(
-            self._git_base
-            + ["ls-tree", "--full-tree", "--full-name", "-r", "HEAD", "-z"],
+        if self.object_store is not None:
+            try:
+                return [path for _, _, path in self.object_store.ls_tree("HEAD")]
+            except (Unsupported, KeyError, ValueError) as error:
+                log.debug("object store can't list HEAD: %s", error)
+        output_lines = self.git(
+            ["ls-tree", "--full-tree", "--full-name", "-r", "HEAD", "-z"],
             text=True,
             capture_output=True,
         ).stdout.split("\x00")
@@ -139,8 +166,46 @@ class Repository:
         include = self.tracked + self.adds_staged + self.renames
         removed = self.deleted_staged + self.oldnames
         all = [f for f in include if f not in removed]
+        if self.profile is not None:
+            all = self.profile.filter(all)
         return sorted(list(set(all)))
 
+    @cached_property
+    def profile(self) -> Optional[Profile]:
+        """The host profile limiting `list_all` and `dotfiles()`, if any."""
+        try:
+            name = os.getenv(PROFILE_ENV) or pinned_profile(self.bare_repo)
+            profile = active_profile(name=name)
+        except (KeyError, ValueError) as error:
+            raise ProfileError(error.args[0]) from None
+        log.debug("active profile: %s", profile)
+        return profile
+
+    def dotfiles(self, rev: Optional[str] = None) -> Iterator[Dotfile]:
+        """Stream `Dotfile` records from the index (default) or from `rev`.
+
+        The index covers the same files as `list_all`. Combine with the filters
+        in `mydot.dotfile` to narrow it down without building lists.
+        """
+        if rev is None:
+            records = index_records(self._git_base, self.work_tree)
+        else:
+            records = tree_records(self._git_base, self.work_tree, rev)
+        if self.profile is None:
+            return records
+        return (record for record in records if self.profile.matches(record.path))
+
+    def blob(self, rev: str, path: str) -> bytes:
+        """Content of `path` (relative to the work tree) as committed in `rev`."""
+        if self.object_store is not None:
+            try:
+                return self.object_store.blob(rev, path)
+            except (Unsupported, KeyError, ValueError) as error:
+                log.debug("object store can't read %s:%s: %s", rev, path, error)
+        return self.git(
+            ["cat-file", "blob", f"{rev}:{path}"], capture_output=True
+        ).stdout
+
     @cached_property
     def _git_str(self) -> str:
         """String representation of _git_base command."""
@@ -158,6 +223,11 @@ class Repository:
         """Returns all files staged for deletion."""
         return [stat[3:] for stat in self.short_status if stat[0] == "D"]
 
+    @property
+    def deleted_unstaged(self) -> List[str]:
+        """Returns files deleted from the work tree but not staged for deletion."""
+        return [stat[3:] for stat in self.short_status if stat[:2] == " D"]
+
     @property
     def oldnames(self) -> List[str]:
         """Returns previous name of files renamed in staging area."""
@@ -241,11 +311,11 @@ class Repository:
     @cached_property
     def preview_app(self) -> str:
         """Return: bat > batcat > highlight > cat."""
-        if shutil.which("bat"):
+        if which("bat"):
             return "bat --color=always"
-        elif shutil.which("batcat"):
+        elif which("batcat"):
             return "batcat --color=always"
-        elif shutil.which("highlight"):
+        elif which("highlight"):
             return "highlight -O ansi"
         else:
             return "cat"
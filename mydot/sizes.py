@@ -0,0 +1,147 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+Where the bytes of the dotfiles repository go: `--sizes`
+
+Exactly three git processes, whatever the size of the repository:
+
+- `ls-tree -r -l HEAD`: the current files and their sizes.
+- `cat-file --batch-all-objects --batch-check`: type, size and size on disk
+  (compressed, or the delta when packed) of every object.
+- `rev-list --objects --all`: a path for every blob in history. A blob stored
+  under several paths is counted once, under the first path git reports.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Tuple
+
+from mydot.repository import Repository
+
+DEPTH = 2  # directory levels kept when grouping, e.g. `.config/nvim`
+CHECK_FORMAT = "%(objectname) %(objecttype) %(objectsize) %(objectsize:disk)"
+
+
+class Blob(NamedTuple):
+    oid: str
+    path: str
+    size: int
+    disk: int
+    current: bool  # part of HEAD
+
+
+class DirectoryUsage(NamedTuple):
+    directory: str
+    blobs: int
+    size: int
+    disk: int
+    historic_disk: int  # on disk but no longer in HEAD
+
+
+def human_size(size: float) -> str:
+    if abs(size) < 1024:
+        return f"{size:.0f} B"
+    for unit in ["KiB", "MiB"]:
+        size /= 1024
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+    return f"{size / 1024:.1f} GiB"
+
+
+def group_of(path: str, depth: int = DEPTH) -> str:
+    """Directory a path is counted under: its first `depth` directories."""
+    parts = path.split("/")[:-1]
+    return "/".join(parts[:depth]) or "."
+
+
+class SizeReport:
+    """Sizes of the objects in a repository, attributed to paths."""
+
+    def __init__(self, repo: Repository, depth: int = DEPTH):
+        self.repo = repo
+        self.depth = depth
+        self.objects: Dict[str, Tuple[str, int, int]] = {}
+        self.blobs: List[Blob] = []
+
+    def _run(self, args: List[str]) -> str:
+        return self.repo.git(args, capture_output=True, text=True).stdout
+
+    def _objects(self) -> Dict[str, Tuple[str, int, int]]:
+        output = self._run(
+            ["cat-file", "--batch-all-objects", f"--batch-check={CHECK_FORMAT}"]
+        )
+        objects = {}
+        for line in output.splitlines():
+            oid, kind, size, disk = line.split(" ")
+            objects[oid] = (kind, int(size), int(disk))
+        return objects
+
+    def _history_paths(self) -> Dict[str, str]:
+        paths = {}
+        for line in self._run(["rev-list", "--objects", "--all"]).splitlines():
+            oid, _, path = line.partition(" ")
+            if path:
+                paths.setdefault(oid, path)
+        return paths
+
+    def _current(self) -> Dict[str, str]:
+        current = {}
+        output = self._run(["ls-tree", "-r", "-l", "-z", "HEAD"])
+        for record in output.split("\x00"):
+            if not record:
+                continue
+            meta, path = record.split("\t", 1)
+            _, kind, oid, _ = meta.split()
+            if kind == "blob":
+                current.setdefault(oid, path)
+        return current
+
+    def analyze(self) -> List[Blob]:
+        """Collect every blob with its path, size and size on disk."""
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            objects = pool.submit(self._objects)
+            history = pool.submit(self._history_paths)
+            current = pool.submit(self._current)
+            self.objects = objects.result()
+            paths, in_head = history.result(), current.result()
+        self.blobs = []
+        for oid, (kind, size, disk) in self.objects.items():
+            if kind != "blob":
+                continue
+            path = in_head.get(oid) or paths.get(oid)
+            if path is None:
+                continue  # unreachable: only in the reflog or dangling
+            self.blobs.append(Blob(oid, path, size, disk, oid in in_head))
+        return self.blobs
+
+    def totals(self) -> Dict[str, Tuple[int, int, int]]:
+        """{object type: (count, size, size on disk)} over the whole database."""
+        totals: Dict[str, Tuple[int, int, int]] = {}
+        for kind, size, disk in self.objects.values():
+            count, total, on_disk = totals.get(kind, (0, 0, 0))
+            totals[kind] = (count + 1, total + size, on_disk + disk)
+        return totals
+
+    def largest_current(self, limit: int = 15) -> List[Blob]:
+        current = [b for b in self.blobs if b.current]
+        return sorted(current, key=lambda b: b.size, reverse=True)[:limit]
+
+    def largest_historic(self, limit: int = 15) -> List[Blob]:
+        """Biggest blobs that are no longer in HEAD, by size on disk."""
+        old = [b for b in self.blobs if not b.current]
+        return sorted(old, key=lambda b: (b.disk, b.size), reverse=True)[:limit]
+
+    def directories(self, limit: int = 15) -> List[DirectoryUsage]:
+        groups: Dict[str, List[int]] = {}
+        for blob in self.blobs:
+            usage = groups.setdefault(group_of(blob.path, self.depth), [0, 0, 0, 0])
+            usage[0] += 1
+            usage[1] += blob.size
+            usage[2] += blob.disk
+            if not blob.current:
+                usage[3] += blob.disk
+        ranked = sorted(groups.items(), key=lambda item: item[1][2], reverse=True)
+        return [DirectoryUsage(name, *usage) for name, usage in ranked[:limit]]
+
+
+# vim: foldlevel=0:
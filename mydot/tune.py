@@ -0,0 +1,214 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+Benchmark git on the dotfiles repository and keep the settings that help.
+
+A bare repository with `--work-tree=$HOME` never gets git's speedups for large
+work trees turned on. `Tuner` times the commands mydot runs most (`status`,
+`ls-tree`, plus a history walk) and then tries each `Setting` on top of the
+ones already kept. A setting stays only when the total time drops by at least
+MIN_GAIN, otherwise it is reverted (config values and index format restored).
+"""
+
+from pathlib import Path
+import statistics
+import struct
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+from mydot.repository import Repository
+
+MIN_GAIN = 0.05
+RUNS = 5
+
+BENCHMARKS = {
+    "status": ["status", "--porcelain", "-z", "--untracked-files=no"],
+    "ls-tree": ["ls-tree", "-r", "-z", "--full-tree", "HEAD"],
+    "log": ["rev-list", "--count", "HEAD"],
+}
+
+
+class Setting:
+    """A named group of config values plus the commands that apply/undo them."""
+
+    def __init__(
+        self,
+        name: str,
+        config: Dict[str, str],
+        apply: Optional[List[List[str]]] = None,
+        revert: Optional[List[List[str]]] = None,
+        platforms: Optional[List[str]] = None,
+    ):
+        self.name = name
+        self.config = config
+        self.apply = apply or []
+        self.revert = revert or []
+        self.platforms = platforms
+
+    def __repr__(self) -> str:
+        return f"Setting({self.name!r})"
+
+    @property
+    def supported(self) -> bool:
+        return self.platforms is None or sys.platform in self.platforms
+
+
+SETTINGS = [
+    # git's builtin file system monitor daemon exists on macOS and Windows only
+    Setting(
+        "fsmonitor",
+        {"core.fsmonitor": "true"},
+        revert=[["fsmonitor--daemon", "stop"]],
+        platforms=["darwin", "win32"],
+    ),
+    Setting(
+        "untracked cache",
+        {"core.untrackedCache": "true"},
+        apply=[["update-index", "--untracked-cache"]],
+        revert=[["update-index", "--no-untracked-cache"]],
+    ),
+    Setting(
+        "index v4",
+        {"index.version": "4"},
+        apply=[["update-index", "--index-version", "4"]],
+    ),
+    Setting(
+        "split index",
+        {"core.splitIndex": "true"},
+        apply=[["update-index", "--split-index"]],
+        revert=[["update-index", "--no-split-index"]],
+    ),
+    Setting(
+        "commit-graph",
+        {"core.commitGraph": "true", "fetch.writeCommitGraph": "true"},
+        apply=[["commit-graph", "write", "--reachable"]],
+    ),
+]
+
+
+def index_version(index: Path) -> Optional[int]:
+    """On disk format version of a git index file (2, 3 or 4)."""
+    try:
+        with open(index, "rb") as file:
+            header = file.read(8)
+    except OSError:
+        return None
+    if len(header) < 8 or header[:4] != b"DIRC":
+        return None
+    return struct.unpack(">I", header[4:])[0]
+
+
+class Trial:
+    """Outcome of trying one setting."""
+
+    def __init__(self, setting: Setting, before: Dict, after: Dict, kept: bool):
+        self.setting = setting
+        self.before = before
+        self.after = after
+        self.kept = kept
+
+    @property
+    def gain(self) -> float:
+        before = sum(self.before.values())
+        return (before - sum(self.after.values())) / before if before else 0.0
+
+
+class Tuner:
+    """Try `settings` one at a time against the timings of `repo`."""
+
+    def __init__(
+        self,
+        repo: Repository,
+        settings: Optional[List[Setting]] = None,
+        runs: int = RUNS,
+        min_gain: float = MIN_GAIN,
+    ):
+        self.repo = repo
+        self.settings = [s for s in (settings or SETTINGS) if s.supported]
+        self.runs = runs
+        self.min_gain = min_gain
+        self.trials: List[Trial] = []
+        self.baseline: Dict[str, float] = {}
+        self.final: Dict[str, float] = {}
+
+    def git(self, args: List[str]) -> subprocess.CompletedProcess:
+        return self.repo.git(args, capture_output=True, text=True)
+
+    def time_command(self, args: List[str]) -> float:
+        """Median wall time in seconds after one untimed warm up run."""
+        devnull = subprocess.DEVNULL
+        self.repo.git(args, stdout=devnull, stderr=devnull)
+        timings = []
+        for _ in range(self.runs):
+            start = time.perf_counter()
+            self.repo.git(args, stdout=devnull, stderr=devnull)
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
+
+    def measure(self) -> Dict[str, float]:
+        return {name: self.time_command(args) for name, args in BENCHMARKS.items()}
+
+    def run(self) -> List[Trial]:
+        """Apply every setting that measurably helps, revert the others."""
+        self.baseline = best = self.measure()
+        for setting in self.settings:
+            saved = self._save(setting)
+            self._apply(setting)
+            timings = self.measure()
+            trial = Trial(setting, best, timings, kept=False)
+            trial.kept = trial.gain >= self.min_gain
+            if trial.kept:
+                best = timings
+            else:
+                self._restore(setting, saved)
+            self.trials.append(trial)
+        self.final = best
+        return self.trials
+
+    @property
+    def kept(self) -> List[Setting]:
+        return [trial.setting for trial in self.trials if trial.kept]
+
+    def _save(self, setting: Setting) -> Dict:
+        config = {}
+        for key in setting.config:
+            result = self.git(["config", "--get", key])
+            config[key] = result.stdout.strip() if result.returncode == 0 else None
+        graph = self.repo.bare_repo / "objects" / "info" / "commit-graph"
+        return {
+            "config": config,
+            "index version": index_version(self.repo.bare_repo / "index"),
+            "commit-graph": graph.exists(),
+        }
+
+    def _apply(self, setting: Setting) -> None:
+        for key, value in setting.config.items():
+            self.git(["config", key, value])
+        for args in setting.apply:
+            self.git(args)
+
+    def _restore(self, setting: Setting, saved: Dict) -> None:
+        for args in setting.revert:
+            self.git(args)
+        for key, value in saved["config"].items():
+            if value is None:
+                self.git(["config", "--unset", key])
+            else:
+                self.git(["config", key, value])
+        version = saved["index version"]
+        if version and version != index_version(self.repo.bare_repo / "index"):
+            self.git(["update-index", "--index-version", str(version)])
+        if not saved["commit-graph"]:
+            info = self.repo.bare_repo / "objects" / "info"
+            (info / "commit-graph").unlink(missing_ok=True)
+            chain = info / "commit-graphs"
+            if chain.is_dir():
+                for graph in chain.iterdir():
+                    graph.unlink()
+                chain.rmdir()
+
+
+# vim: foldlevel=0:
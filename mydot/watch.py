@@ -0,0 +1,366 @@
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+"""
+Keep the staged/unstaged/deleted state of the dotfiles up to date: `--watch`
+
+- One `git status` at start up. After that git is only asked about the paths
+  that changed, with a pathspec limited `git status` (never a full one).
+- A change to the bare repo's `index`, `HEAD` or the current branch re-reads
+  the staged set with `git diff-index --cached` (index against HEAD, no work
+  tree scan) and re-checks only the paths that were or are dirty.
+- Changes come from inotify (Linux, through ctypes) on the directories that
+  hold tracked files. Elsewhere the tracked files are stat'ed every second.
+- Bursts of events (an editor saving, a `git checkout`) are debounced and
+  handled as one batch.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+from pathlib import Path
+import select
+import struct
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from mydot.cache import stat_stamp
+from mydot.logging import event, log
+from mydot.repository import Repository
+
+DEBOUNCE = 0.1  # quiet time (seconds) that ends a batch of events
+MAX_DELAY = 1.0  # a batch never waits longer than this
+POLL_INTERVAL = 1.0
+CHUNK = 500  # paths per `git status` call, keeps the command line short
+OVERFLOW = "*"  # "too many events, start over"
+
+SECTIONS = ("staged", "unstaged", "deleted")
+
+# inotify(7)
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def sections_of(code: Optional[str]) -> Set[str]:
+    """Dashboard sections a porcelain `XY` status code is listed in."""
+    if code is None:
+        return set()
+    found = set()
+    if code[0] not in " D":
+        found.add("staged")
+    if code[1] == "M":
+        found.add("unstaged")
+    if "D" in code:
+        found.add("deleted")
+    return found
+
+
+def parse_porcelain(output: str) -> Dict[str, str]:
+    """`git status --porcelain -z --no-renames` output as {path: XY}."""
+    return {entry[3:]: entry[:2] for entry in output.split("\x00") if entry}
+
+
+class StatusBoard:
+    """Status codes of the dirty dotfiles, updated one batch of paths at a time."""
+
+    def __init__(self, repo: Repository):
+        self.repo = repo
+        self.codes: Dict[str, str] = {}
+        self.dirty: Set[str] = set(SECTIONS)  # sections to redraw
+        self.queries = 0
+
+    def _status(self, pathspec: Optional[List[str]] = None) -> Dict[str, str]:
+        self.queries += 1
+        args = ["--no-optional-locks", "--literal-pathspecs", "status"]
+        args += ["--porcelain", "-z", "--untracked-files=no", "--no-renames"]
+        if pathspec is not None:
+            args += ["--"] + pathspec
+        output = self.repo.git(
+            args, capture_output=True, text=True, cwd=self.repo.work_tree
+        ).stdout
+        return parse_porcelain(output)
+
+    def load(self) -> Set[str]:
+        """Full `git status`, only at start up or after lost events."""
+        fresh = self._status()
+        changed = {
+            p for p in set(fresh) | set(self.codes) if fresh.get(p) != self.codes.get(p)
+        }
+        self.codes = fresh
+        self.dirty = set(SECTIONS)
+        return changed
+
+    def refresh(self, paths: Iterable[str]) -> Set[str]:
+        """Re-query the status of `paths` only. Returns the paths that changed."""
+        paths = sorted(set(paths))
+        fresh: Dict[str, str] = {}
+        for start in range(0, len(paths), CHUNK):
+            fresh.update(self._status(paths[start : start + CHUNK]))
+        changed = set()
+        for path in set(paths) | set(fresh):
+            old, new = self.codes.get(path), fresh.get(path)
+            if old == new:
+                continue
+            changed.add(path)
+            self.dirty |= sections_of(old) | sections_of(new)
+            if new is None:
+                del self.codes[path]
+            else:
+                self.codes[path] = new
+        return changed
+
+    def refresh_index(self, paths: Iterable[str] = ()) -> Set[str]:
+        """The index or HEAD moved: re-check staged, dirty and `paths`."""
+        self.queries += 1
+        proc = self.repo.git(
+            ["diff-index", "--cached", "--name-only", "-z", "--no-renames", "HEAD"],
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            return self.load()  # no commits yet
+        staged = {p for p in proc.stdout.split("\x00") if p}
+        return self.refresh(staged | set(self.codes) | set(paths))
+
+    def section(self, name: str) -> List[str]:
+        return sorted(p for p, code in self.codes.items() if name in sections_of(code))
+
+
+class Inotify:
+    """Directory watches through the Linux inotify API, reporting tracked files."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories: Dict[int, str] = {}
+        self.watched: Set[str] = set()
+        self.files: Set[str] = set()
+        self.parents: Set[str] = set()
+
+    def _watch(self, directory: str) -> None:
+        wd = self._add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            code = ctypes.get_errno()
+            if code in (errno.ENOENT, errno.ENOTDIR):
+                return  # the directory will be watched once it exists
+            raise OSError(code, f"inotify_add_watch {directory}: {os.strerror(code)}")
+        self.directories[wd] = directory
+        self.watched.add(directory)
+
+    def track(self, files: Iterable[str]) -> None:
+        """Report changes to `files` (absolute paths) from now on."""
+        self.files = set(files)
+        parents = {os.path.dirname(f) for f in self.files}
+        self.parents = set()
+        for parent in parents:
+            while parent not in self.parents and parent != os.path.dirname(parent):
+                self.parents.add(parent)
+                parent = os.path.dirname(parent)
+        for directory in sorted(parents - self.watched):
+            self._watch(directory)
+            # missing: watch the closest existing ancestor to see it come back
+            while directory not in self.watched and directory in self.parents:
+                directory = os.path.dirname(directory)
+                if directory in self.parents and directory not in self.watched:
+                    self._watch(directory)
+
+    def _created(self, directory: str) -> Set[str]:
+        """A directory leading to tracked files (re)appeared: watch it all."""
+        prefix = directory + os.sep
+        for parent in sorted(p for p in self.parents if p.startswith(prefix)):
+            if parent not in self.watched:
+                self._watch(parent)
+        if directory not in self.watched:
+            self._watch(directory)
+        return {f for f in self.files if f.startswith(prefix)}
+
+    def wait(self, timeout: Optional[float]) -> Set[str]:
+        """Tracked files that changed, waiting up to `timeout` seconds for one."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 256 * 1024)
+        except BlockingIOError:
+            return set()
+        changed: Set[str] = set()
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\x00"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                changed.add(OVERFLOW)
+                continue
+            if mask & IN_IGNORED:
+                self.watched.discard(self.directories.pop(wd, ""))
+                continue
+            directory = self.directories.get(wd)
+            if directory is None:
+                continue
+            path = os.path.join(directory, name)
+            if path in self.files:
+                changed.add(path)
+            elif mask & IN_ISDIR and path in self.parents:
+                changed |= self._created(path)
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class Poller:
+    """Fallback without inotify: stat the tracked files every `interval`."""
+
+    def __init__(self, interval: float = POLL_INTERVAL):
+        self.interval = interval
+        self.stamps: Dict[str, object] = {}
+
+    def track(self, files: Iterable[str]) -> None:
+        self.stamps = {f: self.stamps.get(f) or stat_stamp(f) for f in files}
+
+    def wait(self, timeout: Optional[float]) -> Set[str]:
+        while True:
+            time.sleep(self.interval if timeout is None else timeout)
+            changed = set()
+            for path, old in self.stamps.items():
+                new = stat_stamp(path)
+                if new != old:
+                    self.stamps[path] = new
+                    changed.add(path)
+            if changed or timeout is not None:
+                return changed
+
+    def close(self) -> None:
+        pass
+
+
+def change_source():
+    """inotify where available, polling anywhere else."""
+    try:
+        return Inotify()
+    except (OSError, AttributeError, TypeError) as error:
+        log.debug("inotify unavailable (%s), polling instead", error)
+        return Poller()
+
+
+class StatusWatcher:
+    """Feeds file system changes into a `StatusBoard`, a batch at a time."""
+
+    def __init__(
+        self,
+        repo: Repository,
+        source=None,
+        debounce: float = DEBOUNCE,
+        max_delay: float = MAX_DELAY,
+    ):
+        self.repo = repo
+        self.board = StatusBoard(repo)
+        self.source = change_source() if source is None else source
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.work_tree = str(repo.work_tree.absolute())
+        self.tracked: Set[str] = set()
+        self.repo_files: Set[str] = set()
+
+    @property
+    def method(self) -> str:
+        return "inotify" if isinstance(self.source, Inotify) else "polling"
+
+    def _repo_files(self) -> Set[str]:
+        git_dir = Path(self.repo.bare_repo).absolute()
+        head = git_dir / "HEAD"
+        files = {git_dir / "index", head, git_dir / "packed-refs"}
+        try:
+            ref = head.read_text().strip()
+        except OSError:
+            ref = ""
+        if ref.startswith("ref: "):
+            files.add(git_dir / ref[5:])
+        return {str(f) for f in files}
+
+    def track(self) -> None:
+        """(Re)read the tracked paths from the index and watch them."""
+        output = self.repo.git(["ls-files", "-z"], capture_output=True, text=True)
+        self.tracked = {p for p in output.stdout.split("\x00") if p}
+        self.repo_files = self._repo_files()
+        absolute = {os.path.join(self.work_tree, p) for p in self.tracked}
+        self.source.track(absolute | self.repo_files)
+
+    def collect(self) -> Set[str]:
+        """Block for a change, then gather the rest of its burst."""
+        pending = set()
+        while not pending:
+            pending = self.source.wait(None)
+        deadline = time.monotonic() + self.max_delay
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            more = self.source.wait(min(self.debounce, remaining))
+            if not more:
+                break
+            pending |= more
+        return pending
+
+    def apply(self, paths: Set[str]) -> Set[str]:
+        """Update the board for a batch of changed paths."""
+        start = time.perf_counter()
+        if OVERFLOW in paths:
+            self.track()
+            changed = self.board.load()
+        else:
+            prefix = self.work_tree + os.sep
+            work = {p[len(prefix) :] for p in paths if p.startswith(prefix)}
+            work &= self.tracked
+            if paths & self.repo_files:
+                self.track()
+                changed = self.board.refresh_index(work)
+            else:
+                changed = self.board.refresh(work) if work else set()
+        event(
+            "watch",
+            paths=len(paths),
+            changed=len(changed),
+            ms=round((time.perf_counter() - start) * 1000, 2),
+        )
+        return changed
+
+    def updates(self) -> Iterator[Set[str]]:
+        """The initial state, then every batch that changed something."""
+        self.track()
+        yield self.board.load()
+        try:
+            while True:
+                changed = self.apply(self.collect())
+                if changed:
+                    yield changed
+        finally:
+            self.source.close()
+
+
+# vim: foldlevel=0:
@@ -16,6 +16,7 @@ setup(
     author_email="gikeymarcia@gmail.com",
     license="GPL-3.0",
     packages=find_packages(exclude="tests"),
+    package_data={"mydot": ["completions/*"]},
     install_requires=["pydymenu>=0.5.0", "rich"],
     entry_points={
         'console_scripts': [
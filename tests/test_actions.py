@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+# standard library
+from typing import List
+
+import pytest
+
+from mydot import actions
+from mydot.actions import (
+    AddChanges,
+    Clipboard,
+    CompareManifests,
+    Deploy,
+    DiscardChanges,
+    Restore,
+    Result,
+    Snapshot,
+    WriteManifest,
+)
+from mydot.classify import BlobClassifier
+from mydot.exceptions import MydotError, NoSelection, NothingToDo
+from mydot.numstat import annotate, numstat
+
+
+class Scripted:
+    """A selector that answers with a prepared list of picks, in order."""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.offered: List[List[str]] = []
+
+    def __call__(self, items, prompt=" > ", multi=False, preview=None):
+        self.offered.append(list(items))
+        return self.answers.pop(0)
+
+
+def test_injected_selector_drives_a_loop(fake_repo):
+    df = fake_repo["df"]
+    unstaged = sorted(df.modified_unstaged)
+    biggest_first = [c.path for c in annotate(df.modified_unstaged, numstat(df))]
+    picks = Scripted(unstaged[:1], unstaged[1:])
+    add = AddChanges(df, selector=picks)
+
+    first = add.run()
+    assert first == Result("add", unstaged[:1])
+    assert unstaged[0] not in df.modified_unstaged
+    second = add.run()
+    assert second.paths == unstaged[1:]
+    # offered biggest change first, then what was left
+    assert picks.offered[0] == biggest_first
+    assert sorted(picks.offered[1]) == unstaged[1:]
+
+    with pytest.raises(NothingToDo):
+        add.run()
+
+
+def test_restore_and_discard(fake_repo):
+    df = fake_repo["df"]
+    restorable = list(df.restorables)
+    result = Restore(df, selector=lambda items, **_: items).run()
+    assert result.action == "restore" and sorted(result.paths) == restorable
+    assert df.restorables == []
+
+    unstaged = list(df.modified_unstaged)
+    discard = DiscardChanges(
+        df, selector=lambda items, **_: ["in folder/modified unstaged"]
+    )
+    assert discard.run().paths == ["in folder/modified unstaged"]
+    assert len(df.modified_unstaged) == len(unstaged) - 1
+
+
+def test_cancelled_selection(fake_repo):
+    with pytest.raises(NoSelection) as error:
+        AddChanges(fake_repo["df"], selector=lambda items, **_: None).run()
+    assert isinstance(error.value, MydotError)
+    assert "No changes will be staged" in str(error.value)
+
+
+@pytest.mark.parametrize("interrupt", [EOFError, KeyboardInterrupt])
+def test_fallback_picker_can_be_cancelled(fake_repo, monkeypatch, interrupt):
+    monkeypatch.setattr(actions, "which", lambda program: None)  # no fzf
+
+    def typed(prompt):
+        raise interrupt
+
+    monkeypatch.setattr("builtins.input", typed)
+    with pytest.raises(NoSelection):
+        Clipboard(fake_repo["df"]).run()
+
+
+def test_query_skips_the_preview(fake_repo, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    classified = []
+    monkeypatch.setattr(
+        BlobClassifier, "classify_all", lambda self: classified.append(1)
+    )
+    clips = []
+    clipper = type("Clip", (), {"clip": lambda self, text: clips.append(text)})()
+    result = Clipboard(fake_repo["df"], clipper=clipper, query="unmodified").run()
+    assert result.paths == ["unmodified"]
+    assert classified == []  # no picker, no classification
+
+    offered = []
+    Clipboard(
+        fake_repo["df"],
+        clipper=clipper,
+        selector=lambda items, preview=None, **_: offered.append(preview) or items,
+    ).run()
+    assert len(classified) == 1 and "non-text" in offered[0]
+
+
+def test_run_returns_results_and_report_prints(
+    fake_repo, tmp_path, monkeypatch, capsys
+):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    df = fake_repo["df"]
+    manifest = tmp_path / "manifest.txt"
+    actions = [
+        WriteManifest(df, str(manifest)),
+        CompareManifests(str(manifest), str(manifest)),
+        Snapshot(df, str(tmp_path / "snapshots")),
+        Deploy(df, str(tmp_path / "target")),
+    ]
+    results = [action.run() for action in actions]
+    assert capsys.readouterr().out == ""  # the core stays quiet
+    assert [r.action for r in results] == ["manifest", "compare", "snapshot", "deploy"]
+    # both skip "deleted unstaged", gone from the work tree
+    assert results[0].detail == len(results[2].paths) == len(df.list_all) - 1
+    assert results[1].paths == []
+    assert results[2].detail.is_dir()
+    assert results[3].detail["written"] == len(results[3].paths)
+
+    for action, result in zip(actions, results):
+        action.report(result)
+    out = capsys.readouterr().out
+    assert "files written to" in out and "match" in out and "snapshot ready" in out
+
+
+# vim: foldlevel=1:
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+import os
+
+import pytest
+
+from mydot import capabilities
+
+
+@pytest.fixture
+def bin_dir(tmp_path, monkeypatch):
+    path = tmp_path / "bin"
+    path.mkdir()
+    monkeypatch.setenv("PATH", str(path))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.delenv("EDITOR", raising=False)
+    capabilities.forget()
+    yield path
+    capabilities.forget()
+
+
+def install(bin_dir, name):
+    program = bin_dir / name
+    program.write_text("#!/bin/sh\n")
+    program.chmod(0o755)
+    return str(program)
+
+
+def test_probe_finds_programs(bin_dir):
+    nvim = install(bin_dir, "nvim")
+    found = capabilities.probe()
+    assert found["nvim"] == nvim
+    assert found["xclip"] is None
+
+
+def test_probe_is_cached_on_disk(bin_dir, monkeypatch):
+    install(bin_dir, "bat")
+    capabilities.probe()
+    capabilities.forget()
+    monkeypatch.setattr(capabilities.shutil, "which", lambda _: pytest.fail())
+    assert capabilities.which("bat") == str(bin_dir / "bat")
+
+
+def test_probe_invalidates_when_path_dir_changes(bin_dir):
+    assert capabilities.which("xsel") is None
+    install(bin_dir, "xsel")
+    # make sure the directory mtime moves even on coarse filesystems
+    stamp = os.stat(bin_dir).st_mtime_ns + 10**9
+    os.utime(bin_dir, ns=(stamp, stamp))
+    capabilities.forget()
+    assert capabilities.which("xsel") == str(bin_dir / "xsel")
+
+
+def test_editor_env_is_probed(bin_dir, monkeypatch):
+    monkeypatch.setenv("EDITOR", "micro")
+    micro = install(bin_dir, "micro")
+    assert capabilities.probe()["micro"] == micro
+
+
+# vim: foldlevel=1:
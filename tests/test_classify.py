@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+import subprocess
+
+import pytest
+
+from mydot import classify
+from mydot.actions import Grep
+from mydot.classify import (
+    BINARY,
+    SYMLINK,
+    TEXT,
+    BlobClassifier,
+    preview_command,
+    sniff,
+)
+from mydot.dotfile import NoBinaries, pipeline
+
+
+@pytest.fixture
+def classified_repo(fake_repo, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    worktree, git = fake_repo["worktree"], fake_repo["git"]
+    (worktree / "image.bin").write_bytes(b"\x89PNG\x00\x00binary")
+    (worktree / "utf8.txt").write_text("héllo\nwörld", encoding="utf-8")
+    (worktree / "link").symlink_to("unmodified")
+    git(["add", "image.bin", "utf8.txt", "link"])
+    git(["commit", "-m", "more kinds of files"])
+    fake_repo["df"].freshen()
+    return fake_repo
+
+
+def test_sniff(tmp_path):
+    text = tmp_path / "text"
+    text.write_text("a\nb\n")
+    assert sniff(text) == [TEXT, "ascii", 2]
+    latin = tmp_path / "latin"
+    latin.write_bytes("caf\xe9".encode("latin-1"))
+    assert sniff(latin) == [TEXT, "latin-1", 1]
+    binary = tmp_path / "binary"
+    binary.write_bytes(b"\x00\x01")
+    assert sniff(binary)[0] == BINARY
+    utf16 = tmp_path / "utf16"
+    utf16.write_text("a\nb\n", encoding="utf-16")
+    assert sniff(utf16) == [TEXT, "utf-16", 2]
+    late_nul = tmp_path / "late nul"  # only the first BINARY_SNIFF bytes count
+    late_nul.write_bytes(b"x\n" * classify.BINARY_SNIFF + b"\x00")
+    assert sniff(late_nul) == [TEXT, "ascii", classify.BINARY_SNIFF + 1]
+
+
+def test_sniff_reads_only_the_head_of_binaries(tmp_path, monkeypatch):
+    binary = tmp_path / "big.bin"
+    binary.write_bytes(b"\x00" * (classify.BINARY_SNIFF * 4))
+    sizes = []
+    real_open = open
+
+    class Recorder:
+        def __init__(self, *args):
+            self.file = real_open(*args)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.file.close()
+
+        def read(self, size=-1):
+            data = self.file.read(size)
+            sizes.append(len(data))
+            return data
+
+    monkeypatch.setattr(classify, "open", Recorder, raising=False)
+    assert sniff(binary)[0] == BINARY
+    assert sizes == [classify.BINARY_SNIFF]
+
+
+def test_grep_without_text_files(classified_repo, monkeypatch):
+    monkeypatch.setattr(BlobClassifier, "text_files", lambda self: [])
+    real_run = subprocess.run
+
+    def run(args, **kwargs):
+        assert args[0] != "grep", "grep without files would wait on stdin"
+        return real_run(args, **kwargs)
+
+    monkeypatch.setattr(subprocess, "run", run)
+    assert Grep(classified_repo["df"], "anything").search() == []
+
+
+def test_classify_all(classified_repo):
+    results = BlobClassifier(classified_repo["df"]).classify_all()
+    assert results["image.bin"][0] == BINARY
+    assert results["utf8.txt"] == [TEXT, "utf-8", 2]
+    assert results["link"][0] == SYMLINK
+
+
+def test_clean_files_are_read_once_per_blob(classified_repo, monkeypatch):
+    dotfiles = classified_repo["df"]
+    BlobClassifier(dotfiles).classify_all()
+    read = []
+    fake_sniff = lambda path: read.append(path) or [TEXT, None, 0]  # noqa: E731
+    monkeypatch.setattr(classify, "sniff", fake_sniff)
+    BlobClassifier(dotfiles).classify_all()
+    # only files with unstaged changes are looked at again
+    assert {str(p.relative_to(dotfiles.work_tree)) for p in read} <= set(
+        dotfiles.modified_unstaged
+    )
+    read.clear()
+    BlobClassifier(dotfiles).classify_all()
+    assert read == []
+
+
+def test_no_binaries_uses_classifier(classified_repo):
+    dotfiles = classified_repo["df"]
+    no_binaries = NoBinaries(BlobClassifier(dotfiles))
+    kept = {d.path for d in pipeline(dotfiles.dotfiles(), no_binaries)}
+    assert "utf8.txt" in kept
+    assert "image.bin" not in kept and "link" not in kept
+
+
+def test_preview_skips_binaries(classified_repo):
+    command = preview_command(BlobClassifier(classified_repo["df"]), "cat")
+    for name, expected in [("image.bin", "(binary file)"), ("utf8.txt", "héllo")]:
+        shown = subprocess.run(
+            ["sh", "-c", command.replace("{}", f"'{name}'")],
+            capture_output=True,
+            text=True,
+            cwd=classified_repo["worktree"],
+        ).stdout
+        assert expected in shown
+
+
+# vim: foldlevel=1:
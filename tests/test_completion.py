@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from mydot.completion import (
+    completion_script,
+    is_stale,
+    refresh_completion_data,
+    write_completion_data,
+)
+
+
+@pytest.fixture
+def dotfiles(fake_repo, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return fake_repo["df"]
+
+
+def test_write_completion_data(dotfiles):
+    target = write_completion_data(dotfiles)
+    tracked = (target / "tracked").read_text().splitlines()
+    modified = (target / "modified").read_text().splitlines()
+    assert tracked == dotfiles.list_all
+    assert "modified unstaged changes" in modified
+    assert "modified staged changes" in modified
+    assert "unmodified" not in modified
+    assert (target / "worktree").read_text().strip() == str(dotfiles.work_tree)
+
+
+def test_stamp_goes_stale_when_index_changes(dotfiles, fake_repo):
+    assert refresh_completion_data(dotfiles) is False  # never requested
+    target = write_completion_data(dotfiles)
+    assert not is_stale(dotfiles)
+    earlier = os.stat(dotfiles.bare_repo / "index").st_mtime_ns - 10**9
+    os.utime(target / "stamp", ns=(earlier, earlier))
+    assert is_stale(dotfiles)
+    assert refresh_completion_data(dotfiles) is True
+    assert not is_stale(dotfiles)
+
+
+@pytest.mark.parametrize("shell", ["bash", "zsh"])
+def test_completion_script_lists_flags(shell):
+    script = completion_script(shell, ["--edit", "-e"])
+    assert "@FLAGS@" not in script
+    assert "--edit -e" in script
+
+
+@pytest.mark.skipif(not shutil.which("bash"), reason="needs bash")
+def test_bash_completes_every_section(dotfiles, fake_repo, tmp_path):
+    (fake_repo["worktree"] / "unmodified").chmod(0o755)
+    target = write_completion_data(dotfiles)
+    script = tmp_path / "mydot.bash"
+    script.write_text(completion_script("bash", ["--run", "-r"]))
+
+    def complete(*words):
+        shell = (
+            f"source {script}; COMP_WORDS=(mydot {' '.join(words)} '');"
+            f" COMP_CWORD={len(words) + 1}; _mydot;"
+            ' printf "%s\\n" "${COMPREPLY[@]}"'
+        )
+        env = dict(os.environ, DOTFILES=str(dotfiles.bare_repo))
+        run = subprocess.run(
+            ["bash", "-c", shell],
+            cwd=dotfiles.work_tree,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        return run.stdout.splitlines()
+
+    assert complete("-r", "-q") == ["unmodified"]  # the executables section
+    assert set(complete("-q")) == set(dotfiles.list_all)
+    modified = (target / "modified").read_text().splitlines()
+    assert complete("git", "add") == modified
+
+
+# vim: foldlevel=1:
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+import errno
+import os
+import shutil
+
+import pytest
+
+from mydot import Repository
+from mydot.deploy import Deployer, cat_file_batch
+from mydot.exceptions import DeployError, MissingObject
+
+
+@pytest.fixture
+def committed(fake_repo):
+    """fake_repo with an executable, a symlink and a nested file committed."""
+    worktree, git = fake_repo["worktree"], fake_repo["git"]
+    (worktree / "bin").mkdir()
+    (worktree / "bin/tool").write_text("#!/bin/sh\necho hi\n")
+    (worktree / "bin/tool").chmod(0o755)
+    (worktree / "link").symlink_to("unmodified")
+    git(["add", "bin/tool", "link"])
+    git(["commit", "-m", "more files"])
+    return fake_repo
+
+
+def head_content(repo, path):
+    return repo["git"](["show", f"HEAD:{path}"]).stdout
+
+
+def test_cat_file_batch(committed):
+    git = committed["git"]
+    paths = ["unmodified", "bin/tool", "unmodified"]
+    oids = [git(["rev-parse", f"HEAD:{p}"]).stdout.strip() for p in paths]
+    contents = list(cat_file_batch(committed["df"]._git_base, oids))
+    assert [c.decode() for c in contents] == [head_content(committed, p) for p in paths]
+    with pytest.raises(MissingObject):
+        list(cat_file_batch(committed["df"]._git_base, ["1" * 40]))
+
+
+def test_deploy_into_new_target(committed, tmp_path):
+    target = tmp_path / "target"
+    (target / "in folder").mkdir(parents=True)
+    (target / "unmodified").write_text("a local file in the way")
+    (target / "bin").write_text("a file where a directory goes")
+    same = head_content(committed, "in folder/modified staged")
+    (target / "in folder/modified staged").write_text(same)
+
+    deployer = Deployer(committed["df"], target)
+    result = deployer.run()
+
+    assert result["conflicts"] == ["bin", "unmodified"]
+    assert result["unchanged"] == 1
+    backup = result["backup"]
+    assert (backup / "unmodified").read_text() == "a local file in the way"
+    assert (backup / "bin").read_text() == "a file where a directory goes"
+
+    tracked = committed["df"].tracked
+    assert result["written"] == len(tracked) - 1
+    for path in tracked:
+        if path != "link":
+            assert (target / path).read_text() == head_content(committed, path)
+    assert os.access(target / "bin/tool", os.X_OK)
+    assert not os.access(target / "unmodified", os.X_OK)
+    assert os.readlink(target / "link") == "unmodified"
+
+    again = Deployer(committed["df"], target).run()
+    assert again["written"] == 0 and not again["conflicts"]
+
+
+def test_symlinked_directory_is_followed(committed, tmp_path):
+    target, elsewhere = tmp_path / "target", tmp_path / "other disk"
+    (elsewhere / "in folder").mkdir(parents=True)
+    (elsewhere / "in folder/keep me").write_text("not tracked")
+    target.mkdir()
+    (target / "in folder").symlink_to(elsewhere / "in folder")
+    result = Deployer(committed["df"], target).run()
+    assert result["conflicts"] == []
+    assert (target / "in folder").is_symlink()
+    assert (elsewhere / "in folder/keep me").exists()
+    assert (elsewhere / "in folder/modified staged").read_text() == head_content(
+        committed, "in folder/modified staged"
+    )
+
+
+def test_backup_across_devices(committed, tmp_path, monkeypatch):
+    target = tmp_path / "target"
+    target.mkdir()
+    (target / "unmodified").write_text("in the way")
+    (target / "bin").write_text("also in the way")
+
+    def cross_device(src, dst):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    monkeypatch.setattr(os, "rename", cross_device)
+    result = Deployer(committed["df"], target).run()  # copied instead
+    assert (result["backup"] / "unmodified").read_text() == "in the way"
+    assert (target / "unmodified").read_text() == head_content(committed, "unmodified")
+
+    (target / "unmodified").write_text("in the way again")
+    shutil.rmtree(target / "bin")
+    (target / "bin").write_text("and again")
+    real_move = shutil.move
+
+    def fail_second(src, dst):
+        if src.endswith("unmodified"):
+            raise OSError(errno.EACCES, "Permission denied")
+        return real_move(src, dst)
+
+    monkeypatch.setattr(shutil, "move", fail_second)
+    with pytest.raises(DeployError, match="back up unmodified.*moved to .*: bin"):
+        Deployer(committed["df"], target).run()
+    assert (target / "unmodified").read_text() == "in the way again"
+
+
+def test_deploy_into_work_tree_resets_index(committed, tmp_path):
+    home = tmp_path / "home"
+    home.mkdir()
+    (committed["bare"] / "index").unlink()  # a fresh clone, never checked out
+    repo = Repository(committed["bare"], home)
+    Deployer(repo, home).run()
+    assert repo.short_status == []
+
+
+def test_dirty_work_tree_is_refused(committed):
+    worktree = committed["worktree"]
+    before = (worktree / "in folder/modified unstaged").read_text()
+    with pytest.raises(DeployError, match="uncommitted"):
+        Deployer(committed["df"], worktree).run()
+    assert (worktree / "in folder/modified unstaged").read_text() == before
+    assert not list(worktree.glob(".mydot-backup-*"))
+
+
+# vim: foldlevel=1:
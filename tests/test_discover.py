@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+import pytest
+
+from mydot.discover import DEFAULT_RULES, DiscoveryScanner, discover, load_rules
+
+
+@pytest.fixture
+def home(tmp_path):
+    home = tmp_path / "home"
+    for rel in [
+        ".bashrc",
+        ".config/kitty/kitty.conf",
+        ".config/nvim/init.lua",
+        ".config/project/.git/HEAD",
+        ".config/project/setup.py",
+        ".cache/thing/blob",
+        ".local/share/app/data",
+        ".local/bin/tool",
+        ".node/node_modules/x/index.js",
+        "Documents/taxes.pdf",
+        "notes.txt",
+    ]:
+        path = home / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(rel)
+    return home
+
+
+def test_prune_rules(home):
+    found = DiscoveryScanner(home, DEFAULT_RULES).scan()
+    assert found == [
+        ".bashrc",
+        ".config/kitty/kitty.conf",
+        ".config/nvim/init.lua",
+        ".local/bin/tool",
+    ]
+
+
+def test_depth_limit(home):
+    found = DiscoveryScanner(home, DEFAULT_RULES, max_depth=0).scan()
+    assert found == [".bashrc"]
+
+
+def test_unchanged_directories_come_from_cache(home, tmp_path):
+    cache = tmp_path / "discover.json"
+    first = DiscoveryScanner(home, DEFAULT_RULES, cache_file=cache)
+    assert first.scan()
+    assert first.rescanned > 0
+
+    second = DiscoveryScanner(home, DEFAULT_RULES, cache_file=cache)
+    assert second.scan() == first.scan()
+    assert second.rescanned == 0
+
+    (home / ".config/kitty/theme.conf").write_text("new")
+    third = DiscoveryScanner(home, DEFAULT_RULES, cache_file=cache)
+    assert ".config/kitty/theme.conf" in third.scan()
+    assert third.rescanned == 1
+
+
+def test_user_rules(tmp_path):
+    rules_file = tmp_path / "discover-ignore"
+    rules_file.write_text("# comment\n.config/kitty\n!.cache\n")
+    rules = load_rules(rules_file)
+    assert ".config/kitty" in rules
+    assert ".cache" not in rules
+
+
+def test_discover_skips_tracked(fake_repo, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    worktree = fake_repo["worktree"]
+    (worktree / ".newrc").write_text("set x")
+    (worktree / ".unmodified").write_text("")
+    found = discover(fake_repo["df"])
+    assert found == [".newrc", ".unmodified"]
+
+
+# vim: foldlevel=1:
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+from itertools import islice
+
+import pytest
+
+from mydot.dotfile import (
+    Executable,
+    NoBinaries,
+    RelativeTo,
+    pipeline,
+)
+
+
+@pytest.fixture
+def mixed_repo(fake_repo):
+    """fake_repo plus a script and a binary file committed under .config/"""
+    worktree, git = fake_repo["worktree"], fake_repo["git"]
+    config = worktree / ".config"
+    config.mkdir()
+    script = config / "run.sh"
+    script.write_text("#!/bin/sh\necho hi\n")
+    script.chmod(0o755)
+    (config / "image.bin").write_bytes(b"\x89PNG\x00\x00binary")
+    (config / "notes.txt").write_text("plain text\n")
+    (worktree / "root.sh").write_text("#!/bin/sh\n")
+    (worktree / "root.sh").chmod(0o755)
+    git(["add", ".config", "root.sh"])
+    git(["commit", "-m", "mixed content"])
+    fake_repo["df"].freshen()
+    return fake_repo
+
+
+def test_index_records_match_list_all(fake_repo):
+    dotfiles = fake_repo["df"]
+    assert sorted(d.path for d in dotfiles.dotfiles()) == dotfiles.list_all
+
+
+def test_tree_records_match_tracked(fake_repo):
+    dotfiles = fake_repo["df"]
+    records = list(dotfiles.dotfiles("HEAD"))
+    assert sorted(d.path for d in records) == dotfiles.tracked
+    assert all(len(d.oid) == 40 and d.size is not None for d in records)
+
+
+def test_filters_compose(mixed_repo):
+    dotfiles = mixed_repo["df"]
+    chain = pipeline(dotfiles.dotfiles(), NoBinaries(), RelativeTo(".config/"))
+    assert sorted(d.path for d in chain) == [".config/notes.txt", ".config/run.sh"]
+    chain = pipeline(dotfiles.dotfiles(), Executable(), RelativeTo(".config"))
+    assert [d.path for d in chain] == [".config/run.sh"]
+
+
+def test_relative_to_absolute_directory(mixed_repo):
+    dotfiles = mixed_repo["df"]
+    inside = RelativeTo(str(dotfiles.work_tree / "in folder"), dotfiles.work_tree)
+    assert {d.path for d in inside(dotfiles.dotfiles())} == {
+        "in folder/modified staged",
+        "in folder/modified unstaged",
+    }
+
+
+def test_pipeline_is_lazy(mixed_repo):
+    class Counting(NoBinaries):
+        seen = 0
+
+        def keep(self, dotfile):
+            Counting.seen += 1
+            return super().keep(dotfile)
+
+    chain = pipeline(mixed_repo["df"].dotfiles(), Counting())
+    assert Counting.seen == 0
+    first = list(islice(chain, 1))
+    assert len(first) == 1
+    assert Counting.seen < len(mixed_repo["df"].list_all)
+
+
+# vim: foldlevel=1:
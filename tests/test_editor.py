@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+import socket
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from mydot import editor
+
+
+@pytest.fixture
+def no_servers(monkeypatch):
+    for var in ["NVIM", "NVIM_LISTEN_ADDRESS", "MYDOT_NVIM_SERVER", "VIM_SERVERNAME"]:
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.delenv("MYDOT_VIM_SERVER", raising=False)
+
+
+@pytest.fixture
+def nvim_socket(tmp_path, no_servers):
+    path = tmp_path / "nvim.sock"
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(path))
+    server.listen(1)
+    yield str(path)
+    server.close()
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Commands run, answered by `calls.returncode` and `calls.servers`."""
+
+    class Calls(list):
+        returncode = 0
+        servers = "VIM\n"
+
+    ran = Calls()
+
+    def run(cmd, **kw):
+        ran.append(cmd)
+        return subprocess.CompletedProcess(cmd, ran.returncode, stdout=ran.servers)
+
+    monkeypatch.setattr(editor.subprocess, "run", run)
+    return ran
+
+
+def test_no_server_found(no_servers, tmp_path, monkeypatch):
+    monkeypatch.setenv("NVIM", str(tmp_path / "gone.sock"))
+    assert editor.find_nvim_server() is None
+
+
+def test_server_from_env(nvim_socket, monkeypatch):
+    monkeypatch.setenv("NVIM", nvim_socket)
+    assert editor.find_nvim_server() == nvim_socket
+
+
+def test_server_from_listen_glob(nvim_socket, monkeypatch):
+    monkeypatch.setenv("MYDOT_NVIM_SERVER", str(Path(nvim_socket).parent / "*.sock"))
+    assert editor.find_nvim_server() == nvim_socket
+
+
+def test_neovim_sends_to_running_server(nvim_socket, monkeypatch, calls):
+    monkeypatch.setenv("NVIM", nvim_socket)
+    editor.Neovim().open([Path("a"), Path("b")], search="alias")
+    assert calls == [
+        ["nvim", "--server", nvim_socket, "--remote", Path("a"), Path("b")],
+        ["nvim", "--server", nvim_socket, "--remote-send", "<C-\\><C-N>/alias<CR>"],
+    ]
+
+
+def test_neovim_cold_start_without_server(no_servers, calls):
+    editor.Neovim().open([Path("a")])
+    assert calls == [["nvim", Path("a")]]
+
+
+def test_neovim_falls_back_when_the_server_refuses(nvim_socket, monkeypatch, calls):
+    monkeypatch.setenv("NVIM", nvim_socket)
+    calls.returncode = 1
+    editor.Neovim().open([Path("a")])
+    assert calls[-1] == ["nvim", Path("a")]
+
+
+def test_vim_uses_clientserver(no_servers, monkeypatch, calls):
+    monkeypatch.setenv("VIM_SERVERNAME", "vim")
+    editor.Vim().open([Path("a")])
+    assert calls == [
+        ["vim", "--serverlist"],
+        ["vim", "--servername", "vim", "--remote-silent", Path("a")],
+    ]
+
+
+def test_vim_stale_server_starts_vim(no_servers, monkeypatch, calls):
+    monkeypatch.setenv("MYDOT_VIM_SERVER", "GONE")
+    editor.Vim().open([Path("a")])
+    assert calls == [["vim", "--serverlist"], ["vim", Path("a")]]
+
+    calls.clear()
+    calls.servers, calls.returncode = "", 1  # vim without +clientserver
+    monkeypatch.setenv("MYDOT_VIM_SERVER", "VIM")
+    editor.Vim().open([Path("a")])
+    assert calls == [["vim", "--serverlist"], ["vim", Path("a")]]
+
+
+# vim: foldlevel=1:
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+import pytest
+
+from mydot import frecency
+from mydot.frecency import HALF_LIFE, Frecency
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return Frecency(tmp_path / "bare")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000_000.0]
+    monkeypatch.setattr(frecency.time, "time", lambda: now[0])
+    return now
+
+
+def test_unknown_paths_keep_their_order(store):
+    assert store.order(["b", "a", "c"]) == ["b", "a", "c"]
+
+
+def test_recorded_paths_come_first(store):
+    store.record(["c"])
+    store.record(["c", "a"])
+    assert store.order(["a", "b", "c"]) == ["c", "a", "b"]
+    # only candidates are returned
+    assert store.order(["a", "b"]) == ["a", "b"]
+
+
+def test_store_persists(store, tmp_path):
+    store.record(["x"])
+    store.remember_args("bin/deploy", "--dry-run")
+    reloaded = Frecency(tmp_path / "bare")
+    assert reloaded.order(["w", "x"]) == ["x", "w"]
+    assert reloaded.recent_args("bin/deploy") == ["--dry-run"]
+
+
+def test_recent_selection_beats_old_frequency(store, clock):
+    for _ in range(3):
+        store.record(["old"])
+    clock[0] += 3 * HALF_LIFE
+    store.record(["new"])
+    assert store.order(["old", "new"]) == ["new", "old"]
+
+
+def test_compaction_bounds_the_store(store, monkeypatch):
+    monkeypatch.setattr(frecency, "MAX_ENTRIES", 3)
+    for path in ["a", "b", "c", "d", "e"]:
+        store.record([path])
+    assert len(store.entries) <= 3
+    assert store.order(["a", "e"]) == ["e", "a"]
+
+
+def test_argument_history_is_deduplicated(store, monkeypatch):
+    monkeypatch.setattr(frecency, "MAX_ARGS", 2)
+    for line in ["-a", "-b", "-a", "-c"]:
+        store.remember_args("script", line)
+    store.remember_args("script", "")
+    assert store.recent_args("script") == ["-c", "-a"]
+
+
+# vim: foldlevel=1:
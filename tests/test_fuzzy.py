@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+import pytest
+
+from mydot.fuzzy import PathIndex, char_mask, path_index
+
+PATHS = [
+    ".bashrc",
+    ".config/nvim/after/ftplugin/python.lua",
+    ".config/nvim/init.lua",
+    ".config/nvim/lua/plugins/init.lua",
+    ".config/tmux/tmux.conf",
+    ".local/bin/nvim-install",
+    ".zshrc",
+]
+
+
+@pytest.fixture
+def index():
+    return PathIndex(PATHS)
+
+
+def test_char_mask_rejects_missing_characters():
+    assert char_mask("zsh") & char_mask(".bashrc") != char_mask("zsh")
+    assert char_mask("bash") & char_mask(".bashrc") == char_mask("bash")
+
+
+def test_best_match(index):
+    assert index.best("nvim init") == ".config/nvim/init.lua"
+    assert index.best("tmux") == ".config/tmux/tmux.conf"
+    assert index.best("zsh") == ".zshrc"
+
+
+def test_every_term_must_match(index):
+    assert index.search("nvim python") == [".config/nvim/after/ftplugin/python.lua"]
+    assert index.best("nvim zzz") is None
+
+
+def test_boundary_matches_rank_higher(index):
+    # 'ni' at the start of "nvim-install" beats letters scattered elsewhere
+    assert index.search("ni", limit=1) == [".local/bin/nvim-install"]
+
+
+def test_smart_case(index):
+    assert index.best("BASH") is None
+    assert index.best("bash") == ".bashrc"
+
+
+def test_empty_query_keeps_order(index):
+    assert index.search("") == PATHS
+    assert index.search("   ", limit=2) == PATHS[:2]
+
+
+def test_path_index_is_reused():
+    assert path_index(PATHS) is path_index(list(PATHS))
+    assert path_index(PATHS[1:]) is not path_index(PATHS)
+    assert path_index(PATHS).best("tmux") == ".config/tmux/tmux.conf"
+
+
+# vim: foldlevel=1:
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+import pytest
+
+from mydot.actions import GrepHistory
+from mydot.editor import Editor
+from mydot.exceptions import NothingToDo
+from mydot.history import HistorySearch, historic_copy, parse_hit, versions
+
+
+class Recorder(Editor):
+    def __init__(self):
+        self.opened = []
+
+    def open(self, files, search=None):
+        self.opened.append((files, search))
+
+
+@pytest.fixture
+def history(fake_repo, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    git, worktree = fake_repo["git"], fake_repo["worktree"]
+    zshrc = worktree / ".zshrc"
+    commits = {}
+    for name, content in [
+        ("first", "alias gs='git status'\n"),
+        ("second", "export EDITOR=vim\nalias gst='git status'\n"),
+        ("revert", "alias gs='git status'\n"),  # same blob as "first"
+        ("last", "export EDITOR=nvim\n"),
+    ]:
+        zshrc.write_text(content)
+        git(["add", "--", ".zshrc"])
+        git(["commit", "-q", "-m", name])
+        commits[name] = git(["rev-parse", "HEAD"]).stdout.strip()
+    (worktree / "binary").write_bytes(b"\0alias gs")
+    git(["add", "--", "binary"])
+    git(["commit", "-q", "-m", "binary"])
+    return fake_repo, commits
+
+
+def test_versions_are_unique_blobs(history):
+    fake_repo, commits = history
+    found = [v for v in versions(fake_repo["df"]) if v.path == ".zshrc"]
+    assert len(found) == 3  # the revert wrote no new blob
+    # each blob is credited to the newest commit that wrote it
+    assert [v.commit for v in found] == [
+        commits["last"],
+        commits["revert"],
+        commits["second"],
+    ]
+
+
+def test_search_history(history):
+    fake_repo, commits = history
+    search = HistorySearch(fake_repo["df"], "alias gs", workers=2)
+    hits = sorted(search.hits())
+    expected = [
+        f"{commits['revert'][:10]}\t.zshrc\t1\talias gs='git status'",
+        f"{commits['second'][:10]}\t.zshrc\t2\talias gst='git status'",
+    ]
+    assert hits == sorted(expected)
+    assert search.matches == 2
+    assert search.searched == len(versions(fake_repo["df"]))
+    assert parse_hit(expected[1]) == (
+        commits["second"][:10],
+        ".zshrc",
+        2,
+        "alias gst='git status'",
+    )
+    # an older range only sees what existed back then
+    older = HistorySearch(fake_repo["df"], "EDITOR", [commits["second"]])
+    assert [parse_hit(hit)[2] for hit in older.hits()] == [1]
+
+
+def test_closing_early_stops_the_workers(history):
+    fake_repo, _ = history
+    hits = HistorySearch(fake_repo["df"], "a", workers=1).hits()
+    next(hits)
+    hits.close()
+
+
+def test_awkward_files(fake_repo, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    git, worktree, repo = fake_repo["git"], fake_repo["worktree"], fake_repo["df"]
+    # root commits still count when the user has turned them off for `git log`
+    git(["config", "log.showRoot", "false"])
+    root = git(["rev-list", "--max-parents=0", "HEAD"]).stdout.split()[0]
+    from_root = {v.path for v in versions(repo, [root])}
+    assert from_root == set(
+        git(["ls-tree", "-r", "--name-only", root]).stdout.split("\n")[:-1]
+    )
+
+    (worktree / ".profile").write_bytes(b"alias crlf=1\r\nalias cr=1\ralias ff=2\r\n")
+    weird = 'say "hi": there\\ ü.sh'
+    (worktree / weird).write_text("alias weird=1\n")
+    (worktree / "tab\there").write_text("alias weird=2\n")  # can't be shown
+    git(["add", "--", ".profile", weird, "tab\there"])
+    git(["commit", "-q", "-m", "awkward"])
+    hits = list(HistorySearch(repo, "alias (crlf|cr|ff|weird)").hits())
+    assert sorted(parse_hit(hit)[1:] for hit in hits) == [
+        (".profile", 1, "alias crlf=1"),
+        (".profile", 2, "alias cr=1 alias ff=2"),
+        (weird, 1, "alias weird=1"),
+    ]
+    assert not any("\r" in hit or "\n" in hit for hit in hits)
+    commit, path, _, _ = parse_hit(next(h for h in hits if "weird" in h))
+    assert historic_copy(repo, commit, path).read_text() == "alias weird=1\n"
+
+
+def test_grep_history_action(history):
+    fake_repo, commits = history
+    editor = Recorder()
+    with pytest.raises(NothingToDo):
+        GrepHistory(fake_repo["df"], "no such thing", editor=editor).run()
+
+    result = GrepHistory(
+        fake_repo["df"],
+        "EDITOR=vim",
+        selector=lambda items, **_: items,
+        editor=editor,
+    ).run()
+    assert result.paths == [f"{commits['second'][:10]}:.zshrc"]
+    (copy,), search = editor.opened[0]
+    assert copy.read_text() == "export EDITOR=vim\nalias gst='git status'\n"
+    assert search == "EDITOR=vim"  # not vim: no line jumps
+    # the work tree is untouched
+    assert (fake_repo["worktree"] / ".zshrc").read_text() == "export EDITOR=nvim\n"
+
+
+# vim: foldlevel=1:
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+# standard library
+import os
+
+import pytest
+
+from mydot.actions import DiscardChanges, UndoDiscard
+from mydot.exceptions import JournalError, NothingToDo
+from mydot.journal import DiscardJournal
+
+
+@pytest.fixture
+def journal_repo(fake_repo, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return fake_repo
+
+
+def test_discard_then_undo(journal_repo):
+    df, worktree = journal_repo["df"], journal_repo["worktree"]
+    with pytest.raises(NothingToDo):
+        UndoDiscard(df).run()
+    script = worktree / "in folder/modified unstaged"
+    os.chmod(script, 0o755)
+    picked = ["in folder/modified unstaged", "deleted unstaged"]
+    calls = []
+    git_call = df.git
+    df.git = lambda args, **kwargs: calls.append(args[0]) or git_call(args, **kwargs)
+    DiscardChanges(df, selector=lambda items, **_: picked).run()
+    assert calls.count("hash-object") == 1
+    assert script.read_text().startswith("data for")
+    assert (worktree / "deleted unstaged").exists()
+
+    journal = DiscardJournal(df)
+    entry = journal.entries()[0]
+    assert entry["reason"] == "discard"
+    assert entry["files"]["deleted unstaged"] == {"deleted": True}
+    assert entry["files"]["in folder/modified unstaged"]["mode"] == 0o755
+
+    result = UndoDiscard(df, selector=lambda items, **_: items[:1]).run()
+    assert result.paths == sorted(picked)
+    assert script.read_text() == f"edited content for {script}"
+    assert os.stat(script).st_mode & 0o777 == 0o755
+    assert not (worktree / "deleted unstaged").exists()
+    df.freshen()
+    assert set(picked) <= set(df.modified_unstaged)
+    # the undo itself was journaled first
+    assert [e["reason"] for e in journal.entries()] == ["undo", "discard"]
+
+
+def test_expired_entries(journal_repo):
+    df = journal_repo["df"]
+    journal = DiscardJournal(df)
+    journal.save(["unmodified"])
+    gone = {
+        "time": 0,
+        "reason": "discard",
+        "files": {"x": {"oid": "1" * 40, "mode": 0o644}},
+    }
+    entries = journal.entries() + [gone]
+    assert journal.expired(entries) == {1}
+    with pytest.raises(JournalError):
+        journal.restore(gone)
+    assert len(journal.entries()) == 1  # nothing was touched
+    assert "1 file(s): x" in journal.describe(gone)
+
+
+# vim: foldlevel=1:
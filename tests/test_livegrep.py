@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+# standard library
+import shlex
+import subprocess
+
+import pytest
+
+from mydot.actions import line_search
+from mydot.editor import Nano, Vim
+from mydot.livegrep import SearchIndex, SearchServer, parse_hit, query
+
+
+@pytest.fixture
+def index(fake_repo):
+    worktree = fake_repo["worktree"]
+    (worktree / ".bashrc").write_text("export EDITOR=nvim\nalias ll='ls -l'\n")
+    (worktree / ".vimrc").write_text('set number\n" editor settings\nset nowrap')
+    fake_repo["git"](["add", "--", ".bashrc", ".vimrc"])
+    return SearchIndex(fake_repo["df"]).load()
+
+
+def test_search(index):
+    assert index.search("") == []
+    assert index.search("EDITOR") == [".bashrc:1:export EDITOR=nvim"]
+    # lowercase patterns ignore case
+    assert index.search("editor") == [
+        ".bashrc:1:export EDITOR=nvim",
+        '.vimrc:2:" editor settings',
+    ]
+    assert index.search("^set no") == [".vimrc:3:set nowrap"]
+    # an unfinished regex is searched for literally
+    assert index.search("ll='ls") == [".bashrc:2:alias ll='ls -l'"]
+    assert index.search("ls (") == []
+    assert index.search("set", limit=1) == [".vimrc:1:set number"]
+
+
+def test_literal_queries_narrow_down(index):
+    index.search("edito")
+    assert sorted(index.last[1]) == [".bashrc", ".vimrc"]
+    index.files["unmodified"] = ("editor", [0])  # not a candidate any more
+    assert index.search("editor") == [
+        ".bashrc:1:export EDITOR=nvim",
+        '.vimrc:2:" editor settings',
+    ]
+    # regexes search everything again
+    assert "unmodified:1:editor" in index.search("edit(or)?")
+
+
+def test_server_answers_the_client(index):
+    with SearchServer(index) as server:
+        assert query(server.address, "nowrap") == [".vimrc:3:set nowrap"]
+        command = f"{server.client_command()} {shlex.quote('number')}"
+        output = subprocess.run(command, shell=True, capture_output=True, text=True)
+        assert output.stdout == ".vimrc:1:set number\n"
+
+
+def test_open_at_line():
+    assert parse_hit(".vimrc:3:a:b")[1:] == (3, "a:b")
+    assert line_search(Vim(), 3, "nowrap") == "\\%3l"
+    assert line_search(Nano(), 3, "nowrap") == "nowrap"
+
+
+# vim: foldlevel=1:
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+import json
+import logging
+
+import pytest
+
+from mydot import logging as mylog
+from mydot.deploy import cat_file_batch
+from mydot.tune import Tuner
+from mydot.logging import configure, dump, event, events, log
+
+
+@pytest.fixture
+def clean_logger(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setattr(mylog, "_ring", mylog.deque(maxlen=mylog.RING_SIZE))
+    handlers, level = list(log.handlers), log.level
+    yield
+    log.handlers[:] = handlers
+    log.setLevel(level)
+
+
+def test_messages_are_not_formatted_when_filtered(clean_logger):
+    configure("WARNING")
+
+    class Expensive:
+        def __str__(self):
+            raise AssertionError("formatted a filtered message")
+
+    log.debug("value: %s", Expensive())
+    assert events() == []
+
+
+def test_ring_buffer_is_bounded(clean_logger, monkeypatch):
+    monkeypatch.setattr(mylog, "_ring", mylog.deque(maxlen=3))
+    for n in range(5):
+        event("git", n=n)
+    assert [fields["n"] for _, _, fields in events()] == [2, 3, 4]
+
+
+def test_dump(clean_logger, tmp_path):
+    configure("INFO")
+    event("cache", name="blobs", misses=2)
+    log.info("picked %d files", 3)
+    written = dump(tmp_path / "flight.log")
+    lines = [json.loads(line) for line in written.read_text().splitlines()]
+    assert lines[0]["reason"] == "requested"
+    assert lines[1]["kind"] == "cache" and lines[1]["misses"] == 2
+    assert lines[2]["msg"] == "picked 3 files"
+
+
+def test_level_from_environment(clean_logger, monkeypatch):
+    monkeypatch.setenv("MYDOT_LOG_LEVEL", "debug")
+    configure()
+    assert log.level == logging.DEBUG
+
+
+def test_git_calls_are_recorded(fake_repo, clean_logger):
+    fake_repo["df"].freshen()
+    fake_repo["df"].short_status
+    kinds = [(kind, fields.get("args")) for _, kind, fields in events()]
+    assert (
+        "git",
+        ["status", "--short", "--untracked-files=no", "--porcelain"],
+    ) in kinds
+
+
+def test_streamed_git_calls_are_recorded(fake_repo, clean_logger):
+    df = fake_repo["df"]
+    oids = [dotfile.oid for dotfile in df.dotfiles("HEAD")]
+    list(cat_file_batch(df._git_base, oids))
+    Tuner(df, settings=[], runs=1).time_command(["rev-parse", "HEAD"])
+    calls = [fields["args"][0] for _, kind, fields in events() if kind == "git"]
+    assert calls == ["ls-tree", "cat-file", "rev-parse", "rev-parse"]
+
+
+# vim: foldlevel=1:
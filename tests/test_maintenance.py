@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+import pytest
+
+from mydot import maintenance
+import os
+import subprocess
+import time
+
+from mydot.maintenance import (
+    Health,
+    Maintenance,
+    interactive_dir,
+    interactive_pids,
+    interactive_use,
+    maybe_maintain,
+)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.delenv("MYDOT_MAINTENANCE", raising=False)
+
+
+def test_health_counts_loose_objects(fake_repo):
+    repo = fake_repo["df"]
+    health = Health(repo)
+    assert health.loose > 0
+    assert health.packs == 0
+    assert health.graph_stale
+
+
+def test_thresholds_pick_tasks(fake_repo, monkeypatch):
+    repo = fake_repo["df"]
+    health = Health(repo)
+    monkeypatch.setattr(maintenance, "MAX_LOOSE", health.loose - 1)
+    names = [task[0] for task in health.tasks()]
+    assert names == ["repack", "commit-graph", "multi-pack-index"]
+
+    monkeypatch.setattr(maintenance, "MAX_LOOSE", health.loose)
+    names = [task[0] for task in health.tasks()]
+    assert names == ["commit-graph", "multi-pack-index"]
+
+
+def test_job_runs_once_and_releases_lock(fake_repo, cache, monkeypatch):
+    repo = fake_repo["df"]
+    monkeypatch.setattr(maintenance, "MAX_LOOSE", 0)
+    job = maybe_maintain(repo)
+    assert job is not None
+    # a second command finishing while the job runs leaves it alone
+    assert maybe_maintain(repo) is None
+    job.wait(timeout=30)
+
+    state = Maintenance(repo)
+    assert not state.lock_file.exists()
+    assert not state.due()
+    health = Health(repo)
+    assert health.loose == 0 and health.packs == 1
+    assert not health.graph_stale
+
+
+def test_lock_blocks_a_second_job(fake_repo, cache):
+    repo = fake_repo["df"]
+    first = Maintenance(repo)
+    assert first._take_lock()
+    assert first.locked()
+    assert first.start([["count-objects"]]) is None
+
+
+def test_job_waits_for_interactive_use(fake_repo, cache, monkeypatch):
+    repo = fake_repo["df"]
+    monkeypatch.setattr(maintenance, "MAX_LOOSE", 0)
+    other = subprocess.Popen(["sleep", "30"])
+    marker = interactive_dir(repo.bare_repo) / str(other.pid)
+    marker.parent.mkdir(parents=True)
+    marker.touch()
+    (marker.parent / "99999999").touch()  # a process that is long gone
+    try:
+        assert interactive_pids(repo.bare_repo) == [other.pid]
+        assert not (marker.parent / "99999999").exists()
+        # another mydot is running: no job starts
+        assert maybe_maintain(repo) is None
+        job = Maintenance(repo).start(Health(repo).tasks())
+        time.sleep(1.5)
+        assert job.poll() is None  # waiting, nothing repacked yet
+        assert Health(repo).packs == 0
+    finally:
+        other.kill()
+        other.wait()
+    job.wait(timeout=30)
+    assert Health(repo).packs == 1
+
+
+def test_interactive_marker(fake_repo, cache):
+    repo = fake_repo["df"]
+    with interactive_use(repo.bare_repo) as marker:
+        assert marker.name == str(os.getpid())
+        assert marker.exists()
+        assert interactive_pids(repo.bare_repo) == []  # not counting ourselves
+    assert not marker.exists()
+
+
+def test_disabled_by_environment(fake_repo, cache, monkeypatch):
+    monkeypatch.setenv("MYDOT_MAINTENANCE", "0")
+    repo = fake_repo["df"]
+    assert maybe_maintain(repo) is None
+    assert Maintenance(repo).due()
+
+
+# vim: foldlevel=1:
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+import io
+
+import pytest
+
+from mydot.exceptions import ManifestError
+from mydot.hashing import OidCache, work_tree_oids
+from mydot.manifest import (
+    MODE_EXECUTABLE,
+    Entry,
+    compare,
+    compare_files,
+    manifest_entries,
+    read_manifest,
+    write_manifest,
+)
+
+
+@pytest.fixture
+def repo(fake_repo, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return fake_repo
+
+
+def test_manifest_round_trip(repo):
+    out = io.StringIO()
+    count = write_manifest(repo["df"], out)
+    lines = out.getvalue().splitlines()
+    assert lines[0].startswith("# mydot manifest")
+    entries = list(read_manifest(lines))
+    assert len(entries) == count
+    assert entries == list(manifest_entries(repo["df"]))
+    unmodified = next(e for e in entries if e.path == "unmodified")
+    assert unmodified.oid == repo["git"](["rev-parse", ":unmodified"]).stdout.strip()
+
+
+def test_unchanged_tree_is_not_hashed_again(repo):
+    cache_file = repo["bare"].parent / "oids.json"
+    first = OidCache(cache_file)
+    work_tree_oids(repo["df"], first)
+    assert first.hashed > 0
+    second = OidCache(cache_file)
+    work_tree_oids(repo["df"], second)
+    assert second.hashed == 0
+
+
+def test_executable_mode(repo):
+    (repo["worktree"] / "unmodified").chmod(0o755)
+    repo["df"].freshen()
+    modes = {e.path: e.mode for e in manifest_entries(repo["df"])}
+    assert modes["unmodified"] == MODE_EXECUTABLE
+
+
+def test_merge_join():
+    a = [
+        Entry("a", "100644", "1"),
+        Entry("b", "100644", "2"),
+        Entry("d", "100644", "4"),
+    ]
+    b = [
+        Entry("b", "100755", "2"),
+        Entry("c", "100644", "3"),
+        Entry("d", "100644", "5"),
+        Entry("e", "100644", "6"),
+    ]
+    assert compare(a, b) == {
+        "added": ["c", "e"],
+        "removed": ["a"],
+        "changed": ["d"],
+        "mode": ["b"],
+    }
+    assert compare(b, b) == {"added": [], "removed": [], "changed": [], "mode": []}
+
+
+def test_compare_files(repo, tmp_path):
+    first, second = tmp_path / "first", tmp_path / "second"
+    with open(first, "w") as out:
+        write_manifest(repo["df"], out)
+    (repo["worktree"] / "in folder/modified unstaged").write_text("drifted")
+    (repo["worktree"] / "unmodified").unlink()
+    repo["df"].freshen()
+    with open(second, "w") as out:
+        write_manifest(repo["df"], out)
+    drift = compare_files(first, second)
+    assert drift["changed"] == ["in folder/modified unstaged"]
+    assert drift["removed"] == ["unmodified"]
+    assert drift["added"] == drift["mode"] == []
+
+
+def test_bad_manifests_are_rejected(tmp_path):
+    with pytest.raises(ManifestError, match="laptop.txt:2: not sorted"):
+        list(read_manifest(["100644 1\tb\n", "100644 2\ta\n"], "laptop.txt"))
+    with pytest.raises(ManifestError, match="manifest:1: not a manifest line"):
+        list(read_manifest(["garbage\n"]))
+    with pytest.raises(ManifestError, match="missing.txt"):
+        compare_files(tmp_path / "missing.txt", tmp_path / "missing.txt")
+
+
+# vim: foldlevel=1:
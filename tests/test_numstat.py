@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+# standard library
+import sys
+
+import pytest
+
+from mydot.actions import AddChanges, AnnotatedFzf
+from mydot.exceptions import NoSelection
+from mydot.numstat import Change, annotate, numstat, summary
+
+
+def test_numstat_variants(fake_repo):
+    df, worktree = fake_repo["df"], fake_repo["worktree"]
+    (worktree / "unmodified").write_text("one\ntwo\nthree\n")
+    (worktree / "in folder/modified unstaged").write_bytes(b"\x00\x01binary")
+
+    unstaged = numstat(df)
+    assert unstaged["unmodified"] == (3, 1)
+    assert unstaged["in folder/modified unstaged"] == (None, None)
+    assert unstaged["deleted unstaged"] == (0, 1)
+    assert "modified staged changes" not in unstaged
+
+    staged = numstat(df, "--staged")
+    assert staged["modified staged changes"] == (1, 1)
+    assert staged["deleted staged"] == (0, 1)
+    # renames come apart into an add and a delete
+    assert staged["rename"] == (1, 0) and staged["oldname"] == (0, 1)
+
+    since_head = numstat(df, "HEAD")
+    assert since_head["unmodified"] == (3, 1)
+    assert since_head["modified staged changes"] == (1, 1)
+
+
+def test_annotate_orders_by_size():
+    counts = {"big": (300, 20), "small": (1, 1), "bin": (None, None)}
+    changes = annotate(["small", "new", "big", "bin"], counts)
+    assert [c.path for c in changes] == ["bin", "big", "small", "new"]
+    assert changes[-1] == Change("new", 0, 0)
+    assert changes[1].label() == "  +300    -20\tbig"
+    assert changes[0].label() == "       binary\tbin"
+    assert summary(changes) == "4 files, +301 -21, 1 binary"
+
+
+def test_picker_matches_paths_only(fake_repo, monkeypatch):
+    monkeypatch.setattr(sys.modules["pydymenu.fzf"], "missing_binary", lambda _: False)
+    fzf = AnnotatedFzf(["  +1 -0\tpath"], header="1 files", prompt="> ")
+    assert fzf.command[-4:] == ["--delimiter=\t", "--nth=2..", "--header", "1 files"]
+
+    # injected selectors still get plain paths
+    offered = []
+    add = AddChanges(fake_repo["df"], selector=lambda items, **_: offered.extend(items))
+    with pytest.raises(NoSelection):
+        add.run()
+    assert sorted(offered) == sorted(fake_repo["df"].modified_unstaged)
+
+
+# vim: foldlevel=1:
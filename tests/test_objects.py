@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+import random
+import subprocess as sp
+
+import pytest
+
+from mydot import Repository
+from mydot.objects import ObjectStore, Unsupported, apply_delta
+
+
+@pytest.fixture
+def history(fake_repo):
+    """fake_repo with a few dozen commits of slowly changing files."""
+    worktree, git = fake_repo["worktree"], fake_repo["git"]
+    rng = random.Random(4)
+    lines = [f"setting_{n} = {rng.random()}\n" for n in range(300)]
+    (worktree / ".config/app").mkdir(parents=True)
+    for commit in range(30):
+        lines[rng.randrange(len(lines))] = f"changed {commit}\n"
+        (worktree / ".config/app/config").write_text("".join(lines))
+        (worktree / ".bashrc").write_text("".join(lines[commit:]))
+        git(["add", ".config/app/config", ".bashrc"])
+        git(["commit", "-q", "-m", f"commit {commit}"])
+    git(["tag", "-a", "v1", "-m", "a tag"])
+    return fake_repo
+
+
+def all_objects(repo):
+    listing = repo["git"](
+        ["cat-file", "--batch-all-objects", "--batch-check=%(objectname) %(objecttype)"]
+    ).stdout.split()
+    return list(zip(listing[::2], listing[1::2]))
+
+
+def assert_parity(repo):
+    store = ObjectStore(repo["bare"])
+    objects = all_objects(repo)
+    assert len(objects) > 100
+    for oid, kind in objects:
+        expected = sp.run(
+            ["git", f"--git-dir={repo['bare']}", "cat-file", kind, oid],
+            capture_output=True,
+        ).stdout
+        assert store.read(oid) == (kind, expected), oid
+
+
+def test_loose_objects(history):
+    assert_parity(history)
+
+
+def test_ofs_deltas(history):
+    history["git"](["repack", "-a", "-d", "-q", "--depth=50", "--window=50"])
+    assert_parity(history)
+
+
+def test_ref_deltas(history):
+    history["git"](["config", "repack.useDeltaBaseOffset", "false"])
+    history["git"](["repack", "-a", "-d", "-q", "-f"])
+    assert_parity(history)
+
+
+def test_tracked_and_blob(history, monkeypatch):
+    history["git"](["repack", "-d", "-q"])
+    expected = history["df"].tracked
+    monkeypatch.setenv("MYDOT_OBJECTS", "python")
+    repo = Repository(history["bare"], history["worktree"])
+    assert repo.object_store is not None
+    assert repo.tracked == expected
+    assert list(repo.object_store.ls_tree("v1")) == list(
+        repo.object_store.ls_tree("HEAD")
+    )
+    for rev in ["HEAD", "HEAD~3", "v1"]:
+        committed = history["git"](["show", f"{rev}:.config/app/config"]).stdout
+        assert repo.blob(rev, ".config/app/config").decode() == committed
+    with pytest.raises(Unsupported):
+        repo.object_store.resolve("HEAD~3")
+
+
+def test_corrupt_objects_fall_back_to_git(history, monkeypatch):
+    oid = history["git"](["rev-parse", "HEAD:.bashrc"]).stdout.strip()
+    loose = history["bare"] / "objects" / oid[:2] / oid[2:]
+    loose.chmod(0o644)
+    loose.write_bytes(b"not a zlib stream")
+    with pytest.raises(ValueError, match="corrupt"):
+        ObjectStore(history["bare"]).read(oid)
+    monkeypatch.setenv("MYDOT_OBJECTS", "python")
+    repo = Repository(history["bare"], history["worktree"])
+    repo.blob("HEAD", ".bashrc")  # handed to `git cat-file`, no zlib.error
+
+
+def test_apply_delta():
+    base = b"0123456789"
+    # source size 10, target size 7: copy 4 bytes at offset 2, insert "abc"
+    delta = bytes([10, 7, 0x80 | 0x01 | 0x10, 2, 4, 3]) + b"abc"
+    assert apply_delta(base, delta) == b"2345abc"
+
+
+# vim: foldlevel=1:
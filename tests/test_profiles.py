@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+# standard library
+import re
+
+import pytest
+
+from mydot import Repository
+from mydot.actions import ApplyProfile
+from mydot.exceptions import NothingToDo, ProfileError
+from mydot.profiles import active_profile, glob_regex, load_profiles
+
+PROFILES = """
+[base]
+paths = .bashrc
+        .config/git/
+
+[laptop]
+hosts = thinkpad-* macbook
+include = base
+paths = .config/nvim/
+        !.config/nvim/spell/
+        space folder/
+
+[server]
+roles = server
+include = base
+"""
+
+
+@pytest.mark.parametrize(
+    "glob, path, expected",
+    [
+        (".bashrc", ".bashrc", True),
+        (".bashrc", "sub/.bashrc", True),
+        ("/.bashrc", "sub/.bashrc", False),
+        (".config/git/", ".config/git/config", True),
+        (".config/git/", "x/.config/git/config", False),
+        (".config/*.conf", ".config/a.conf", True),
+        (".config/*.conf", ".config/sub/a.conf", False),
+        (".config/**/*.conf", ".config/sub/deep/a.conf", True),
+        (".config/**/*.conf", ".config/a.conf", True),
+        ("*.sh", "bin/tool.sh", True),
+        (".vim", ".vimrc", False),
+        ("*.[ch]", "src/main.c", True),
+        ("*.[ch]", "src/main.o", False),
+        ("/[!.]*", "bin", True),
+        ("/[!.]*", ".bashrc", False),
+        ("file[0-9]", "file7", True),
+        ("a[/]b", "a/b", False),
+        ("x[[:digit:]]", "x3", True),
+        ("lit\\*", "lit*", True),
+        ("lit\\*", "litx", False),
+    ],
+)
+def test_glob_regex(glob, path, expected):
+    assert bool(re.fullmatch(glob_regex(glob), path)) is expected
+
+
+def test_load_and_pick_profiles(tmp_path):
+    file = tmp_path / "profiles"
+    file.write_text(PROFILES)
+    profiles = load_profiles(file)
+    laptop = profiles["laptop"]
+    assert laptop.patterns[:2] == [".bashrc", ".config/git/"]
+    assert laptop.filter(
+        [".bashrc", ".config/nvim/init.lua", ".config/nvim/spell/en.add", ".zshrc"]
+    ) == [".bashrc", ".config/nvim/init.lua"]
+    assert laptop.matches("space folder/file")
+    assert profiles["server"].patterns == [".bashrc", ".config/git/"]
+
+    assert active_profile(profiles, "thinkpad-x1.lan", "").name == "laptop"
+    assert active_profile(profiles, "box", "server").name == "server"
+    assert active_profile(profiles, "box", "") is None
+    assert active_profile(profiles, "thinkpad-x1", "", name="server").name == "server"
+    assert active_profile(profiles, "thinkpad-x1", "", name="all") is None
+    with pytest.raises(KeyError):
+        active_profile(profiles, name="desktop")
+
+
+def test_profile_limits_repository(fake_repo, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.delenv("MYDOT_PROFILE", raising=False)
+    (tmp_path / "config/mydot").mkdir(parents=True)
+    (tmp_path / "config/mydot/profiles").write_text(
+        "[small]\npaths = unmodified\n        in folder/\n"
+    )
+    git, worktree, df = fake_repo["git"], fake_repo["worktree"], fake_repo["df"]
+    git(["add", "-A"])
+    git(["commit", "-q", "-m", "clean"])
+    df.freshen()
+
+    with pytest.raises(NothingToDo):
+        ApplyProfile(df).run()  # no profile for this host
+    with pytest.raises(ProfileError):
+        ApplyProfile(df, "missing").run()
+
+    result = ApplyProfile(df, "small").run()
+    expected = [
+        "in folder/modified staged",
+        "in folder/modified unstaged",
+        "space folder/unmodified",
+        "unmodified",
+    ]
+    assert result.paths == expected
+    assert not (worktree / "newfile").exists()
+    assert git(["status", "--porcelain"]).stdout == ""
+
+    # pinned: a fresh Repository picks the same profile up
+    again = Repository(fake_repo["bare"], worktree)
+    assert again.list_all == expected
+    assert [d.path for d in again.dotfiles()] == expected
+
+    ApplyProfile(df, "all").run()
+    assert (worktree / "newfile").exists()
+    assert Repository(fake_repo["bare"], worktree).profile is None
+
+
+def test_profile_agrees_with_git(fake_repo, tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.delenv("MYDOT_PROFILE", raising=False)
+    (tmp_path / "config/mydot").mkdir(parents=True)
+    (tmp_path / "config/mydot/profiles").write_text("[classes]\npaths = /[!ai]*\n")
+    git, df = fake_repo["git"], fake_repo["df"]
+    git(["add", "-A"])
+    git(["commit", "-q", "-m", "clean"])
+    df.freshen()
+
+    apply = ApplyProfile(df, "classes")
+    result = apply.run()
+    assert capsys.readouterr().out == ""
+    checked_out = [
+        line[2:]
+        for line in git(["ls-files", "-t"]).stdout.splitlines()
+        if line[0] == "H"
+    ]
+    assert result.paths == sorted(checked_out)
+    assert "unmodified" in result.paths
+    assert not any(path.startswith(("a", "i")) for path in result.paths)
+    apply.report(result)
+    assert capsys.readouterr().out.startswith("Profile classes:")
+
+
+# vim: foldlevel=1:
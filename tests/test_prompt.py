@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+import pytest
+
+from mydot.prompt import (
+    STALE_MARK,
+    PromptStatus,
+    main,
+    count_status,
+    format_segment,
+    parse_branch_header,
+)
+
+
+@pytest.fixture
+def prompt(fake_repo, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return PromptStatus(fake_repo["bare"], fake_repo["worktree"], budget_ms=5000)
+
+
+def test_format_segment_omits_zeros():
+    counts = {"staged": 2, "unstaged": 0, "deleted": 1, "ahead": 3, "behind": 0}
+    assert format_segment(counts) == "+2 -1 ↑3"
+    assert format_segment({}) == ""
+
+
+def test_parse_branch_header():
+    info = parse_branch_header("## master...origin/master [ahead 2, behind 5]")
+    assert info == {"upstream": "origin/master", "ahead": "2", "behind": "5"}
+    assert parse_branch_header("## master")["upstream"] is None
+
+
+def test_count_status_uses_repository_buckets(fake_repo):
+    output = fake_repo["git"](
+        ["status", "--porcelain", "-z", "--branch", "--untracked-files=no"]
+    ).stdout
+    counts = count_status(output, fake_repo["bare"], fake_repo["worktree"])["counts"]
+    # modified staged: 3, added: 2, renamed: 2
+    assert counts["staged"] == 7
+    # " M" x2, "MM", "AM", "RM"
+    assert counts["unstaged"] == 5
+    # "D " and " D"
+    assert counts["deleted"] == 2
+
+
+def test_render_caches_until_index_changes(fake_repo, prompt):
+    first = prompt.render()
+    assert first.startswith("+7 ~5 -2")
+    assert prompt.snapshot_file.exists()
+    assert prompt.render() == first
+
+    fake_repo["git"](["add", "--all"])
+    assert prompt.render() != first
+
+
+def test_render_marks_stale_when_over_budget(fake_repo, prompt):
+    first = prompt.render()
+    fake_repo["git"](["add", "--all"])
+    prompt.budget = 0
+    assert prompt.render() == first + STALE_MARK
+
+
+def test_main_survives_bad_environment(fake_repo, tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setenv("DOTFILES", str(fake_repo["bare"]))
+    monkeypatch.setenv("HOME", str(fake_repo["worktree"]))
+    monkeypatch.setenv("MYDOT_PROMPT_BUDGET", "fast")
+    monkeypatch.setenv("MYDOT_PROMPT_TTL", "inf")
+    assert main() == 0
+    assert capsys.readouterr().out.startswith("+7 ~5 -2")
+
+
+# vim: foldlevel=1:
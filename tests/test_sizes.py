@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+# standard library
+import os
+
+from mydot.actions import Sizes
+from mydot.sizes import SizeReport, group_of, human_size
+
+
+def test_group_of():
+    assert group_of(".bashrc") == "."
+    assert group_of(".config/nvim/init.lua") == ".config/nvim"
+    assert group_of(".config/nvim/lua/plugins.lua") == ".config/nvim"
+    assert group_of(".config/nvim/lua/plugins.lua", depth=1) == ".config"
+
+
+def test_human_size():
+    assert human_size(12) == "12 B"
+    assert human_size(2048) == "2.0 KiB"
+    assert human_size(5 * 1024**3) == "5.0 GiB"
+
+
+def test_report_attributes_history(fake_repo):
+    git, worktree = fake_repo["git"], fake_repo["worktree"]
+    cache = worktree / ".cache/tool/blob.bin"
+    cache.parent.mkdir(parents=True)
+    cache.write_bytes(os.urandom(64 * 1024))
+    git(["add", "--", str(cache)])
+    git(["commit", "-q", "-m", "oops"])
+    git(["rm", "-q", "--", str(cache)])
+    git(["commit", "-q", "-m", "remove the cache"])
+
+    df = fake_repo["df"]
+    calls = []
+    git_call = df.git
+    df.git = lambda args, **kwargs: calls.append(args[0]) or git_call(args, **kwargs)
+    report = SizeReport(df)
+    report.analyze()
+    assert sorted(calls) == ["cat-file", "ls-tree", "rev-list"]
+
+    biggest = report.largest_historic(1)[0]
+    assert biggest.path == ".cache/tool/blob.bin"
+    assert biggest.size == 64 * 1024 and biggest.disk > 60 * 1024
+    assert ".cache/tool/blob.bin" not in [b.path for b in report.largest_current()]
+    assert {b.path for b in report.largest_current()} >= {
+        "unmodified",
+        "in folder/modified staged",
+    }
+
+    directories = {d.directory: d for d in report.directories()}
+    assert directories[".cache/tool"].historic_disk == biggest.disk
+    assert report.directories(1)[0].directory == ".cache/tool"
+    assert report.totals()["commit"][0] == 3
+
+
+def test_sizes_action(fake_repo, capsys):
+    sizes = Sizes(fake_repo["df"], limit=2)
+    result = sizes.run()
+    assert capsys.readouterr().out == ""
+    assert result.action == "sizes" and len(result.paths) == 2
+    sizes.report(result)
+    assert "largest files" in capsys.readouterr().out
+
+
+# vim: foldlevel=1:
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+import os
+
+import pytest
+
+from mydot import snapshot
+from mydot.cache import load_json
+from mydot.hashing import blob_oid, work_tree_oids
+from mydot.snapshot import MANIFEST, SnapshotMirror, copy_file, latest_snapshot
+
+
+@pytest.fixture
+def repo(fake_repo, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return fake_repo
+
+
+def test_blob_oid_matches_git(fake_repo):
+    path = fake_repo["worktree"] / "modified unstaged changes"
+    git_oid = fake_repo["git"](["hash-object", str(path)]).stdout.strip()
+    assert blob_oid(path) == git_oid
+
+
+def test_work_tree_oids(repo):
+    df = repo["df"]
+    oids = work_tree_oids(df)
+    assert "deleted unstaged" not in oids
+    for path in ["unmodified", "added then modified", "rename-edits"]:
+        git_oid = repo["git"](["hash-object", path]).stdout.strip()
+        assert oids[path] == git_oid
+    assert list(oids) == sorted(oids)
+
+
+def test_unchanged_files_are_hardlinked(repo, tmp_path, monkeypatch):
+    df, worktree = repo["df"], repo["worktree"]
+    backups = tmp_path / "backups"
+    # every snapshot in this test is taken "within the same second"
+    monkeypatch.setattr(snapshot.time, "strftime", lambda _: "2024-01-01T000000")
+    first = SnapshotMirror(df, backups)
+    first_dir = first.run()
+    assert first.counts.get("hardlink", 0) == 0
+    manifest = load_json(first_dir / MANIFEST)
+    assert set(manifest) == set(work_tree_oids(df))
+    assert (first_dir / "in folder/modified staged").read_text() == (
+        worktree / "in folder/modified staged"
+    ).read_text()
+
+    (worktree / "unmodified").write_text("changed after the first snapshot")
+    df.freshen()
+    second = SnapshotMirror(df, backups)
+    assert second.previous == first_dir
+    second_dir = second.run()
+
+    assert second.counts["hardlink"] == len(manifest) - 1
+    same = "space folder/unmodified"
+    assert os.stat(first_dir / same).st_ino == os.stat(second_dir / same).st_ino
+    changed = "unmodified"
+    assert os.stat(first_dir / changed).st_ino != os.stat(second_dir / changed).st_ino
+    assert (second_dir / changed).read_text() == "changed after the first snapshot"
+    assert not list(backups.glob(".*partial"))
+
+    assert [first_dir.name, second_dir.name] == [
+        "2024-01-01T000000",
+        "2024-01-01T000000.2",
+    ]
+    for number in range(3, 11):
+        assert SnapshotMirror(df, backups).run().name.endswith(f".{number}")
+    assert latest_snapshot(backups).name == "2024-01-01T000000.10"
+
+
+def test_copy_file_keeps_content_and_mode(tmp_path):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    src.write_bytes(os.urandom(200_000))
+    src.chmod(0o750)
+    assert copy_file(str(src), str(dst)) in snapshot.COPIES
+    assert dst.read_bytes() == src.read_bytes()
+    assert dst.stat().st_mode == src.stat().st_mode
+
+
+# vim: foldlevel=1:
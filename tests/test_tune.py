@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+from mydot.actions import Tune
+from mydot.tune import SETTINGS, Tuner, index_version
+
+
+def config(fake_repo, key):
+    return fake_repo["git"](["config", "--get", key]).stdout.strip()
+
+
+def test_settings_that_do_not_help_are_reverted(fake_repo):
+    index = fake_repo["bare"] / "index"
+    status_before = fake_repo["git"](["status", "--porcelain"]).stdout
+    version = index_version(index)
+
+    tuner = Tuner(fake_repo["df"], runs=1, min_gain=1.0)
+    trials = tuner.run()
+
+    assert trials and not tuner.kept
+    assert index_version(index) == version
+    assert not (fake_repo["bare"] / "objects/info/commit-graph").exists()
+    for setting in SETTINGS:
+        for key in setting.config:
+            assert config(fake_repo, key) == ""
+    assert fake_repo["git"](["status", "--porcelain"]).stdout == status_before
+
+
+def test_settings_that_help_are_kept(fake_repo):
+    tuner = Tuner(fake_repo["df"], runs=1, min_gain=float("-inf"))
+    tuner.run()
+
+    assert [s.name for s in tuner.kept] == [s.name for s in tuner.settings]
+    assert index_version(fake_repo["bare"] / "index") == 4
+    assert config(fake_repo, "core.splitIndex") == "true"
+    assert (fake_repo["bare"] / "objects/info/commit-graph").exists()
+    assert set(tuner.final) == set(tuner.baseline)
+
+
+def test_tune_action(fake_repo, capsys):
+    tune = Tune(fake_repo["df"], runs=1)
+    result = tune.run()
+    assert capsys.readouterr().out == ""
+    assert result.action == "tune"
+    assert result.paths == [s.name for s in result.detail.kept]
+    tune.report(result)
+    assert "git settings" in capsys.readouterr().out
+
+
+def test_index_version_of_missing_file(tmp_path):
+    assert index_version(tmp_path / "index") is None
+
+
+# vim: foldlevel=1:
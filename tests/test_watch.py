@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# Mikey Garcia, @gikeymarcia
+# https://github.com/gikeymarcia/mydot
+
+# standard library
+import sys
+
+import pytest
+
+from mydot.watch import Inotify, Poller, StatusBoard, StatusWatcher, sections_of
+
+
+def test_sections_of():
+    assert sections_of("M ") == {"staged"}
+    assert sections_of("MM") == {"staged", "unstaged"}
+    assert sections_of(" D") == {"deleted"}
+    assert sections_of("D ") == {"deleted"}
+    assert sections_of("AD") == {"staged", "deleted"}
+    assert sections_of(None) == set()
+
+
+def test_board_refreshes_only_given_paths(fake_repo):
+    df = fake_repo["df"]
+    board = StatusBoard(df)
+    board.load()
+    assert board.section("unstaged") == sorted(
+        p for p, code in board.codes.items() if code[1] == "M"
+    )
+    (fake_repo["worktree"] / "unmodified").write_text("changed")
+    fake_repo["git"](["add", "--", "modified unstaged changes"])
+    # only the path asked about is re-queried
+    assert board.refresh(["unmodified"]) == {"unmodified"}
+    assert board.codes["unmodified"] == " M"
+    assert board.codes["modified unstaged changes"] == " M"
+
+    assert "modified unstaged changes" in board.refresh_index()
+    assert board.codes["modified unstaged changes"] == "M "
+    assert board.dirty >= {"staged", "unstaged"}
+
+
+@pytest.mark.parametrize("source", ["inotify", "poll"])
+def test_watcher_follows_edits_and_index(fake_repo, source):
+    if source == "inotify" and not sys.platform.startswith("linux"):
+        pytest.skip("inotify is Linux only")
+    df = fake_repo["df"]
+    changes = Inotify() if source == "inotify" else Poller(interval=0.05)
+    watcher = StatusWatcher(df, changes, debounce=0.05, max_delay=0.5)
+    updates = watcher.updates()
+    next(updates)
+    queries = watcher.board.queries
+
+    (fake_repo["worktree"] / "space folder/unmodified").write_text("edited")
+    assert next(updates) == {"space folder/unmodified"}
+    assert watcher.board.codes["space folder/unmodified"] == " M"
+    assert watcher.board.queries == queries + 1
+
+    fake_repo["git"](["add", "--", "space folder/unmodified"])
+    assert "space folder/unmodified" in next(updates)
+    assert watcher.board.codes["space folder/unmodified"] == "M "
+    updates.close()
+
+
+# vim: foldlevel=1: